@@ -1,9 +1,10 @@
 import os
-from azure.storage.blob import BlobServiceClient
+import json
+import shutil
+import argparse
+from ddditai.common.blob_storage import download_files, file_sha256, latest_training_folder, list_blob_names, mirror_files, read_manifest
 
 # --- CONFIGURATION ---
-AZURE_STORAGE_CONNECTION_STRING = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
-
 CONTAINER_NAME = "mlflow"
 
 TRAINING_PREFIX = "training/"
@@ -15,42 +16,88 @@ os.makedirs(LOCAL_MODELS_DIR, exist_ok=True)
 
 DEPLOY_LIST_FILE = "deploy_list.txt"
 
-def fetch_latest_models_and_results():
-    blob_service = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-    container_client = blob_service.get_container_client(CONTAINER_NAME)
-
-    all_blobs = [b.name for b in container_client.list_blobs(name_starts_with=TRAINING_PREFIX)]
-
-    training_folders = set()
-    for blob_name in all_blobs:
-        parts = blob_name.split("/")
-        if len(parts) > 1 and parts[1].startswith("Training_"):
-            training_folders.add(parts[1])
+DEPLOY_DIR = "deploy/"  # changed files and manifest, copied over the models folder of the VM
 
-    if not training_folders:
-        raise FileNotFoundError("Training folder not found.")
+MANIFEST_FILE = "manifest.json"
 
-    latest_folder = sorted(training_folders, reverse=True)[0]
+def list_latest_model_blobs():
+    # Fallback for trainings published before the manifest, lists every training blob
+    all_blobs = list_blob_names(TRAINING_PREFIX, CONTAINER_NAME)
+    latest_folder = latest_training_folder(all_blobs, TRAINING_PREFIX)
     print(f"Latest training folder found: {latest_folder}")
 
-    model_blobs = [b for b in all_blobs if b.startswith(f"{TRAINING_PREFIX}{latest_folder}/models/") and b.endswith(".onnx")]
+    model_blobs = [
+        b for b in all_blobs
+        if b.startswith(f"{TRAINING_PREFIX}{latest_folder}/models/") and (b.endswith(".onnx") or b.endswith("/feature_spec.json"))
+    ]
     if not model_blobs:
         raise FileNotFoundError(f"No ONNX models found in {latest_folder}.")
+    return latest_folder, model_blobs
 
-    local_models = []
-    for blob_name in model_blobs:
-        local_path = os.path.join(LOCAL_MODELS_DIR, os.path.basename(blob_name))
-        with open(local_path, "wb") as f:
-            f.write(container_client.download_blob(blob_name).readall())
-        local_models.append(local_path)
-        print(f"Downloaded model: {local_path}")
+def fetch_latest_models_and_results():
+    # The manifest of the latest training is read with a single GET, only the models whose checksum changed are downloaded
+    manifest = read_manifest(CONTAINER_NAME)
+    if manifest:
+        print(f"Latest training found in manifest: {manifest['version']}")
+        local_models, downloaded = mirror_files(manifest, LOCAL_MODELS_DIR, CONTAINER_NAME)
+    else:
+        version, model_blobs = list_latest_model_blobs()
+        local_models = downloaded = download_files(model_blobs, LOCAL_MODELS_DIR, CONTAINER_NAME)
+        manifest = {"version": version, "files": {}}
+    for model_path in downloaded:
+        print(f"Downloaded model: {model_path}")
+
+    # Checksums of the local files, keyed by file name, are what the deploy is compared on
+    manifest["files"] = {
+        os.path.basename(path): {"sha256": file_sha256(path), "size": os.path.getsize(path)} for path in local_models
+    }
+    return manifest
+
+def read_deployed_manifest(path):
+    # Manifest fetched from the VM, None when nothing was deployed with a manifest yet. An unreadable manifest raises
+    # rather than redeploying every model
+    if not path or not os.path.exists(path) or os.path.getsize(path) == 0:
+        print("No deployed manifest, every model is deployed")
+        return None
+    with open(path) as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Deployed manifest {path} is not valid JSON: {e}") from e
+
+def deploy_delta(manifest, deployed):
+    # Files whose checksum is not the deployed one, and deployed files that are no longer part of the manifest
+    deployed_files = (deployed or {}).get("files", {})
+    changed = [name for name, entry in sorted(manifest["files"].items()) if deployed_files.get(name, {}).get("sha256") != entry["sha256"]]
+    removed = [name for name in sorted(deployed_files) if name not in manifest["files"]]
+    return changed, removed
+
+def stage_deploy(manifest, deployed=None):
+    changed, removed = deploy_delta(manifest, deployed)
+    print(f"{len(changed)} changed, {len(manifest['files']) - len(changed)} unchanged, {len(removed)} removed files")
+
+    shutil.rmtree(DEPLOY_DIR, ignore_errors=True)
+    os.makedirs(DEPLOY_DIR)
+    deploy_files = []
+    if changed or removed:
+        for name in changed:
+            deploy_files.append(shutil.copy2(os.path.join(LOCAL_MODELS_DIR, name), os.path.join(DEPLOY_DIR, name)))
+        # The manifest lists the models the server loads, a removed model is dropped by leaving it out
+        manifest_path = os.path.join(DEPLOY_DIR, MANIFEST_FILE)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        deploy_files.append(manifest_path)
 
     with open(DEPLOY_LIST_FILE, "w") as f:
-        for model_path in local_models:
-            f.write(f"{os.path.abspath(model_path)}\n")
+        for path in deploy_files:
+            f.write(f"{os.path.abspath(path)}\n")
     print(f"Created deploy list: {DEPLOY_LIST_FILE}")
-
-    return local_models
+    return deploy_files
 
 if __name__ == "__main__":
-    fetch_latest_models_and_results()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--deployed_manifest", help="Manifest fetched from the VM, only files whose checksum differs are deployed")
+
+    args = parser.parse_args()
+
+    stage_deploy(fetch_latest_models_and_results(), read_deployed_manifest(args.deployed_manifest))
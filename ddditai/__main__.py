@@ -0,0 +1,3 @@
+from ddditai.cli import main
+
+main()
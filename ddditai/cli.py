@@ -0,0 +1,185 @@
+import argparse
+from datetime import datetime
+from ddditai.common.artifact_io import ARTIFACT_FORMATS, DEFAULT_ARTIFACT_FORMAT
+from ddditai.common.profiling import StageProfiler, profile_stage
+from ddditai.data.b_data_analysis.analysis_plots import PLOT_MODES, DEFAULT_PLOT_MODE
+from ddditai.model.b_inference.batch_tagging import TAGGING_FORMATS
+from ddditai.model.a_training.training import TRAINING_STRATEGIES, TRAINING_STRATEGY, TRAINING_WORKERS, TUNING, COMPACTION
+
+# --- CONFIGURATION ---
+STAGES = ["extraction", "analysis", "cleaning", "construction", "scaling", "selection", "balancing", "training"]
+
+PREPARATION_STAGES = ["cleaning", "construction", "scaling", "selection", "balancing"]
+
+# CLI stage name -> stage name used by the in-process pipeline
+PIPELINE_STAGE_NAMES = {
+    "cleaning": "data_cleaning",
+    "construction": "feature_construction",
+    "scaling": "feature_scaling",
+    "selection": "feature_selection",
+    "balancing": "data_balancing",
+    "training": "training",
+}
+
+
+def select_stages(first, last, skip=()):
+    first_idx, last_idx = STAGES.index(first), STAGES.index(last)
+    if first_idx > last_idx:
+        raise ValueError(f"Stage '{first}' comes after stage '{last}'")
+    return [stage for stage in STAGES[first_idx:last_idx + 1] if stage not in skip]
+
+def run_stages(stages, run_id=None, artifact_path=None, artifact_format=DEFAULT_ARTIFACT_FORMAT,
+               resume_run_id=None, incremental=False, previous_run_id=None, training_workers=None, training_strategy=None,
+               tune=TUNING, compact=COMPACTION, plots=DEFAULT_PLOT_MODE, profiler=None):
+    # Stages are run in order, a stage that is not selected passes its input on to the next one.
+    # Preparation and training run in process through the pipeline runner, so their intermediate
+    # frames are never downloaded again
+    if "extraction" in stages:
+        from ddditai.data.a_data_extraction.data_extraction import data_extraction_mlflow_run
+
+        with profile_stage(profiler, "extraction"):
+            run_id = data_extraction_mlflow_run(resume_run_id, incremental, previous_run_id, artifact_format, run_next=False)
+        artifact_path = "csv"
+
+    if not run_id or not artifact_path:
+        raise ValueError("--run_id and --artifact_path are required when the extraction is not run")
+
+    if "analysis" in stages:
+        from ddditai.data.b_data_analysis.data_analysis import analyze_mlflow_run
+
+        with profile_stage(profiler, "analysis"):
+            analyze_mlflow_run(run_id, artifact_path, artifact_format, run_next=False, plots=plots)
+
+    pipeline_stages = [PIPELINE_STAGE_NAMES[stage] for stage in stages if stage in PIPELINE_STAGE_NAMES]
+    if pipeline_stages:
+        from ddditai.pipeline import run_pipeline
+
+        run_pipeline(
+            run_id, artifact_path, artifact_format, pipeline_stages, profiler,
+            TRAINING_WORKERS if training_workers is None else training_workers,
+            training_strategy or TRAINING_STRATEGY, tune, compact
+        )
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ddditai", description="Dddit AI data and training pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(subparser, input_required):
+        subparser.add_argument("--run_id", required=input_required, help="MLflow run that produced the input artifact")
+        subparser.add_argument("--artifact_path", required=input_required, help="Artifact path of the input in that run")
+        subparser.add_argument("--artifact_format", choices=ARTIFACT_FORMATS, default=DEFAULT_ARTIFACT_FORMAT)
+        subparser.add_argument("--profile", action="store_true", help="Report wall time and peak RSS of every stage")
+
+    def add_extraction(subparser):
+        subparser.add_argument("--resume", dest="resume_run_id", help="MLflow run id of an interrupted extraction to continue")
+        subparser.add_argument("--incremental", action="store_true", help="Only fetch UID not present in the previous extraction")
+        subparser.add_argument("--previous_run_id", help="Extraction run used by --incremental, defaults to the latest one")
+
+    def add_training(subparser):
+        subparser.add_argument("--training_workers", type=int, help="Tag models trained in parallel, 0 uses every core")
+        subparser.add_argument("--training_strategy", choices=TRAINING_STRATEGIES,
+                               help="ovr trains one model per tag, multiclass and grouped export a single ONNX model")
+        subparser.add_argument("--tune", action="store_true", default=TUNING,
+                               help="Search the XGBoost parameters with successive halving, trials are nested MLflow runs")
+        subparser.add_argument("--compact", action="store_true", default=COMPACTION,
+                               help="Export the fastest compact model whose F1 stays within the configured tolerance")
+
+    def add_analysis(subparser):
+        subparser.add_argument("--plots", choices=PLOT_MODES, default=DEFAULT_PLOT_MODE,
+                               help="none skips the analysis plots, summary renders a single multi-panel figure")
+
+    extract_parser = subparsers.add_parser("extract", help="Extract model metadata from Sketchfab")
+    add_common(extract_parser, input_required=False)
+    add_extraction(extract_parser)
+
+    analyze_parser = subparsers.add_parser("analyze", help="Analyze an extracted dataset")
+    add_common(analyze_parser, input_required=True)
+    add_analysis(analyze_parser)
+
+    prepare_parser = subparsers.add_parser("prepare", help="Run the data preparation stages")
+    add_common(prepare_parser, input_required=True)
+    prepare_parser.add_argument("--skip", nargs="+", choices=PREPARATION_STAGES, default=[])
+
+    train_parser = subparsers.add_parser("train", help="Train the tag models on a prepared dataset")
+    add_common(train_parser, input_required=True)
+    add_training(train_parser)
+
+    run_parser = subparsers.add_parser("run", help="Run the stages between --from and --to")
+    add_common(run_parser, input_required=False)
+    add_extraction(run_parser)
+    add_analysis(run_parser)
+    add_training(run_parser)
+    run_parser.add_argument("--from", dest="first", choices=STAGES, default=STAGES[0])
+    run_parser.add_argument("--to", dest="last", choices=STAGES, default=STAGES[-1])
+    run_parser.add_argument("--skip", nargs="+", choices=STAGES, default=[])
+
+    tag_parser = subparsers.add_parser("tag-directory", help="Tag every FBX file of a directory tree")
+    tag_parser.add_argument("root", help="Directory tree of FBX files")
+    tag_parser.add_argument("--output", required=True, help="Results file, an interrupted run is resumed from it")
+    tag_parser.add_argument("--output_format", choices=TAGGING_FORMATS, default="csv")
+    tag_parser.add_argument("--models_dir", help="Folder of the ONNX models and of feature_spec.json")
+    tag_parser.add_argument("--model_run_id", help="Training run whose models are used instead of --models_dir")
+    tag_parser.add_argument("--workers", type=int, help="Feature extraction processes, 0 uses every core")
+    tag_parser.add_argument("--batch_size", type=int, help="Files run through the models at once")
+    tag_parser.add_argument("--threshold", type=float, help="Probability from which a tag is assigned")
+    return parser
+
+def tag_directory_command(args):
+    from ddditai.model.b_inference import batch_tagging, inference
+
+    models_dir = args.models_dir or inference.MODELS_DIR
+    if args.model_run_id:
+        models_dir = batch_tagging.download_models(args.model_run_id)
+    batch_tagging.tag_directory(
+        args.root, args.output, models_dir, args.output_format,
+        batch_tagging.TAGGING_WORKERS if args.workers is None else args.workers,
+        args.batch_size or batch_tagging.TAGGING_BATCH_SIZE,
+        inference.TAG_THRESHOLD if args.threshold is None else args.threshold
+    )
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "tag-directory":
+        tag_directory_command(args)
+        return
+
+    if args.command == "extract":
+        stages = ["extraction"]
+    elif args.command == "analyze":
+        stages = ["analysis"]
+    elif args.command == "prepare":
+        stages = select_stages(PREPARATION_STAGES[0], PREPARATION_STAGES[-1], args.skip)
+    elif args.command == "train":
+        stages = ["training"]
+    else:
+        try:
+            stages = select_stages(args.first, args.last, args.skip)
+        except ValueError as e:
+            parser.error(str(e))
+        if "extraction" not in stages and not (args.run_id and args.artifact_path):
+            parser.error("--run_id and --artifact_path are required when the extraction is not run")
+
+    print(f"[{datetime.now()}] Running stages: {', '.join(stages)}")
+    profiler = StageProfiler() if args.profile else None
+    try:
+        run_stages(
+            stages, args.run_id, args.artifact_path, args.artifact_format,
+            resume_run_id=getattr(args, "resume_run_id", None),
+            incremental=getattr(args, "incremental", False),
+            previous_run_id=getattr(args, "previous_run_id", None),
+            training_workers=getattr(args, "training_workers", None),
+            training_strategy=getattr(args, "training_strategy", None),
+            tune=getattr(args, "tune", TUNING),
+            compact=getattr(args, "compact", COMPACTION),
+            plots=getattr(args, "plots", DEFAULT_PLOT_MODE),
+            profiler=profiler
+        )
+    finally:
+        if profiler:
+            profiler.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+from pathlib import Path
+
+# --- CONFIGURATION ---
+ARTIFACT_FORMATS = ["csv", "parquet"]
+
+DEFAULT_ARTIFACT_FORMAT = os.getenv("DDDITAI_ARTIFACT_FORMAT", "csv")
+
+PARQUET_COMPRESSION = os.getenv("DDDITAI_PARQUET_COMPRESSION", "zstd")  # "none" disables compression
+
+ARTIFACT_SUFFIXES = {"csv": ".csv", "parquet": ".parquet"}
+
+# Columns with a fixed type across every stage, numeric columns keep the dtype computed by the stage
+STRING_COLUMNS = ["uid", "associated_tag", "pbr_type"]
+
+BOOL_COLUMNS = ["is_age_restricted"]
+
+LIST_COLUMNS = ["user_tags", "user_categories"]
+
+
+def extraction_schema(columns):
+    import pyarrow as pa
+
+    types = {
+        "uid": pa.string(), "associated_tag": pa.string(), "is_age_restricted": pa.bool_(), "pbr_type": pa.string(),
+        "texture_count": pa.int64(), "vertex_count": pa.int64(), "material_count": pa.int64(),
+        "animation_count": pa.int64(), "user_tags": pa.list_(pa.string()), "user_categories": pa.list_(pa.string()),
+        "face_count": pa.int64()
+    }
+    return pa.schema([pa.field(col, types[col]) for col in columns])
+
+def artifact_schema(df):
+    import pandas as pd
+    import pyarrow as pa
+
+    fields = []
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    for field in inferred:
+        if field.name in STRING_COLUMNS:
+            field = pa.field(field.name, pa.string())
+        elif field.name in BOOL_COLUMNS and pd.api.types.is_bool_dtype(df[field.name]):
+            field = pa.field(field.name, pa.bool_())
+        elif field.name in LIST_COLUMNS:
+            field = pa.field(field.name, pa.list_(pa.string()))
+        fields.append(field)
+    return pa.schema(fields)
+
+def find_artifact_file(artifact_local_path):
+    # Parquet is preferred when a stage logged both formats
+    files = sorted(os.listdir(artifact_local_path))
+    for suffix in (".parquet", ".csv"):
+        matches = [f for f in files if f.endswith(suffix)]
+        if matches:
+            return Path(artifact_local_path) / matches[0]
+    raise FileNotFoundError("No CSV or Parquet file found in artifact folder")
+
+def read_artifact_frame(file_path):
+    import pandas as pd
+
+    file_path = Path(file_path)
+    if file_path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        # Memory-mapped read, a directory of part files is read as a single dataset
+        return pq.read_table(file_path, memory_map=True).to_pandas()
+    return pd.read_csv(file_path)
+
+def load_artifact_frame(artifact_local_path):
+    return read_artifact_frame(find_artifact_file(artifact_local_path))
+
+def download_artifact_frame(run_id, artifact_path):
+    import mlflow
+
+    return load_artifact_frame(mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path=artifact_path))
+
+def save_artifact_frame(df, path, artifact_format=DEFAULT_ARTIFACT_FORMAT):
+    # path is given without suffix, the saved file path is returned
+    if artifact_format not in ARTIFACT_FORMATS:
+        raise ValueError(f"Unknown artifact format '{artifact_format}', expected one of {ARTIFACT_FORMATS}")
+    file_path = Path(path).with_suffix(ARTIFACT_SUFFIXES[artifact_format])
+    if artifact_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, schema=artifact_schema(df), preserve_index=False)
+        compression = None if PARQUET_COMPRESSION == "none" else PARQUET_COMPRESSION
+        pq.write_table(table, file_path, compression=compression)
+    else:
+        df.to_csv(file_path, index=False)
+    return file_path
+
+def stringify_list_columns(df):
+    # List columns read from Parquet are not hashable, they get the same representation they have in a CSV
+    import pandas as pd
+
+    for col in LIST_COLUMNS:
+        if col in df.columns and not pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].map(lambda v: str(list(v)) if v is not None else v)
+    return df
@@ -0,0 +1,155 @@
+import os
+import json
+import atexit
+import hashlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIGURATION ---
+AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")  # "UseDevelopmentStorage=true" targets a local Azurite
+
+AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME", "mlflow")
+
+TRANSFER_CONCURRENCY = int(os.getenv("DDDITAI_BLOB_CONCURRENCY", "4"))  # parallel block transfers of one blob
+
+BLOCK_SIZE = 4 * 1024 * 1024  # chunk of a blob transferred by a single request, larger blobs are split
+
+DOWNLOAD_WORKERS = int(os.getenv("DDDITAI_BLOB_DOWNLOAD_WORKERS", "4"))  # blobs downloaded at the same time
+
+UPLOAD_QUEUE_WORKERS = 2  # background uploads running at the same time
+
+MANIFEST_BLOB = "training/latest.json"  # manifest of the latest training, read with a single GET instead of a listing
+
+
+def storage_configured():
+    return bool(AZURE_CONNECTION_STRING) or bool(_clients)
+
+# --- SHARED CLIENT ---
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_container_client(container=AZURE_CONTAINER_NAME):
+    # One client per container for the whole process, its HTTP connections are reused by every transfer
+    with _clients_lock:
+        if container not in _clients:
+            from azure.storage.blob import BlobServiceClient
+
+            service = BlobServiceClient.from_connection_string(
+                AZURE_CONNECTION_STRING, max_block_size=BLOCK_SIZE, max_single_put_size=BLOCK_SIZE,
+                max_chunk_get_size=BLOCK_SIZE, max_single_get_size=BLOCK_SIZE
+            )
+            _clients[container] = service.get_container_client(container)
+        return _clients[container]
+
+def set_container_client(client, container=AZURE_CONTAINER_NAME):
+    # Replaces the client of a container, e.g. with one bound to an Azurite emulator or a local fake
+    with _clients_lock:
+        _clients[container] = client
+
+# --- TRANSFERS ---
+def upload_file(file_path, blob_name, container=AZURE_CONTAINER_NAME):
+    # The file is streamed in BLOCK_SIZE blocks, TRANSFER_CONCURRENCY of them in flight
+    if not storage_configured():
+        return False
+    with open(file_path, "rb") as data:
+        get_container_client(container).upload_blob(name=blob_name, data=data, overwrite=True, max_concurrency=TRANSFER_CONCURRENCY)
+    return True
+
+def download_file(blob_name, local_path, container=AZURE_CONTAINER_NAME):
+    # Blocks are written to disk as they arrive, a partial download never replaces local_path
+    partial_path = f"{local_path}.part"
+    with open(partial_path, "wb") as f:
+        get_container_client(container).download_blob(blob_name, max_concurrency=TRANSFER_CONCURRENCY).readinto(f)
+    os.replace(partial_path, local_path)
+    return local_path
+
+def download_files(blob_names, local_dir, container=AZURE_CONTAINER_NAME):
+    # Local paths in the order of blob_names, every blob is saved under its base name
+    os.makedirs(local_dir, exist_ok=True)
+    local_paths = [os.path.join(local_dir, os.path.basename(blob_name)) for blob_name in blob_names]
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="blob-download") as executor:
+        list(executor.map(lambda args: download_file(*args, container), zip(blob_names, local_paths)))
+    return local_paths
+
+def list_blob_names(prefix, container=AZURE_CONTAINER_NAME):
+    return [blob.name for blob in get_container_client(container).list_blobs(name_starts_with=prefix)]
+
+def latest_training_folder(blob_names, prefix="training/"):
+    # Training folders are named Training_<timestamp>, the latest sorts last
+    folders = {name[len(prefix):].split("/")[0] for name in blob_names if name.startswith(prefix)}
+    folders = sorted(folder for folder in folders if folder.startswith("Training_"))
+    if not folders:
+        raise FileNotFoundError("Training folder not found.")
+    return folders[-1]
+
+# --- MANIFEST ---
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def upload_json(data, blob_name, container=AZURE_CONTAINER_NAME):
+    if not storage_configured():
+        return False
+    get_container_client(container).upload_blob(name=blob_name, data=json.dumps(data, indent=2, default=float).encode(), overwrite=True)
+    return True
+
+def download_json(blob_name, container=AZURE_CONTAINER_NAME):
+    from azure.core.exceptions import ResourceNotFoundError
+
+    try:
+        return json.loads(get_container_client(container).download_blob(blob_name).readall())
+    except ResourceNotFoundError:
+        return None
+
+def read_manifest(container=AZURE_CONTAINER_NAME):
+    # None when no training published a manifest yet
+    return download_json(MANIFEST_BLOB, container)
+
+def mirror_files(manifest, local_dir, container=AZURE_CONTAINER_NAME):
+    # Only the files of the manifest whose checksum differs from the local copy are downloaded.
+    # Returns the local paths of every file of the manifest and the ones that were downloaded
+    local_paths, changed = [], []
+    for name, entry in sorted(manifest["files"].items()):
+        local_path = os.path.join(local_dir, name)
+        local_paths.append(local_path)
+        if not os.path.exists(local_path) or file_sha256(local_path) != entry["sha256"]:
+            changed.append(entry["blob"])
+    downloaded = download_files(changed, local_dir, container) if changed else []
+    return local_paths, downloaded
+
+# --- BACKGROUND UPLOADS ---
+_uploader = None
+_pending_uploads = []
+_uploader_lock = threading.Lock()
+
+def upload_in_background(file_path, blob_name, container=AZURE_CONTAINER_NAME):
+    # Queued uploads run while the caller goes on with the next stage, wait_for_uploads reports their errors
+    global _uploader
+    if not storage_configured():
+        return None
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = ThreadPoolExecutor(max_workers=UPLOAD_QUEUE_WORKERS, thread_name_prefix="blob-upload")
+            atexit.register(wait_for_uploads)
+        future = _uploader.submit(upload_file, file_path, blob_name, container)
+        _pending_uploads.append((blob_name, future))
+    return future
+
+def wait_for_uploads():
+    with _uploader_lock:
+        pending = list(_pending_uploads)
+        _pending_uploads.clear()
+    errors = []
+    for blob_name, future in pending:
+        try:
+            future.result()
+        except Exception as e:
+            errors.append(e)
+            print(f"[{datetime.now()}] Error during Azure upload of {blob_name}: {e}")
+    if pending and not errors:
+        print(f"[{datetime.now()}] {len(pending)} files uploaded to Azure Blob Storage")
+    return errors
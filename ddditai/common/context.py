@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+# --- CONFIGURATION ---
+EXPERIMENT_NAME = "Sketchfab_Experiment"
+
+DATA_EXPERIMENT_DESCRIPTION = (
+    "This experiment implements commit 7dc8442 of the Data Understanding document and commit 7bddc87 of Data Preparation document."
+)
+
+MODELING_EXPERIMENT_DESCRIPTION = (
+    "This experiment implements commit 7801a59 of the Modeling document."
+)
+
+
+class PipelineContext:
+    # Settings shared by every stage. Nothing is read or created when a module is imported: the environment
+    # is read when the context is created and the MLflow experiment is set up the first time a stage needs it.
+    # The context only holds plain values, so it can be passed to worker processes.
+    def __init__(self, tracking_uri=None, experiment_name=EXPERIMENT_NAME, artifact_base_folder=None):
+        self.tracking_uri = tracking_uri or os.getenv("MLFLOW_TRACKING_URI")
+        self.experiment_name = experiment_name
+        if artifact_base_folder is None:
+            # ATTENTION: at the moment mlflow run locally, if moved on a VM or external server make sure to change the path
+            artifact_base_folder = Path(os.environ["LOCALAPPDATA"]) / "MLflow" / "artifacts"
+        self.artifact_base_folder = Path(artifact_base_folder)
+        self.experiment_ready = False
+
+    def setup_experiment(self, description=DATA_EXPERIMENT_DESCRIPTION):
+        if self.experiment_ready:
+            return self
+        import mlflow
+
+        mlflow.set_tracking_uri(self.tracking_uri)
+        self.artifact_base_folder.mkdir(parents=True, exist_ok=True)
+
+        if not mlflow.get_experiment_by_name(self.experiment_name):
+            mlflow.create_experiment(
+                name=self.experiment_name,
+                artifact_location=f"file:///{self.artifact_base_folder.resolve().as_posix()}",
+                tags={"mlflow.note.content": description}
+            )
+
+        mlflow.set_experiment(self.experiment_name)
+        self.experiment_ready = True
+        return self
+
+    def __getstate__(self):
+        # MLflow state is per process, a worker sets the experiment up again
+        return {**self.__dict__, "experiment_ready": False}
+
+
+_context = None
+
+
+def get_context(description=DATA_EXPERIMENT_DESCRIPTION):
+    # Context of the current process, created from the environment and set up on first use
+    global _context
+    if _context is None:
+        _context = PipelineContext()
+    return _context.setup_experiment(description)
+
+def set_context(context):
+    global _context
+    _context = context
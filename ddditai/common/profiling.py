@@ -0,0 +1,63 @@
+import os
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# --- CONFIGURATION ---
+RSS_SAMPLE_INTERVAL = 0.05  # seconds between two resident memory samples
+
+
+def current_rss():
+    # Resident memory of the process and of its worker processes
+    import psutil
+
+    process = psutil.Process(os.getpid())
+    rss = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return rss
+
+
+class StageProfiler:
+    # Wall time and peak resident memory of every stage, memory is sampled by a background thread
+    # while the stage is running because the process peak alone would not tell which stage caused it
+    def __init__(self, sample_interval=RSS_SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        peak_rss = [current_rss()]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(self.sample_interval):
+                peak_rss[0] = max(peak_rss[0], current_rss())
+
+        sampler = threading.Thread(target=sample, name=f"rss-sampler-{name}", daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_seconds = time.perf_counter() - start
+            stop.set()
+            sampler.join()
+            peak_rss[0] = max(peak_rss[0], current_rss())
+            self.records.append({"stage": name, "wall_seconds": wall_seconds, "peak_rss_mb": peak_rss[0] / 1024 ** 2})
+
+    def report(self):
+        print(f"[{datetime.now()}] Stage profile")
+        print(f"{'stage':<24}{'wall time (s)':>16}{'peak RSS (MB)':>16}")
+        for record in self.records:
+            print(f"{record['stage']:<24}{record['wall_seconds']:>16.2f}{record['peak_rss_mb']:>16.1f}")
+        print(f"{'total':<24}{sum(r['wall_seconds'] for r in self.records):>16.2f}"
+              f"{max((r['peak_rss_mb'] for r in self.records), default=0):>16.1f}")
+
+
+def profile_stage(profiler, name):
+    return profiler.stage(name) if profiler else nullcontext()
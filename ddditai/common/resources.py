@@ -0,0 +1,8 @@
+import os
+
+
+def available_cores():
+    # Cores this process may run on, fewer than the machine has when its CPU affinity is restricted
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
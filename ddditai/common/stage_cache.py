@@ -0,0 +1,75 @@
+import os
+import json
+import inspect
+import hashlib
+from ddditai.common.artifact_io import LIST_COLUMNS, download_artifact_frame, stringify_list_columns
+
+# --- CONFIGURATION ---
+FINGERPRINT_TAG = "ddditai.stage_fingerprint"
+
+STAGE_CACHE_ENABLED = os.getenv("DDDITAI_STAGE_CACHE", "1") != "0"
+
+
+def frame_hash(df):
+    import pandas as pd
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    if any(col in df.columns for col in LIST_COLUMNS):
+        df = stringify_list_columns(df.copy())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+def code_version(*functions):
+    # Names of the functions and source of the modules defining them, so that a change to a helper they call in the
+    # same module gives a new fingerprint. Helpers of another module are covered only when one of its functions is listed
+    digest = hashlib.sha256()
+    modules = []
+    for function in functions:
+        digest.update(f"{function.__module__}.{function.__qualname__}".encode())
+        module = inspect.getmodule(function)
+        if module not in modules:
+            modules.append(module)
+    for module in modules:
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+def stage_fingerprint(stage_name, input_id, functions, params):
+    payload = {
+        "stage": stage_name,
+        "input": input_id,
+        "code": code_version(*functions),
+        "params": {key: str(value) for key, value in params.items()}
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def run_fingerprint(run_id):
+    # Output of a fingerprinted stage is identified by the fingerprint of the run that produced it,
+    # so a chain of cached stages is resolved without downloading or hashing intermediate artifacts
+    from mlflow.tracking import MlflowClient
+
+    if not run_id:
+        return None
+    return MlflowClient().get_run(run_id).data.tags.get(FINGERPRINT_TAG)
+
+def input_identity(run_id, artifact_path):
+    # Returns the identity of the input and the frame if it had to be loaded to compute it
+    fingerprint = run_fingerprint(run_id)
+    if fingerprint:
+        return fingerprint, None
+    df = download_artifact_frame(run_id, artifact_path)
+    return frame_hash(df), df
+
+def find_cached_run(fingerprint):
+    if not STAGE_CACHE_ENABLED:
+        return None
+    import mlflow
+
+    runs = mlflow.search_runs(
+        filter_string=f"tags.`{FINGERPRINT_TAG}` = '{fingerprint}' AND attributes.status = 'FINISHED'",
+        order_by=["attributes.start_time DESC"],
+        max_results=1
+    )
+    if runs.empty:
+        return None
+    return runs.iloc[0]["run_id"]
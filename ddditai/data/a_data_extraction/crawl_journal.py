@@ -0,0 +1,77 @@
+import json
+import threading
+from pathlib import Path
+from ddditai.data.a_data_extraction.extraction_writer import truncate_partial_line
+
+
+class CrawlJournal:
+    # Append-only JSON lines journal, every record is flushed as soon as the crawl makes progress
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tags = {}
+        self.fetched = set()
+        self.failed = set()
+        self._lock = threading.Lock()
+        if self.path.exists():
+            # The record cut by a crash is dropped, records appended by the resumed run start on a new line
+            truncate_partial_line(self.path)
+            self._replay()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self):
+        with open(self.path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line can be truncated if the process died while writing it
+                    break
+                self._apply(record)
+
+    def _apply(self, record):
+        event = record["event"]
+        if event == "page":
+            state = self.tag_state(record["tag"])
+            state["next"] = record["next"]
+            state["uids"].extend(record["uids"])
+        elif event == "uids_complete":
+            state = self.tag_state(record["tag"])
+            state["complete"] = True
+            state["target"] = record.get("target")  # missing in journals written before the target was recorded
+        elif event == "model":
+            self.fetched.add(record["uid"])
+            self.failed.discard(record["uid"])
+        elif event == "failed":
+            self.failed.add(record["uid"])
+
+    def _write(self, record):
+        with self._lock:
+            self._apply(record)
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def tag_state(self, tag):
+        return self.tags.setdefault(tag, {"next": None, "uids": [], "complete": False, "target": None})
+
+    def record_page(self, tag, next_url, uids):
+        self._write({"event": "page", "tag": tag, "next": next_url, "uids": uids})
+
+    def record_uids_complete(self, tag, target):
+        # target is the number of models per tag the collection was asked for, a larger one reopens the tag
+        self._write({"event": "uids_complete", "tag": tag, "target": target})
+
+    def record_model(self, uid):
+        self._write({"event": "model", "uid": uid})
+
+    def record_failure(self, uid):
+        self._write({"event": "failed", "uid": uid})
+
+    def collected_uids(self):
+        return {uid for state in self.tags.values() for uid in state["uids"]}
+
+    def failed_count(self):
+        return len(self.failed)
+
+    def close(self):
+        self._file.close()
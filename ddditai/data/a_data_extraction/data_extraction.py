@@ -1,35 +1,22 @@
 import os
-import time
-import requests
-import mlflow
-import pandas as pd
-from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import ast
+import asyncio
+import argparse
 from datetime import datetime
-from azure.storage.blob import BlobServiceClient
+from ddditai.common.artifact_io import ARTIFACT_FORMATS, ARTIFACT_SUFFIXES, DEFAULT_ARTIFACT_FORMAT, download_artifact_frame
+from ddditai.common.blob_storage import upload_in_background
+from ddditai.common.context import get_context
+from ddditai.data.a_data_extraction.crawl_journal import CrawlJournal
+from ddditai.data.a_data_extraction.extraction_writer import ExtractionWriter
+from ddditai.data.a_data_extraction.response_cache import ResponseCache, CACHE_PATH
+from ddditai.data.a_data_extraction.sketchfab_client import crawl, API_BASE, PAGE_SIZE, REQUESTS_PER_MINUTE, BURST_SIZE, MAX_CONNECTIONS
 from ddditai.data.b_data_analysis.data_analysis import analyze_mlflow_run
 
 # --- CONFIGURATION ---
-API_BASE = "https://api.sketchfab.com/v3"
-
 TOTAL_MODELS_PER_TAG = 16
 
-BATCH_SIZE = 16
-
-MAX_WORKERS = 4
-
-PAUSE_BETWEEN_REQUESTS = 2  # seconds
-
-PAUSE_EVERY_N_REQUESTS = 32
-
-PAUSE_DURATION = 90  # seconds
-
 SEARCH_TAGS = ["lowpoly", "highpoly", "prop", "character", "environment", "weapon", "realistic", "stylized"]
 
-AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-
-AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME", "mlflow")
-
 TOKENS = [
     os.getenv("SKETCHFAB_TOKEN_1"),
     os.getenv("SKETCHFAB_TOKEN_2"),
@@ -37,243 +24,195 @@ TOKENS = [
     os.getenv("SKETCHFAB_TOKEN_4")
 ]
 
-requests_count = [0,0,0,0] # A request count per thread
+MODEL_COLUMNS = [
+    "uid", "associated_tag", "is_age_restricted", "pbr_type", "texture_count",
+    "vertex_count", "material_count", "animation_count",
+    "user_tags", "user_categories", "face_count"
+]
 
-# --- REQUEST FUNCTIONS ---
-def now():
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# --- INCREMENTAL EXTRACTION FUNCTIONS ---
+def find_previous_extraction_run():
+    import mlflow
 
-def request_with_backoff(url, params=None, headers=None, max_retries=10):
-    backoff = 1
-    retries = 0
-    while retries < max_retries:
-        try:
-            resp = requests.get(url, params=params, headers=headers)
-            if resp.status_code == 200:
-                return resp
-            if resp.status_code == 429:
-                retry_after = resp.headers.get("Retry-After")
-                if retry_after:
-                    time.sleep(int(retry_after) + 1)
-                else:
-                    time.sleep(backoff)
-                    backoff = min(backoff * 2, 3600)
-                retries += 1
-                continue
-            time.sleep(backoff)
-            backoff = min(backoff * 2, 3600)
-            retries += 1
-        except requests.exceptions.RequestException:
-            time.sleep(backoff)
-            backoff = min(backoff * 2, 3600)
-            retries += 1
-    return requests.Response()
-
-def fetch_model_data(uid, token, thread_name="Thread"):
-    global requests_count
-    headers = {"Authorization": f"Token {token}"}
-    url = f"{API_BASE}/models/{uid}"
-    time.sleep(PAUSE_BETWEEN_REQUESTS)
-    try:
-        resp = request_with_backoff(url, headers=headers)
-        thread_num = int(thread_name.split("-")[1])
-        idx = thread_num - 1
-        requests_count[idx] += 1
-        print(f"[{now()}] [{thread_name}] Requests count up to {requests_count} requests")
-        if requests_count[idx] % PAUSE_EVERY_N_REQUESTS == 0:
-            print(f"[{now()}] [{thread_name}] Pause of {PAUSE_DURATION} sec after {requests_count} requests")
-            time.sleep(PAUSE_DURATION)
-
-        if resp.status_code != 200:
-            return None, None
-        data = resp.json()
-        tags = [t.get("slug", "") for t in data.get("tags", [])]
-        if "noAI" in tags:
-            return None, None
-        tags = ["realistic-style" if t == "realistic" else t for t in tags]
-        model_info = [
-            uid,
-            "",  # placeholder tag, will be populated after
-            data.get("isAgeRestricted", False),
-            data.get("pbrType", ""),
-            data.get("textureCount", 0),
-            data.get("vertexCount", 0),
-            data.get("materialCount", 0),
-            data.get("animationCount", 0),
-            tags,
-            [c.get("name", "") for c in data.get("categories", [])],
-            data.get("faceCount", 0)
-        ]
-        author_info = (uid, data.get("user", {}).get("displayName", "unknown"))
-        return model_info, author_info
-    except Exception:
-        return None, None
-
-def fetch_model_uids(tag, total_models, token, thread_name="Thread"):
-    global requests_count
-    uids = []
-    offset = 0
-    headers = {"Authorization": f"Token {token}"}
-    while len(uids) < total_models:
-        params = {"tags": tag, "limit": BATCH_SIZE, "offset": offset}
-        resp = request_with_backoff(f"{API_BASE}/models", params=params, headers=headers)
-        thread_num = int(thread_name.split("-")[1])
-        idx = thread_num - 1
-        requests_count[idx] += 1
-        print(f"[{now()}] [{thread_name}] Requests count up to {requests_count} requests")
-        if requests_count[idx] % PAUSE_EVERY_N_REQUESTS == 0:
-            print(f"[{now()}] [{thread_name}] Pause of {PAUSE_DURATION} sec after {requests_count} requests")
-            time.sleep(PAUSE_DURATION)
-
-        if resp.status_code != 200:
-            break
-        results = resp.json().get("results", [])
-        if not results:
-            break
-        for model in results:
-            uid = model["uid"]
-            tags_model = [t["slug"] for t in model.get("tags", [])]
-            if "noAI" not in tags_model:
-                uids.append(uid)
-        offset += BATCH_SIZE
-        time.sleep(PAUSE_BETWEEN_REQUESTS)
-    return uids[:total_models]
-
-def fetch_model_data_with_tag(uid, tag, token, thread_name="Thread"):
-    model_info, author_info = fetch_model_data(uid, token, thread_name)
-    if model_info:
-        tag_value = "realistic-style" if tag == "realistic" else tag
-        model_info[1] = tag_value
-    return model_info, author_info
-
-def worker_thread(thread_tags, token, thread_name):
-    start_time = now()
-    print(f"[{start_time}] [{thread_name}] Started with tag: {thread_tags}")
-    thread_results = []
-
-    for tag in thread_tags:
-        print(f"[{now()}] [{thread_name}] Starting collection of UID for tag '{tag}'")
-        model_uids = fetch_model_uids(tag, TOTAL_MODELS_PER_TAG, token, thread_name=thread_name)
-        total_models_tag = len(model_uids)
-        print(f"[{now()}] [{thread_name}] Collected {total_models_tag} UID for tag '{tag}'")
-
-        for idx, uid in enumerate(model_uids, 1):
-            model_info, author_info = fetch_model_data_with_tag(uid, tag, token, thread_name=thread_name)
-            thread_results.append((model_info, author_info))
-            print(f"[{now()}] [{thread_name}] Analyzed model {idx}/{total_models_tag} with UID '{uid}' for tag '{tag}'")
-
-    end_time = now()
-    print(f"[{end_time}] [{thread_name}] terminated")
-    return thread_results
-
-# --- MAIN MLFLOW PIPELINE ---
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-EXPERIMENT_NAME = "Sketchfab_Experiment"
-
-mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
-
-# ATTENTION: at the moment mlflow run locally, if moved on a VM or external server make sure to change the path
-local_appdata = Path(os.environ['LOCALAPPDATA'])
-artifact_base_folder = local_appdata / "MLflow" / "artifacts"
-artifact_base_folder.mkdir(parents=True, exist_ok=True)
-
-experiment_description = (
-"This experiment implements commit 7dc8442 of the Data Understanding document and commit 7bddc87 of Data Preparation document."
-)
-experiment_tags = {
-    "mlflow.note.content": experiment_description,
-}
-
-if not mlflow.get_experiment_by_name(EXPERIMENT_NAME):
-    mlflow.create_experiment(
-        name=EXPERIMENT_NAME,
-        artifact_location=f"file:///{artifact_base_folder.resolve().as_posix()}",
-        tags=experiment_tags
+    runs = mlflow.search_runs(
+        experiment_names=[get_context().experiment_name],
+        filter_string="attributes.run_name LIKE 'Data_Extraction_%' AND attributes.status = 'FINISHED'",
+        order_by=["attributes.start_time DESC"],
+        max_results=1
     )
+    if runs.empty:
+        raise FileNotFoundError("No previous data extraction run found for incremental mode")
+    return runs.iloc[0]["run_id"]
 
-mlflow.set_experiment(EXPERIMENT_NAME)
-
-run_name = f"Data_Extraction_{timestamp}"
-
-with mlflow.start_run(run_name=run_name) as run:
-    run_id = run.info.run_id
-    print(f"Run ID: {run_id}")
-
-    run_folder = artifact_base_folder / run_id
-    csv_folder = run_folder / "sketchfab_models_data"
-    txt_folder = run_folder / "credits"
+def resumed_run_settings(resume_run_id):
+    # Settings an interrupted run was started with, a resumed run keeps them like it keeps its journal so that
+    # its output is not written in two formats or refreshed against another previous run
+    from mlflow.tracking import MlflowClient
 
-    csv_folder.mkdir(parents=True, exist_ok=True)
-    txt_folder.mkdir(parents=True, exist_ok=True)
+    params = MlflowClient().get_run(resume_run_id).data.params
+    return {
+        "artifact_format": params.get("artifact_format", "csv"),  # runs started before the parameter existed wrote CSV
+        "incremental": params.get("incremental") == "True",
+        "previous_run_id": params.get("previous_run_id"),
+    }
 
-    csv_path = csv_folder / "sketchfab_models.csv"
-    txt_path = txt_folder / "sketchfab_authors.txt"
+def load_previous_models(previous_run_id):
+    import mlflow
 
-    mlflow.log_param("tags", str(SEARCH_TAGS))
-    mlflow.log_param("total_models_per_tag", TOTAL_MODELS_PER_TAG)
-    mlflow.log_param("batch_size", BATCH_SIZE)
-    mlflow.log_param("max_workers", MAX_WORKERS)
-    mlflow.log_param("pause_between_requests", PAUSE_BETWEEN_REQUESTS)
-    mlflow.log_param("pause_every_n_requests", PAUSE_EVERY_N_REQUESTS)
-    mlflow.log_param("pause_duration", PAUSE_DURATION)
+    previous_df = download_artifact_frame(previous_run_id, "csv")[MODEL_COLUMNS]
+    previous_df = previous_df.astype(object).where(previous_df.notna(), None)
 
-    # Tags association for thread
-    thread_tag_chunks = [SEARCH_TAGS[i::MAX_WORKERS] for i in range(MAX_WORKERS)]
-
-    all_models = []
-    all_authors = []
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, \
-         open(txt_path, "w", encoding="utf-8") as txtfile:
-
-        futures = []
-        for i in range(MAX_WORKERS):
-            futures.append(executor.submit(worker_thread, thread_tag_chunks[i], TOKENS[i], f"Thread-{i+1}"))
-
-        for future in as_completed(futures):
-            thread_results = future.result()
-            for model_info, author_info in thread_results:
-                if model_info:
-                    all_models.append(model_info)
-                if author_info:
-                    txtfile.write(f"{author_info[0]},{author_info[1]}\n")
-
-    # Dataframe creation
-    df = pd.DataFrame(all_models, columns=[
-        "uid", "associated_tag", "is_age_restricted", "pbr_type", "texture_count",
-        "vertex_count", "material_count", "animation_count",
-        "user_tags", "user_categories", "face_count"
-    ])
-    df.to_csv(csv_path, index=False)
-
-    mlflow.log_artifact(str(csv_path), artifact_path="csv")
-    mlflow.log_artifact(str(txt_path), artifact_path="txt")
-
-    timestamp_start = datetime.now()
-    timestamp_end = datetime.now()
-    delta = timestamp_end - timestamp_start
-    total_seconds = int(delta.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
-
-    mlflow.log_param("total_duration", f"{hours}h {minutes}m {seconds}s")
-
-    # Upload on Azure Blob Storage
-    if AZURE_CONNECTION_STRING:
+    authors = {}
+    try:
+        txt_local_path = mlflow.artifacts.download_artifacts(run_id=previous_run_id, artifact_path="txt")
+        for txt_file in [f for f in os.listdir(txt_local_path) if f.endswith(".txt")]:
+            with open(os.path.join(txt_local_path, txt_file), encoding="utf-8") as f:
+                for line in f:
+                    uid, _, author = line.rstrip("\n").partition(",")
+                    authors[uid] = author
+    except Exception as e:
+        print(f"[{datetime.now()}] Authors of previous run not available: {e}")
+
+    previous_rows = []
+    known_models = {}
+    for row in previous_df.itertuples(index=False):
+        model_info = list(row)
+        # List columns are stored as their string representation in the CSV and as arrays in Parquet
+        for idx in (MODEL_COLUMNS.index("user_tags"), MODEL_COLUMNS.index("user_categories")):
+            if isinstance(model_info[idx], str):
+                model_info[idx] = ast.literal_eval(model_info[idx])
+            elif model_info[idx] is not None:
+                model_info[idx] = list(model_info[idx])
+        author_info = (model_info[0], authors.get(model_info[0], "unknown"))
+        previous_rows.append((model_info, author_info))
+        known_models[model_info[0]] = (model_info, author_info)
+    return previous_rows, known_models
+
+def data_extraction_mlflow_run(resume_run_id: str = None, incremental: bool = False, previous_run_id: str = None,
+                               artifact_format: str = DEFAULT_ARTIFACT_FORMAT, run_next: bool = True):
+    import mlflow
+
+    context = get_context()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    run_name = f"Data_Extraction_{timestamp}"
+
+    if resume_run_id:
+        settings = resumed_run_settings(resume_run_id)
+        if settings["artifact_format"] != artifact_format:
+            print(f"[{datetime.now()}] Run {resume_run_id} was started in {settings['artifact_format']} format, it is resumed in that format")
+        artifact_format, incremental, previous_run_id = settings["artifact_format"], settings["incremental"], settings["previous_run_id"]
+
+    previous_rows = []
+    known_models = {}
+    if incremental:
+        previous_run_id = previous_run_id or find_previous_extraction_run()
+        previous_rows, known_models = load_previous_models(previous_run_id)
+        print(f"[{datetime.now()}] Incremental mode: {len(known_models)} UID already extracted by run {previous_run_id}")
+
+    # A resumed run continues the same MLflow run and its checkpoint journal
+    run_args = {"run_id": resume_run_id} if resume_run_id else {"run_name": run_name}
+
+    with mlflow.start_run(**run_args) as run:
+        run_id = run.info.run_id
+        print(f"Run ID: {run_id}")
+
+        run_folder = context.artifact_base_folder / run_id
+        csv_folder = run_folder / "sketchfab_models_data"
+        txt_folder = run_folder / "credits"
+        checkpoint_folder = run_folder / "checkpoint"
+
+        csv_folder.mkdir(parents=True, exist_ok=True)
+        txt_folder.mkdir(parents=True, exist_ok=True)
+
+        csv_path = csv_folder / f"sketchfab_models{ARTIFACT_SUFFIXES[artifact_format]}"
+        txt_path = txt_folder / "sketchfab_authors.txt"
+        journal_path = checkpoint_folder / "crawl_journal.jsonl"
+
+        if not resume_run_id:
+            mlflow.log_param("tags", str(SEARCH_TAGS))
+            mlflow.log_param("total_models_per_tag", TOTAL_MODELS_PER_TAG)
+            mlflow.log_param("page_size", PAGE_SIZE)
+            mlflow.log_param("tokens", sum(1 for token in TOKENS if token))
+            mlflow.log_param("requests_per_minute", REQUESTS_PER_MINUTE)
+            mlflow.log_param("burst_size", BURST_SIZE)
+            mlflow.log_param("max_connections", MAX_CONNECTIONS)
+            mlflow.log_param("cache_path", str(CACHE_PATH))
+            mlflow.log_param("incremental", incremental)
+            mlflow.log_param("artifact_format", artifact_format)
+            if incremental:
+                mlflow.log_param("previous_run_id", previous_run_id)
+        elif not journal_path.exists():
+            raise FileNotFoundError(f"No checkpoint journal found for run {resume_run_id}")
+
+        timestamp_start = datetime.now()
+
+        # Tags are crawled concurrently, each request uses whichever token has budget left
+        # Responses already stored by previous runs are served from the local cache
+        # Progress is journaled and rows are appended to the output files while the crawl is running,
+        # so an interrupted crawl can be resumed with --resume
+        response_cache = ResponseCache(CACHE_PATH)
+        journal = CrawlJournal(journal_path)
+        writer = ExtractionWriter(csv_path, txt_path, MODEL_COLUMNS, output_format=artifact_format)
+        if resume_run_id:
+            print(f"[{datetime.now()}] Resuming crawl with {len(writer.written_pairs)} rows already extracted")
         try:
-            blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-            container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
-
-            for file_path, subfolder in [(csv_path, "data_extraction/csv"), (txt_path, "data_extraction/txt")]:
-                blob_name = f"{EXPERIMENT_NAME}/{run_id}/{subfolder}/{file_path.name}"
-                with open(file_path, "rb") as data:
-                    container_client.upload_blob(name=blob_name, data=data, overwrite=True)
-            print(f"[{datetime.now()}] CSV and TXT uploaded to '{AZURE_CONTAINER_NAME}' Azure container")
-        except Exception as e:
-            print(f"[{datetime.now()}] Error during Azure uploading : {e}")
-
-if mlflow.active_run():
-    mlflow.end_run()
-
-analyze_mlflow_run(run_id, "csv")
\ No newline at end of file
+            crawl_stats = asyncio.run(crawl(
+                SEARCH_TAGS, TOTAL_MODELS_PER_TAG, TOKENS, writer, api_base=API_BASE,
+                cache=response_cache, journal=journal, known_models=known_models
+            ))
+            # Models of the previous run that were not found again are kept in the refreshed dataset, the ones found
+            # again were written by the crawl with their current tags
+            found_again = journal.collected_uids()
+            for model_info, author_info in previous_rows:
+                if model_info[0] not in found_again:
+                    writer.write_model(model_info)
+                    writer.write_author(author_info)
+        finally:
+            writer.close()
+            journal.close()
+            response_cache.close()
+        mlflow.log_metrics(response_cache.stats())
+        mlflow.log_metrics(crawl_stats)
+        mlflow.log_metric("rows_written", len(writer.written_pairs))
+        mlflow.log_metric("failed_models", journal.failed_count())
+
+        mlflow.log_artifact(str(csv_path), artifact_path="csv")
+        mlflow.log_artifact(str(txt_path), artifact_path="txt")
+        mlflow.log_artifact(str(journal_path), artifact_path="checkpoint")
+
+        timestamp_end = datetime.now()
+        delta = timestamp_end - timestamp_start
+        total_seconds = int(delta.total_seconds())
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        seconds = total_seconds % 60
+
+        if not resume_run_id:
+            mlflow.log_param("total_duration", f"{hours}h {minutes}m {seconds}s")
+        # Only the details downloaded from the API count, the ones served by the response cache are logged apart
+        mlflow.log_metric("models_per_hour", crawl_stats["detail_requests"] * 3600 / max(delta.total_seconds(), 1))
+        mlflow.log_metric("cached_details", crawl_stats["cached_details"])
+
+        # Upload on Azure Blob Storage, in background while the analysis runs
+        for file_path, subfolder in [(csv_path, "data_extraction/csv"), (txt_path, "data_extraction/txt")]:
+            upload_in_background(file_path, f"{context.experiment_name}/{run_id}/{subfolder}/{file_path.name}")
+
+    if mlflow.active_run():
+        mlflow.end_run()
+
+    if run_next:
+        analyze_mlflow_run(run_id, "csv", artifact_format)
+    return run_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", dest="resume_run_id", help="MLflow run id of an interrupted extraction to continue")
+    parser.add_argument("--incremental", action="store_true", help="Only fetch UID not present in the previous extraction")
+    parser.add_argument("--previous_run_id", help="Extraction run used by --incremental, defaults to the latest one")
+    parser.add_argument("--artifact_format", choices=ARTIFACT_FORMATS, default=DEFAULT_ARTIFACT_FORMAT)
+
+    args = parser.parse_args()
+
+    data_extraction_mlflow_run(args.resume_run_id, args.incremental, args.previous_run_id, args.artifact_format)
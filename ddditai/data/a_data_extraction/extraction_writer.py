@@ -0,0 +1,149 @@
+import os
+import csv
+import shutil
+from pathlib import Path
+from ddditai.common.artifact_io import extraction_schema, PARQUET_COMPRESSION
+
+# --- CONFIGURATION ---
+FLUSH_EVERY = 256  # rows written between two flushes to disk
+
+
+def truncate_partial_line(path):
+    # A crash while writing can leave an incomplete last line, it is dropped before appending
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position != size:
+            f.truncate(position)
+
+
+class ExtractionWriter:
+    # Append-only writer for the extraction output, rows are persisted while the crawl is running.
+    # CSV rows are appended and flushed periodically, Parquet rows are written as one part file per flush
+    # and merged into a single file (one row group per part) when the writer is closed.
+    def __init__(self, models_path, authors_path, columns, output_format="csv", flush_every=FLUSH_EVERY):
+        self.models_path = Path(models_path)
+        self.authors_path = Path(authors_path)
+        self.columns = columns
+        self.output_format = output_format
+        self.flush_every = flush_every
+        self.written_pairs = set()  # (uid, associated_tag) already on disk
+        self.written_authors = set()
+        self.rows_written = 0
+        self._pending = 0
+
+        if output_format == "parquet":
+            self._open_parquet()
+        else:
+            self._open_csv()
+
+        if self.authors_path.exists():
+            truncate_partial_line(self.authors_path)
+            with open(self.authors_path, encoding="utf-8") as f:
+                self.written_authors = {line.split(",", 1)[0] for line in f}
+        self._authors_file = open(self.authors_path, "a", encoding="utf-8")
+
+    def _open_csv(self):
+        resume = self.models_path.exists() and self.models_path.stat().st_size > 0
+        if resume:
+            truncate_partial_line(self.models_path)
+            uid_idx = self.columns.index("uid")
+            tag_idx = self.columns.index("associated_tag")
+            with open(self.models_path, newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    if len(row) == len(self.columns):
+                        self.written_pairs.add((row[uid_idx], row[tag_idx]))
+        self._models_file = open(self.models_path, "a", newline="", encoding="utf-8")
+        self._models_writer = csv.writer(self._models_file)
+        if not resume:
+            self._models_writer.writerow(self.columns)
+
+    def _open_parquet(self):
+        import pyarrow.parquet as pq
+
+        self._schema = extraction_schema(self.columns)
+        self._buffer = []
+        self._parts_folder = self.models_path.parent / f"{self.models_path.stem}_parts"
+        self._parts_folder.mkdir(parents=True, exist_ok=True)
+        if self.models_path.exists():
+            # Output of a completed run that is resumed again becomes the first part
+            os.replace(self.models_path, self._parts_folder / "part-00000.parquet")
+        self._parts = sorted(self._parts_folder.glob("part-*.parquet"))
+        for part in self._parts:
+            table = pq.read_table(part, columns=["uid", "associated_tag"])
+            self.written_pairs.update(zip(table.column("uid").to_pylist(), table.column("associated_tag").to_pylist()))
+
+    def _write_part(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._buffer:
+            return
+        arrays = [
+            pa.array([row[idx] for row in self._buffer], type=field.type)
+            for idx, field in enumerate(self._schema)
+        ]
+        part_path = self._parts_folder / f"part-{len(self._parts):05d}.parquet"
+        tmp_path = part_path.with_suffix(".tmp")
+        compression = None if PARQUET_COMPRESSION == "none" else PARQUET_COMPRESSION
+        pq.write_table(pa.Table.from_arrays(arrays, schema=self._schema), tmp_path, compression=compression)
+        os.replace(tmp_path, part_path)
+        self._parts.append(part_path)
+        self._buffer = []
+
+    def _merge_parts(self):
+        import pyarrow.parquet as pq
+
+        compression = None if PARQUET_COMPRESSION == "none" else PARQUET_COMPRESSION
+        with pq.ParquetWriter(self.models_path, self._schema, compression=compression) as parquet_writer:
+            for part in self._parts:
+                parquet_writer.write_table(pq.read_table(part, schema=self._schema))
+        shutil.rmtree(self._parts_folder)
+
+    def write_model(self, model_info):
+        key = (model_info[0], model_info[1])
+        if key in self.written_pairs:
+            return
+        self.written_pairs.add(key)
+        if self.output_format == "parquet":
+            self._buffer.append(model_info)
+        else:
+            self._models_writer.writerow(model_info)
+        self.rows_written += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def write_author(self, author_info):
+        if author_info[0] in self.written_authors:
+            return
+        self.written_authors.add(author_info[0])
+        self._authors_file.write(f"{author_info[0]},{author_info[1]}\n")
+
+    def flush(self):
+        if self.output_format == "parquet":
+            self._write_part()
+        else:
+            self._models_file.flush()
+        self._authors_file.flush()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        if self.output_format == "parquet":
+            self._merge_parts()
+        else:
+            self._models_file.close()
+        self._authors_file.close()
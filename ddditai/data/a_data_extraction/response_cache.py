@@ -0,0 +1,131 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from urllib.parse import urlencode
+
+# --- CONFIGURATION ---
+CACHE_PATH = Path(os.getenv("SKETCHFAB_CACHE_PATH", Path.home() / ".cache" / "ddditai" / "sketchfab_responses.sqlite"))
+
+MODEL_CACHE_TTL = 30 * 24 * 3600  # seconds, model metadata rarely changes between runs
+
+SEARCH_CACHE_TTL = 24 * 3600  # seconds, search pages shift as new models are published
+
+CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+ACCESS_FLUSH_SIZE = 256  # access times kept in memory before they are written in one transaction
+
+
+def cache_key(url, params=None):
+    if params:
+        url = f"{url}?{urlencode(sorted(params.items()))}"
+    return url
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.unchanged = 0  # misses whose downloaded body was identical to the stored one
+        self._lock = threading.Lock()
+        self._accessed = {}  # key -> last access time not yet written, flushed before any eviction and on close
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body BLOB NOT NULL, content_hash TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "stored_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._connection.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+        body, etag, last_modified, stored_at = row
+        return {"body": body, "etag": etag, "last_modified": last_modified, "stored_at": stored_at}
+
+    def put(self, key, body, etag=None, last_modified=None):
+        # Returns False when the stored body was already identical: only its validators and timestamps are updated,
+        # the blob is not rewritten
+        current = time.time()
+        content_hash = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            self._accessed.pop(key, None)
+            unchanged = self._connection.execute(
+                "UPDATE responses SET etag = ?, last_modified = ?, stored_at = ?, accessed_at = ? "
+                "WHERE key = ? AND content_hash = ?",
+                (etag, last_modified, current, current, key, content_hash)
+            ).rowcount > 0
+            if not unchanged:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, body, content_hash, etag, last_modified, stored_at, accessed_at, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, body, content_hash, etag, last_modified, current, current, len(body))
+                )
+            self._connection.commit()
+            if not unchanged:
+                self._evict()
+        return not unchanged
+
+    def refresh(self, key):
+        # Called after a 304 Not Modified: the stored body is valid for another TTL
+        current = time.time()
+        with self._lock:
+            self._accessed.pop(key, None)
+            self._connection.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (current, current, key)
+            )
+            self._connection.commit()
+
+    def _flush_accessed(self):
+        if not self._accessed:
+            return
+        self._connection.executemany(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?", [(accessed_at, key) for key, accessed_at in self._accessed.items()]
+        )
+        self._connection.commit()
+        self._accessed.clear()
+
+    def _evict(self):
+        total_size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        self._flush_accessed()
+        # Least recently used entries go first until the cache fits again
+        freed = 0
+        to_delete = []
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            to_delete.append((key,))
+            freed += size
+            if total_size - freed <= self.max_bytes:
+                break
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+        self._connection.commit()
+
+    @staticmethod
+    def is_fresh(entry, ttl):
+        return time.time() - entry["stored_at"] < ttl
+
+    def stats(self):
+        return {"cache_hits": self.hits, "cache_revalidated": self.revalidated, "cache_misses": self.misses,
+                "cache_unchanged": self.unchanged}
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._connection.close()
@@ -0,0 +1,422 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from ddditai.data.a_data_extraction.response_cache import cache_key, MODEL_CACHE_TTL, SEARCH_CACHE_TTL
+
+# --- CONFIGURATION ---
+API_BASE = os.getenv("SKETCHFAB_API_BASE", "https://api.sketchfab.com/v3")
+
+PAGE_SIZE = 24  # maximum page size accepted by the search API
+
+REQUESTS_PER_MINUTE = 30  # starting budget per token, refined by the rate-limit headers of each response
+
+BURST_SIZE = 8
+
+MAX_CONNECTIONS = 16
+
+MAX_RETRIES = 10
+
+MAX_BACKOFF = 3600  # seconds
+
+REQUEST_TIMEOUT = 60  # seconds
+
+RESULTS_QUEUE_SIZE = 1024  # rows waiting to be written before the crawl is slowed down
+
+DETAIL_QUEUE_SIZE = 256  # UIDs waiting for their details before the tag collection is slowed down
+
+PENDING_ROWS_SIZE = 4096  # fetched details kept to emit the tags found later for the same model
+
+
+# --- UTILITY FUNCTIONS ---
+def now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def parse_retry_after(value):
+    # Retry-After can be expressed both as delay in seconds and as HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+def get_rate_limit_header(headers, name):
+    for prefix in ("X-RateLimit-", "RateLimit-"):
+        value = headers.get(prefix + name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+def parse_json(body, url):
+    # A malformed body fails only the request it answers, the caller handles it like a missing resource
+    try:
+        return json.loads(body)
+    except ValueError:
+        print(f"[{now()}] Malformed JSON response for {url}")
+        return None
+
+def parse_model_data(uid, data):
+    tags = [t.get("slug", "") for t in data.get("tags", [])]
+    if "noAI" in tags:
+        return None, None
+    tags = ["realistic-style" if t == "realistic" else t for t in tags]
+    model_info = [
+        uid,
+        "",  # placeholder tag, will be populated after
+        data.get("isAgeRestricted", False),
+        data.get("pbrType", ""),
+        data.get("textureCount", 0),
+        data.get("vertexCount", 0),
+        data.get("materialCount", 0),
+        data.get("animationCount", 0),
+        tags,
+        [c.get("name", "") for c in data.get("categories", [])],
+        data.get("faceCount", 0)
+    ]
+    author_info = (uid, data.get("user", {}).get("displayName", "unknown"))
+    return model_info, author_info
+
+
+# --- RATE LIMITING ---
+class TokenBucket:
+    def __init__(self, token, name, requests_per_minute=REQUESTS_PER_MINUTE, burst_size=BURST_SIZE):
+        self.token = token
+        self.name = name
+        self.rate = requests_per_minute / 60
+        self.capacity = burst_size
+        self.tokens = float(burst_size)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.requests_count = 0
+
+    def _refill(self):
+        current = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (current - self.updated) * self.rate)
+        self.updated = current
+
+    def wait_time(self):
+        self._refill()
+        wait = max(0.0, self.blocked_until - time.monotonic())
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self):
+        self.tokens -= 1
+        self.requests_count += 1
+
+    def block_for(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+    def update_from_headers(self, headers):
+        remaining = get_rate_limit_header(headers, "Remaining")
+        reset = get_rate_limit_header(headers, "Reset")
+        if remaining is None or reset is None:
+            return
+        # Reset is sent either as epoch timestamp or as seconds until the window restarts
+        reset_in = reset - time.time() if reset > 1e9 else reset
+        reset_in = max(reset_in, 1.0)
+        if remaining < 1:
+            self.block_for(reset_in)
+            return
+        # Spread the budget left in the current window over the time remaining in it
+        self.rate = remaining / reset_in
+        self.tokens = min(self.tokens, remaining)
+
+
+class TokenRateLimiter:
+    def __init__(self, tokens, requests_per_minute=REQUESTS_PER_MINUTE, burst_size=BURST_SIZE):
+        self.buckets = [
+            TokenBucket(token, f"Token-{i + 1}", requests_per_minute, burst_size)
+            for i, token in enumerate(tokens) if token
+        ]
+        if not self.buckets:
+            raise ValueError("At least one Sketchfab token is required")
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Hand out whichever token has budget first instead of pinning one token per worker
+        while True:
+            async with self._lock:
+                bucket = min(self.buckets, key=lambda b: (b.wait_time(), -b.tokens))
+                wait = bucket.wait_time()
+                if wait <= 0:
+                    bucket.consume()
+                    return bucket
+            await asyncio.sleep(wait)
+
+    def requests_count(self):
+        return [bucket.requests_count for bucket in self.buckets]
+
+
+# --- ASYNC CLIENT ---
+class SketchfabClient:
+    def __init__(self, tokens, api_base=API_BASE, requests_per_minute=REQUESTS_PER_MINUTE, burst_size=BURST_SIZE,
+                 max_connections=MAX_CONNECTIONS, max_retries=MAX_RETRIES, cache=None):
+        self.api_base = api_base.rstrip("/")
+        self.limiter = TokenRateLimiter(tokens, requests_per_minute, burst_size)
+        self.cache = cache
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.models_downloaded = 0  # model details retrieved from the API, cache hits excluded
+        self.models_cached = 0  # model details served by the response cache
+        self.session = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def get_json(self, url, params=None, ttl=None):
+        return (await self.fetch_json(url, params, ttl))[0]
+
+    async def fetch_json(self, url, params=None, ttl=None):
+        # (data, True when it was served by the response cache without any request)
+        import aiohttp
+
+        key = cache_key(url, params)
+        entry = self.cache.get(key) if self.cache else None
+        if entry and ttl and self.cache.is_fresh(entry, ttl):
+            data = parse_json(entry["body"], url)
+            if data is not None:
+                self.cache.hits += 1
+                return data, True
+            entry = None
+
+        backoff = 1
+        for _ in range(self.max_retries):
+            bucket = await self.limiter.acquire()
+            headers = {"Authorization": f"Token {bucket.token}"}
+            # Stale entries are revalidated instead of downloaded again
+            if entry and entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry and entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+            try:
+                async with self.session.get(url, params=params, headers=headers) as resp:
+                    bucket.update_from_headers(resp.headers)
+                    if resp.status == 304 and entry:
+                        self.cache.refresh(key)
+                        self.cache.revalidated += 1
+                        return parse_json(entry["body"], url), False
+                    if resp.status == 200:
+                        body = await resp.read()
+                        data = parse_json(body, url)
+                        if self.cache and data is not None:
+                            self.cache.misses += 1
+                            if not self.cache.put(key, body, resp.headers.get("ETag"), resp.headers.get("Last-Modified")):
+                                self.cache.unchanged += 1
+                        return data, False
+                    if resp.status == 404:
+                        return None, False
+                    if resp.status == 429:
+                        # Only the throttled token is paused, the other ones keep crawling
+                        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                        if retry_after is not None:
+                            bucket.block_for(retry_after + 1)
+                        else:
+                            bucket.block_for(backoff)
+                            backoff = min(backoff * 2, MAX_BACKOFF)
+                        print(f"[{now()}] [{bucket.name}] Rate limited, requests count up to {self.limiter.requests_count()}")
+                        continue
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+        return None, False
+
+    async def iter_model_uids(self, tag, next_url=None):
+        # Streams (page UID, next cursor URL) following the cursor returned by the search API
+        if next_url:
+            url, params = next_url, None
+        else:
+            url, params = f"{self.api_base}/models", {"tags": tag, "count": PAGE_SIZE}
+        while url:
+            data = await self.get_json(url, params=params, ttl=SEARCH_CACHE_TTL)
+            if data is None:
+                return
+            results = data.get("results", [])
+            page_uids = []
+            for model in results:
+                tags_model = [t["slug"] for t in model.get("tags", [])]
+                if "noAI" not in tags_model:
+                    page_uids.append(model["uid"])
+            url, params = (data.get("next") if results else None), None
+            yield page_uids, url
+
+    async def fetch_model_data(self, uid):
+        data, from_cache = await self.fetch_json(f"{self.api_base}/models/{uid}", ttl=MODEL_CACHE_TTL)
+        if data is not None:
+            if from_cache:
+                self.models_cached += 1
+            else:
+                self.models_downloaded += 1
+        if data is None:
+            return None, None
+        return parse_model_data(uid, data)
+
+
+# --- CRAWL ---
+def with_tag(model_info, tag):
+    model_info = list(model_info)
+    model_info[1] = tag_value(tag)
+    return model_info
+
+def tag_value(tag):
+    return "realistic-style" if tag == "realistic" else tag
+
+async def write_results(results_queue, writer):
+    while True:
+        item = await results_queue.get()
+        if item is None:
+            break
+        model_info, author_info = item
+        writer.write_model(model_info)
+        writer.write_author(author_info)
+
+async def crawl(tags, total_models_per_tag, tokens, writer, api_base=API_BASE, requests_per_minute=REQUESTS_PER_MINUTE,
+                burst_size=BURST_SIZE, max_connections=MAX_CONNECTIONS, cache=None, journal=None, known_models=None):
+    # Rows are handed to the writer through a bounded queue as soon as they are available,
+    # (uid, tag) pairs already in writer.written_pairs are not requested again.
+    # known_models maps UID to (model_info, author_info) already retrieved by a previous run.
+    # Memory stays bounded on large crawls: UIDs wait for their details in a bounded queue served by a fixed pool of
+    # workers, and only the last PENDING_ROWS_SIZE details are kept to emit tags found later for the same model
+    known_models = known_models or {}
+    written_pairs = writer.written_pairs
+
+    # Models found under several tags are fetched once and emitted once per associated tag
+    tag_index = {}  # UID -> set of associated tags
+    states = {}  # UID -> "queued", "fetched" or "unavailable"
+    refetch_tags = {}  # UID -> tags associated after its details were released
+    pending_rows = OrderedDict()  # UID -> details, least recently used first
+    analyzed = [0]
+    detail_queue = asyncio.Queue(maxsize=DETAIL_QUEUE_SIZE)
+    results_queue = asyncio.Queue(maxsize=RESULTS_QUEUE_SIZE)
+    writer_task = asyncio.create_task(write_results(results_queue, writer))
+
+    async with SketchfabClient(tokens, api_base, requests_per_minute, burst_size, max_connections, cache=cache) as client:
+
+        async def fetch_details(uid):
+            if uid in known_models:
+                return known_models[uid]
+            try:
+                model_info, author_info = await client.fetch_model_data(uid)
+            except Exception as e:
+                print(f"[{now()}] Details of model '{uid}' could not be read: {type(e).__name__}: {e}")
+                model_info = author_info = None
+            if journal:
+                if model_info:
+                    journal.record_model(uid)
+                else:
+                    journal.record_failure(uid)
+            analyzed[0] += 1
+            print(f"[{now()}] Analyzed model {analyzed[0]}/{len(states)} with UID '{uid}'")
+            return model_info, author_info
+
+        async def detail_worker():
+            while True:
+                uid = await detail_queue.get()
+                if uid is None:
+                    return
+                model_info, author_info = await fetch_details(uid)
+                if not model_info:
+                    states[uid] = "unavailable"
+                    refetch_tags.pop(uid, None)
+                    continue
+                # A first fetch emits every tag found so far, a fetch of released details the tags found since
+                tags_to_emit = refetch_tags.pop(uid, None) or list(tag_index[uid])
+                # Tags registered from now on are emitted by register()
+                states[uid] = "fetched"
+                pending_rows[uid] = (model_info, author_info)
+                pending_rows.move_to_end(uid)
+                while len(pending_rows) > PENDING_ROWS_SIZE:
+                    pending_rows.popitem(last=False)
+                for tag in tags_to_emit:
+                    await results_queue.put((with_tag(model_info, tag), author_info))
+
+        async def register(uid, tag):
+            tag_index.setdefault(uid, set()).add(tag)
+            if uid in pending_rows:
+                pending_rows.move_to_end(uid)
+                model_info, author_info = pending_rows[uid]
+                await results_queue.put((with_tag(model_info, tag), author_info))
+            elif uid not in states:
+                if (uid, tag_value(tag)) not in written_pairs:
+                    states[uid] = "queued"
+                    await detail_queue.put(uid)
+            elif states[uid] == "fetched":
+                # Details released since, they are requested again and served by the response cache when fresh
+                if uid in refetch_tags:
+                    refetch_tags[uid].append(tag)
+                else:
+                    refetch_tags[uid] = [tag]
+                    await detail_queue.put(uid)
+
+        async def collect_tag(tag):
+            state = journal.tag_state(tag) if journal else {"next": None, "uids": [], "complete": False, "target": None}
+            tag_uids = list(dict.fromkeys(state["uids"]))[:total_models_per_tag]
+            for uid in tag_uids:
+                await register(uid, tag)
+            completed = state["complete"] and (state["target"] or len(tag_uids)) >= total_models_per_tag
+            if completed or len(tag_uids) >= total_models_per_tag:
+                print(f"[{now()}] Resumed {len(tag_uids)} UID for tag '{tag}' from checkpoint")
+                return
+
+            # A tag completed for a smaller target is collected again from the first page, its last page can have been
+            # cut at the target, the UID already collected are skipped
+            next_url = None if state["complete"] else state["next"]
+            print(f"[{now()}] Starting collection of UID for tag '{tag}'")
+            exhausted = False
+            async for page_uids, next_url in client.iter_model_uids(tag, next_url=next_url):
+                exhausted = next_url is None
+                page_uids = [uid for uid in dict.fromkeys(page_uids) if uid not in tag_uids]
+                page_uids = page_uids[:total_models_per_tag - len(tag_uids)]
+                tag_uids.extend(page_uids)
+                if journal:
+                    journal.record_page(tag, next_url, page_uids)
+                for uid in page_uids:
+                    await register(uid, tag)
+                if len(tag_uids) >= total_models_per_tag:
+                    break
+            if journal and (len(tag_uids) >= total_models_per_tag or exhausted):
+                journal.record_uids_complete(tag, total_models_per_tag)
+            print(f"[{now()}] Collected {len(tag_uids)} UID for tag '{tag}'")
+
+        workers = [asyncio.create_task(detail_worker()) for _ in range(max_connections)]
+        await asyncio.gather(*(collect_tag(tag) for tag in tags))
+        for _ in workers:
+            await detail_queue.put(None)
+        await asyncio.gather(*workers)
+        pending_rows.clear()
+        await results_queue.put(None)
+        await writer_task
+
+        total_pairs = sum(len(uid_tags) for uid_tags in tag_index.values())
+        print(f"[{now()}] Crawl terminated, {len(tag_index)} unique UID for {total_pairs} (UID, tag) pairs, "
+              f"requests count per token: {client.limiter.requests_count()}")
+
+    # detail_requests counts the details retrieved from the API, cached_details the ones served by the response cache
+    return {
+        "unique_models": len(tag_index), "model_tag_pairs": total_pairs, "detail_requests": client.models_downloaded,
+        "cached_details": client.models_cached
+    }
@@ -0,0 +1,133 @@
+import os
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# --- CONFIGURATION ---
+PLOT_MODES = ["none", "summary", "full"]  # no PNG, one multi-panel figure, one boxplot and one histogram per column
+
+DEFAULT_PLOT_MODE = os.getenv("DDDITAI_ANALYSIS_PLOTS", "full")
+
+PLOT_WORKERS = int(os.getenv("DDDITAI_PLOT_WORKERS", "0"))  # rendering processes, 0 uses every core
+
+HIST_BINS = 20
+
+KDE_SAMPLE_ROWS = 10_000  # the KDE is fitted on a random sample of at most this many values
+
+KDE_GRID_POINTS = 200  # points the KDE is evaluated on
+
+RANDOM_STATE = 42
+
+SUMMARY_PANEL_SIZE = (5, 3)  # inches of one panel of the summary figure
+
+
+def use_agg_backend():
+    # Non-interactive rendering, no display is needed and figures are never shown
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+def kde_curve(values, bins=HIST_BINS):
+    # Gaussian KDE fitted on a bounded sample and scaled to the histogram counts, so its cost does not grow with rows
+    import numpy as np
+    from scipy.stats import gaussian_kde
+
+    if len(values) < 2 or np.ptp(values) == 0:
+        return None
+    sample = values
+    if len(values) > KDE_SAMPLE_ROWS:
+        sample = np.random.default_rng(RANDOM_STATE).choice(values, KDE_SAMPLE_ROWS, replace=False)
+    grid = np.linspace(values.min(), values.max(), KDE_GRID_POINTS)
+    bin_width = np.ptp(values) / bins
+    return grid, gaussian_kde(sample)(grid) * len(values) * bin_width
+
+def draw_boxplot(ax, values, col):
+    import seaborn as sns
+
+    sns.boxplot(x=values, ax=ax, flierprops={"marker": "o", "markerfacecolor": "red"})
+    ax.set_title(f"Boxplot - {col}")
+
+def draw_histogram(ax, values, col):
+    import seaborn as sns
+
+    sns.histplot(values, bins=HIST_BINS, ax=ax)
+    curve = kde_curve(values)
+    if curve is not None:
+        ax.plot(*curve)
+    ax.set_title(f"Distribution of {col}")
+
+def render_column(values, col, box_path=None, hist_path=None):
+    # values are the non-missing values of the column, a worker never receives the whole frame
+    use_agg_backend()
+    import matplotlib.pyplot as plt
+
+    for path, draw in ((box_path, draw_boxplot), (hist_path, draw_histogram)):
+        if path is None:
+            continue
+        fig, ax = plt.subplots(figsize=(6, 4))
+        draw(ax, values, col)
+        fig.tight_layout()
+        fig.savefig(path)
+        plt.close(fig)
+    return col
+
+def render_summary(columns_values, box_columns, path):
+    # One figure with a boxplot and a histogram panel per column, the boxplot panel is left empty outside box_columns
+    use_agg_backend()
+    import matplotlib.pyplot as plt
+
+    width, height = SUMMARY_PANEL_SIZE
+    fig, axes = plt.subplots(len(columns_values), 2, figsize=(2 * width, height * len(columns_values)), squeeze=False)
+    for (col, values), (box_ax, hist_ax) in zip(columns_values.items(), axes):
+        if col in box_columns:
+            draw_boxplot(box_ax, values, col)
+        else:
+            box_ax.axis("off")
+        draw_histogram(hist_ax, values, col)
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+def render_plots(df, box_columns, plots_folder, mode=DEFAULT_PLOT_MODE, n_workers=PLOT_WORKERS):
+    # Boxplots of box_columns and histograms of every numeric or boolean column. Returns the folders to log
+    import numpy as np
+    import pandas as pd
+    from ddditai.common.resources import available_cores
+
+    if mode not in PLOT_MODES:
+        raise ValueError(f"Unknown plot mode '{mode}', expected one of {PLOT_MODES}")
+    if mode == "none":
+        return []
+
+    hist_columns = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col])]
+    values = {col: df[col].dropna().to_numpy(dtype=np.float64) for col in hist_columns}
+    start = datetime.now()
+
+    if mode == "summary":
+        plots_folder.mkdir(parents=True, exist_ok=True)
+        render_summary(values, box_columns, plots_folder / "summary.png")
+        print(f"[{datetime.now()}] Summary figure of {len(values)} columns saved in {(datetime.now() - start).total_seconds():.1f}s")
+        return [plots_folder]
+
+    box_folder = plots_folder / "boxplots"
+    hist_folder = plots_folder / "histograms"
+    for folder in (box_folder, hist_folder):
+        folder.mkdir(parents=True, exist_ok=True)
+    tasks = [
+        (values[col], col, box_folder / f"boxplot_{col}.png" if col in box_columns else None, hist_folder / f"hist_{col}.png")
+        for col in hist_columns
+    ]
+
+    n_workers = min(n_workers or available_cores(), len(tasks))
+    if n_workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"), initializer=use_agg_backend
+        ) as executor:
+            for future in [executor.submit(render_column, *task) for task in tasks]:
+                future.result()
+    else:
+        for task in tasks:
+            render_column(*task)
+    print(f"[{datetime.now()}] {len(tasks)} columns plotted with {max(n_workers, 1)} workers in {(datetime.now() - start).total_seconds():.1f}s")
+    return [box_folder, hist_folder]
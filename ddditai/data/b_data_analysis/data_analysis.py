@@ -1,107 +1,130 @@
 import os
-import mlflow
 import argparse
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
-import statsmodels.api as sm
-from pathlib import Path
 from datetime import datetime
-from scipy.stats import f_oneway, chi2_contingency
-from statsmodels.formula.api import ols
+from ddditai.common.artifact_io import ARTIFACT_FORMATS, DEFAULT_ARTIFACT_FORMAT, find_artifact_file, read_artifact_frame, stringify_list_columns
+from ddditai.common.blob_storage import file_sha256
+from ddditai.common.context import get_context
+from ddditai.common.stage_cache import FINGERPRINT_TAG, find_cached_run, frame_hash, run_fingerprint, stage_fingerprint
+from ddditai.data.b_data_analysis.analysis_plots import DEFAULT_PLOT_MODE, PLOT_MODES, kde_curve, render_plots
+from ddditai.data.b_data_analysis.descriptive_statistics import IQR_FACTOR, STREAMING_CHUNK_ROWS, StreamingStatistics, describe_frame, describe_table, frame_chunks
 from ddditai.data.c_data_preparation.a_data_cleaning.data_cleaning import data_cleaning_mlflow_run
 
-
-# --- OUTLIERS DETECTION FUNCTION (IQR) ---
-def detect_outliers_iqr(series):
-    q1 = series.quantile(0.25)
-    q3 = series.quantile(0.75)
-    iqr = q3 - q1
-    lower = q1 - 1.5 * iqr
-    upper = q3 + 1.5 * iqr
-    return (series < lower) | (series > upper)
-
-# --- MAIN MLFLOW PIPELINE ---
-EXPERIMENT_NAME = "Sketchfab_Experiment"
-mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
-
-# ATTENTION: at the moment mlflow run locally, if moved on a VM or external server make sure to change the path
-local_appdata = Path(os.environ['LOCALAPPDATA'])
-artifact_base_folder = local_appdata / "MLflow" / "artifacts"
-artifact_base_folder.mkdir(parents=True, exist_ok=True)
-
-experiment_description = (
-"This experiment implements commit 7dc8442 of the Data Understanding document and commit 7bddc87 of Data Preparation document."
-)
-experiment_tags = {
-    "mlflow.note.content": experiment_description,
-}
-
-if not mlflow.get_experiment_by_name(EXPERIMENT_NAME):
-    mlflow.create_experiment(
-        name=EXPERIMENT_NAME,
-        artifact_location=f"file:///{artifact_base_folder.resolve().as_posix()}",
-        tags=experiment_tags
+# --- CONFIGURATION ---
+EXTREME_FACE_COUNT = 200_000
+
+STAGE_NAME = "data_analysis"
+
+STREAMING_ANALYSIS_MB = float(os.getenv("DDDITAI_STREAMING_ANALYSIS_MB", "512"))  # larger artifacts are analyzed in chunks
+
+ANALYSIS_SAMPLE_ROWS = 200_000  # uniform sample of a streamed artifact used by the plots and the correlation studies
+
+RANDOM_STATE = 42
+
+STAGE_PARAMS = {
+    "iqr_factor": IQR_FACTOR, "extreme_face_count": EXTREME_FACE_COUNT, "streaming_analysis_mb": STREAMING_ANALYSIS_MB,
+    "analysis_sample_rows": ANALYSIS_SAMPLE_ROWS
+}  # parameters that change the stage output, part of its fingerprint
+
+def download_analysis_input(run_id, artifact_path):
+    import mlflow
+
+    return find_artifact_file(mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path=artifact_path))
+
+def is_streamed(artifact_file):
+    return os.path.getsize(artifact_file) > STREAMING_ANALYSIS_MB * 1024 ** 2
+
+def analysis_input(run_id, artifact_path):
+    # (input identity, frame, artifact file). An artifact larger than STREAMING_ANALYSIS_MB is never loaded whole,
+    # it is identified by its checksum and the frame is None
+    fingerprint = run_fingerprint(run_id)
+    if fingerprint:
+        return fingerprint, None, None
+    artifact_file = download_analysis_input(run_id, artifact_path)
+    if is_streamed(artifact_file):
+        return file_sha256(artifact_file), None, artifact_file
+    df = read_artifact_frame(artifact_file)
+    return frame_hash(df), df, artifact_file
+
+def stream_analysis(artifact_file, thresholds=None, sample_rows=ANALYSIS_SAMPLE_ROWS, chunk_rows=STREAMING_CHUNK_ROWS):
+    # Statistics of an artifact read in chunks (exact counts and moments, t-digest quantiles) and a uniform sample of
+    # sample_rows rows: every row gets a random key and the rows with the smallest keys are kept. Also returns the
+    # number of rows and of empty pbr_type values, counted on every row
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(RANDOM_STATE)
+    statistics = StreamingStatistics(thresholds)
+    sample = None
+    empty_pbr = 0
+    for chunk in frame_chunks(artifact_file, chunk_rows):
+        statistics.update(chunk)
+        if "pbr_type" in chunk.columns:
+            empty_pbr += int(chunk["pbr_type"].isna().sum() + (chunk["pbr_type"] == "").sum())
+        chunk = stringify_list_columns(chunk).assign(_sample_key=rng.random(len(chunk)))
+        sample = chunk if sample is None else pd.concat([sample, chunk], ignore_index=True)
+        sample = sample.nsmallest(sample_rows, "_sample_key")
+    stats, missing_counts = statistics.report()
+    sample = sample.drop(columns="_sample_key").sort_index().reset_index(drop=True)
+    return stats, missing_counts, sample, statistics.rows, empty_pbr
+
+def analyze_mlflow_run(run_id: str = None, artifact_path: str = None, artifact_format: str = DEFAULT_ARTIFACT_FORMAT,
+                       run_next: bool = True, plots: str = DEFAULT_PLOT_MODE):
+    import mlflow
+
+    context = get_context()
+
+    input_id, df, artifact_file = analysis_input(run_id, artifact_path)
+    fingerprint = stage_fingerprint(
+        STAGE_NAME, input_id, [analyze_mlflow_run, stream_analysis, describe_frame, describe_table, render_plots, kde_curve],
+        {**STAGE_PARAMS, "plots": plots}
     )
-
-mlflow.set_experiment(EXPERIMENT_NAME)
-
-def analyze_mlflow_run(run_id: str = None, artifact_path: str = None):
-    artifact_local_path = mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path=artifact_path)
-    csv_files = [f for f in os.listdir(artifact_local_path) if f.endswith(".csv")]
-    if not csv_files:
-        raise FileNotFoundError("No CSV found in artifact folder")
-    csv_file_path = os.path.join(artifact_local_path, csv_files[0])
-    df = pd.read_csv(csv_file_path)
+    cached_run_id = find_cached_run(fingerprint)
+    if cached_run_id:
+        print(f"[{datetime.now()}] Analysis skipped, reports of unchanged run {cached_run_id} are reused")
+        if run_next:
+            data_cleaning_mlflow_run(run_id, artifact_path, artifact_format)
+        return
+    if df is None and artifact_file is None:
+        artifact_file = download_analysis_input(run_id, artifact_path)
+    streamed = df is None and is_streamed(artifact_file)
+    if df is None and not streamed:
+        df = read_artifact_frame(artifact_file)
+
+    # Statistics libraries are only loaded when the analysis is computed, plotting ones only by the plot rendering
+    import pandas as pd
+    import statsmodels.api as sm
+    from scipy.stats import f_oneway, chi2_contingency
+    from statsmodels.formula.api import ols
 
     # Create run specific folder
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     run_name = f"Analysis_from_{run_id or 'manual'}_{timestamp}"
 
-    run_folder = artifact_base_folder / run_name
+    run_folder = context.artifact_base_folder / run_name
     csv_folder = run_folder / "analysis_results"
     plots_folder = run_folder / "plots"
-    hist_folder = plots_folder / "histograms"
-    box_folder = plots_folder / "boxplots"
-
-    for folder in [csv_folder, hist_folder, box_folder]:
-        folder.mkdir(parents=True, exist_ok=True)
-
-    # Descriptive statistic
-    desc = df.describe(include="all").transpose()
-    desc["median"] = df.median(numeric_only=True)
-    desc.to_csv(csv_folder / "descriptive_statistics.csv")
+    csv_folder.mkdir(parents=True, exist_ok=True)
+
+    # Descriptive statistic, quantiles, IQR outliers, missing and extreme values of every numeric column in one pass.
+    # A large artifact is read in chunks with bounded memory, the plots, the correlation studies and the description
+    # of the non numeric columns then use a uniform sample of its rows
+    if streamed:
+        stats, missing_counts, df, total_rows, empty_pbr = stream_analysis(artifact_file, {"face_count": EXTREME_FACE_COUNT})
+        print(f"[{datetime.now()}] {artifact_file} streamed: statistics of {total_rows} rows, studies on a sample of {len(df)}")
+    else:
+        df = stringify_list_columns(df)
+        stats, missing_counts = describe_frame(df, {"face_count": EXTREME_FACE_COUNT})
+        total_rows = len(df)
+        empty_pbr = df["pbr_type"].isna().sum() + (df["pbr_type"] == "").sum() if "pbr_type" in df.columns else 0
+    describe_table(df, stats).to_csv(csv_folder / "descriptive_statistics.csv")
     print("Descriptive statistics saved")
 
-    # Outliers study with box plots visualization
-    outlier_report = {}
-    for col in df.select_dtypes(include=np.number).columns:
-        mask = detect_outliers_iqr(df[col].dropna())
-        outlier_report[col] = mask.sum()
-
-        plt.figure(figsize=(6, 4))
-        sns.boxplot(x=df[col], flierprops={"marker": "o", "markerfacecolor": "red"})
-        plt.title(f"Boxplot - {col}")
-        plt.tight_layout()
-        plt.savefig(box_folder / f"boxplot_{col}.png")
-        plt.close()
-
-    pd.DataFrame.from_dict(outlier_report, orient="index", columns=["outlier_count"]).to_csv(
-        csv_folder / "outlier_report.csv"
-    )
+    # Outliers study
+    stats[["outlier_count"]].to_csv(csv_folder / "outlier_report.csv")
     print("Outlier report saved")
 
-    # Distributions study with histograms visualization
-    for col in df.columns:
-        if pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col]):
-            plt.figure(figsize=(6, 4))
-            sns.histplot(df[col].dropna(), bins=20, kde=True)
-            plt.title(f"Distribution of {col}")
-            plt.tight_layout()
-            plt.savefig(hist_folder / f"hist_{col}.png")
-            plt.close()
-    print("Histograms saved")
+    # Box plots and histograms visualization, rendered in parallel with the Agg backend
+    plot_folders = render_plots(df, list(stats.index), plots_folder, plots)
 
     # Correlation study of each feature with associated_tag
     if "associated_tag" in df.columns:
@@ -139,7 +162,7 @@ def analyze_mlflow_run(run_id: str = None, artifact_path: str = None):
     # Extreme values detection
     extreme_report = {}
     if "face_count" in df.columns:
-        extreme_report["face_count_over_200k"] = (df["face_count"] > 200_000).sum()
+        extreme_report["face_count_over_200k"] = stats.loc["face_count", "over_threshold"]
 
     pd.DataFrame(list(extreme_report.items()), columns=["metric", "count"]).to_csv(
         csv_folder / "extreme_values.csv", index=False
@@ -147,27 +170,28 @@ def analyze_mlflow_run(run_id: str = None, artifact_path: str = None):
     print("Extreme values report saved")
 
     # Missing values analysis
-    missing_report = df.isna().sum().to_frame(name="missing_count")
-    missing_report["missing_ratio"] = missing_report["missing_count"] / len(df)
+    missing_report = missing_counts.to_frame(name="missing_count")
+    missing_report["missing_ratio"] = missing_report["missing_count"] / total_rows
 
     if "pbr_type" in df.columns:
-        empty_pbr = df["pbr_type"].isna().sum() + (df["pbr_type"] == "").sum()
-        missing_report.loc["pbr_type_empty"] = [empty_pbr, empty_pbr / len(df)]
+        missing_report.loc["pbr_type_empty"] = [empty_pbr, empty_pbr / total_rows]
 
     missing_report.to_csv(csv_folder / "missing_report.csv")
     print("Missing values report saved")
 
     with mlflow.start_run(run_name=run_name) as run:
         mlflow.log_artifact(str(csv_folder))
-        mlflow.log_artifact(str(box_folder))
-        mlflow.log_artifact(str(hist_folder))
+        for folder in plot_folders:
+            mlflow.log_artifact(str(folder))
+        mlflow.set_tag(FINGERPRINT_TAG, fingerprint)
         print(f"Run ID: {run.info.run_id} - Analysis artifacts logged successfully.")
         print(f"Analysis completed. Files saved in: {run_folder}")
 
         if mlflow.active_run():
             mlflow.end_run()
 
-        data_cleaning_mlflow_run(run_id, artifact_path)
+        if run_next:
+            data_cleaning_mlflow_run(run_id, artifact_path, artifact_format)
 
 
 if __name__ == "__main__":
@@ -175,7 +199,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--run_id", required=True)
     parser.add_argument("--artifact_path", required=True)
+    parser.add_argument("--artifact_format", choices=ARTIFACT_FORMATS, default=DEFAULT_ARTIFACT_FORMAT)
+    parser.add_argument("--plots", choices=PLOT_MODES, default=DEFAULT_PLOT_MODE, help="none skips the PNGs, summary renders one figure")
 
     args = parser.parse_args()
 
-    analyze_mlflow_run(args.run_id, args.artifact_path)
\ No newline at end of file
+    analyze_mlflow_run(args.run_id, args.artifact_path, args.artifact_format, plots=args.plots)
\ No newline at end of file
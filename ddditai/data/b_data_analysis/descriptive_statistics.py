@@ -0,0 +1,259 @@
+import argparse
+import warnings
+from datetime import datetime
+
+# --- CONFIGURATION ---
+QUANTILES = [0.0, 0.25, 0.5, 0.75, 1.0]  # min, q1, median, q3, max
+
+QUANTILE_NAMES = ["min", "25%", "50%", "75%", "max"]
+
+IQR_FACTOR = 1.5
+
+TDIGEST_COMPRESSION = 200  # centroids of a t-digest are about half of this, higher is more accurate
+
+TDIGEST_BUFFER = 20  # values buffered per unit of compression before they are merged into the centroids
+
+STREAMING_CHUNK_ROWS = 500_000
+
+DESCRIBE_COLUMNS = ["count", "unique", "top", "freq", "mean", "std", "min", "25%", "50%", "75%", "max", "median"]
+
+
+def numeric_columns(df):
+    import numpy as np
+
+    return list(df.select_dtypes(include=np.number).columns)
+
+def summarize(columns, count, total, mean, std, quantiles, outliers, over_threshold):
+    # One row per numeric column, quantiles holds one row per QUANTILES entry
+    import pandas as pd
+
+    stats = pd.DataFrame({"count": count, "mean": mean, "std": std}, index=columns).astype({"count": "float64"})
+    for name, values in zip(QUANTILE_NAMES, quantiles):
+        stats[name] = values
+    stats["median"] = stats["50%"]
+    stats["outlier_count"] = outliers
+    stats["missing_count"] = (total - count).astype(int)
+    stats["over_threshold"] = over_threshold
+    return stats.astype({"outlier_count": int, "over_threshold": int})
+
+def iqr_bounds(q1, q3, iqr_factor=IQR_FACTOR):
+    iqr = q3 - q1
+    return q1 - iqr_factor * iqr, q3 + iqr_factor * iqr
+
+# --- EXACT STATISTICS ---
+def describe_frame(df, thresholds=None, iqr_factor=IQR_FACTOR):
+    # Every statistic of every numeric column from a single 2D array: one multi-quantile call, the IQR outliers,
+    # missing and over-threshold counts reuse its quantiles and NaN mask. thresholds maps a column to the value
+    # above which a row is counted as extreme. Returns the numeric statistics and the missing count of every column
+    import numpy as np
+
+    thresholds = thresholds or {}
+    columns = numeric_columns(df)
+    X = df[columns].to_numpy(dtype=np.float64)
+    missing = np.isnan(X)
+    count = X.shape[0] - missing.sum(axis=0)
+
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        # All-NaN and single-value columns get NaN statistics, as in pandas
+        warnings.simplefilter("ignore", RuntimeWarning)
+        quantile = np.nanquantile if missing.any() else np.quantile
+        quantiles = quantile(X, QUANTILES, axis=0) if X.shape[0] else np.full((len(QUANTILES), len(columns)), np.nan)
+        mean = np.nanmean(X, axis=0)
+        std = np.nanstd(X, axis=0, ddof=1)
+
+    lower, upper = iqr_bounds(quantiles[1], quantiles[3], iqr_factor)
+    outliers = ((X < lower) | (X > upper)).sum(axis=0)
+    limits = np.array([thresholds.get(col, np.inf) for col in columns])
+    over_threshold = (X > limits).sum(axis=0)
+
+    stats = summarize(columns, count, X.shape[0], mean, std, quantiles, outliers, over_threshold)
+    return stats, df.isna().sum()
+
+def describe_table(df, stats):
+    # Same layout as df.describe(include="all") with a median column, the numeric rows come from stats
+    import pandas as pd
+
+    table = stats[["count", "mean", "std", *QUANTILE_NAMES, "median"]]
+    others = [col for col in df.columns if col not in stats.index]
+    if others:
+        categorical = df[others].describe(include="all").transpose()
+        bools = df[others].select_dtypes(include="bool")
+        if not bools.empty:
+            categorical["median"] = bools.median()
+        table = pd.concat([table, categorical])
+    return table.reindex(index=df.columns, columns=[col for col in DESCRIBE_COLUMNS if col in table.columns])
+
+# --- APPROXIMATE STREAMING STATISTICS ---
+class TDigest:
+    # Merging t-digest: values are buffered and merged into weighted centroids whose size is bounded by the
+    # k1 scale function, small at the tails and large around the median, so that extreme quantiles stay accurate.
+    # A merge is vectorized: every value is assigned to the centroid of the unit of k its cumulative weight falls in
+    def __init__(self, compression=TDIGEST_COMPRESSION):
+        import numpy as np
+
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.buffer = []
+        self.buffered = 0
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.buffer.append(values)
+        self.buffered += len(values)
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        if self.buffered >= TDIGEST_BUFFER * self.compression:
+            self.compress()
+
+    def compress(self):
+        import numpy as np
+
+        if not self.buffer:
+            return
+        means = np.concatenate([self.means, *self.buffer])
+        weights = np.concatenate([self.weights, np.ones(self.buffered)])
+        self.buffer, self.buffered = [], 0
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        groups = np.floor(k - k.min()).astype(np.int64)
+        _, groups = np.unique(groups, return_inverse=True)
+
+        self.weights = np.bincount(groups, weights=weights)
+        self.means = np.bincount(groups, weights=means * weights) / self.weights
+
+    def _positions(self):
+        # Centroid means and the cumulative weight at their centers, with the extremes pinned to min and max
+        import numpy as np
+
+        self.compress()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return np.concatenate([[self.min], self.means, [self.max]]), np.concatenate([[0.0], centers, [self.count]])
+
+    def quantile(self, qs):
+        import numpy as np
+
+        if not self.count:
+            return np.full(len(qs), np.nan)
+        values, positions = self._positions()
+        return np.interp(np.asarray(qs) * self.count, positions, values)
+
+    def cdf(self, x):
+        import numpy as np
+
+        if not self.count:
+            return np.nan
+        values, positions = self._positions()
+        return np.interp(x, values, positions, left=0.0, right=self.count) / self.count
+
+
+class StreamingStatistics:
+    # Statistics of a frame read in chunks, with constant memory per column: exact counts, mean and variance
+    # (merged with Chan's parallel formula) and t-digest quantiles. IQR outlier counts are estimated from the
+    # digest CDF because the quartiles are only known at the end
+    def __init__(self, thresholds=None, compression=TDIGEST_COMPRESSION):
+        import numpy as np
+
+        self.thresholds = thresholds or {}
+        self.compression = compression
+        self.columns = None
+        self.rows = 0
+        self.missing = None
+        self.digests = None
+        self.count = self.mean = self.m2 = self.over_threshold = np.empty(0)
+
+    def update(self, chunk):
+        import numpy as np
+
+        if self.columns is None:
+            self.columns = numeric_columns(chunk)
+            self.digests = [TDigest(self.compression) for _ in self.columns]
+            size = len(self.columns)
+            self.count, self.mean, self.m2, self.over_threshold = np.zeros(size), np.zeros(size), np.zeros(size), np.zeros(size)
+        X = chunk[self.columns].to_numpy(dtype=np.float64)
+        chunk_missing = chunk.isna().sum()
+        self.missing = chunk_missing if self.missing is None else self.missing.add(chunk_missing, fill_value=0)
+        count = (~np.isnan(X)).sum(axis=0)
+
+        with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.where(count > 0, np.nansum(X, axis=0) / np.maximum(count, 1), 0.0)
+            m2 = np.nansum((X - mean) ** 2, axis=0)
+        delta = mean - self.mean
+        total = self.count + count
+        safe_total = np.maximum(total, 1)
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / safe_total
+        self.mean = self.mean + delta * count / safe_total
+        self.count = total
+
+        limits = np.array([self.thresholds.get(col, np.inf) for col in self.columns])
+        self.over_threshold += (X > limits).sum(axis=0)
+        for j, digest in enumerate(self.digests):
+            digest.update(X[:, j])
+        self.rows += len(chunk)
+
+    def report(self, iqr_factor=IQR_FACTOR):
+        # Same shape as describe_frame
+        import numpy as np
+
+        quantiles = np.array([digest.quantile(QUANTILES) for digest in self.digests]).T
+        lower, upper = iqr_bounds(quantiles[1], quantiles[3], iqr_factor)
+        outliers = np.array([
+            round(digest.count * (digest.cdf(low) + 1 - digest.cdf(high))) if digest.count else 0
+            for digest, low, high in zip(self.digests, lower, upper)
+        ])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(self.count > 0, self.mean, np.nan)
+            std = np.sqrt(self.m2 / (self.count - 1))
+        stats = summarize(self.columns, self.count, self.rows, mean, std, quantiles, outliers, self.over_threshold)
+        return stats, self.missing.astype(int)
+
+def frame_chunks(file_path, chunk_rows=STREAMING_CHUNK_ROWS):
+    # Chunks of a CSV or Parquet artifact, never the whole file in memory
+    import pandas as pd
+
+    if str(file_path).endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(file_path, chunksize=chunk_rows)
+
+def stream_statistics(file_path, thresholds=None, chunk_rows=STREAMING_CHUNK_ROWS, compression=TDIGEST_COMPRESSION):
+    statistics = StreamingStatistics(thresholds, compression)
+    for chunk in frame_chunks(file_path, chunk_rows):
+        statistics.update(chunk)
+    return statistics.report()
+
+
+if __name__ == "__main__":
+    # This main can be used to compute the descriptive statistics of a CSV or Parquet file too large for memory
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file_path")
+    parser.add_argument("--output", help="CSV the statistics are saved to")
+    parser.add_argument("--chunk_rows", type=int, default=STREAMING_CHUNK_ROWS)
+    parser.add_argument("--compression", type=int, default=TDIGEST_COMPRESSION)
+
+    args = parser.parse_args()
+
+    start = datetime.now()
+    stats, missing = stream_statistics(args.file_path, chunk_rows=args.chunk_rows, compression=args.compression)
+    print(stats.to_string())
+    print(missing.to_string())
+    if args.output:
+        stats.to_csv(args.output)
+    print(f"[{datetime.now()}] Statistics computed in {(datetime.now() - start).total_seconds():.1f}s")
@@ -1,94 +1,74 @@
-import os
-import mlflow
 import argparse
-import pandas as pd
-from pathlib import Path
 from datetime import datetime
-from azure.storage.blob import BlobServiceClient
+from ddditai.common.artifact_io import ARTIFACT_FORMATS, DEFAULT_ARTIFACT_FORMAT, download_artifact_frame, save_artifact_frame
+from ddditai.common.blob_storage import upload_in_background
+from ddditai.common.context import get_context
+from ddditai.common.stage_cache import FINGERPRINT_TAG, find_cached_run, input_identity, stage_fingerprint
 from ddditai.data.c_data_preparation.b_feature_construction.feature_construction import feature_construction_mlflow_run
 
 # --- CONFIGURATION ---
-AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-
-AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME", "mlflow")
-
-# --- MAIN MLFLOW PIPELINE ---
-EXPERIMENT_NAME = "Sketchfab_Experiment"
-mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
-
-# ATTENTION: at the moment mlflow run locally, if moved on a VM or external server make sure to change the path
-local_appdata = Path(os.environ['LOCALAPPDATA'])
-artifact_base_folder = local_appdata / "MLflow" / "artifacts"
-artifact_base_folder.mkdir(parents=True, exist_ok=True)
-
-experiment_description = (
-    
-"This experiment implements commit 7dc8442 of the Data Understanding document and commit 7bddc87 of Data Preparation document."
-)
-experiment_tags = {
-    "mlflow.note.content": experiment_description,
-}
-
-if not mlflow.get_experiment_by_name(EXPERIMENT_NAME):
-    mlflow.create_experiment(
-        name=EXPERIMENT_NAME,
-        artifact_location=f"file:///{artifact_base_folder.resolve().as_posix()}",
-        tags=experiment_tags
-    )
-
-mlflow.set_experiment(EXPERIMENT_NAME)
-
-def data_cleaning_mlflow_run(run_id: str, artifact_path: str):
-    artifact_local_path = mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path=artifact_path)
-    csv_files = [f for f in os.listdir(artifact_local_path) if f.endswith(".csv")]
-    if not csv_files:
-        raise FileNotFoundError("No CSV found in artifact folder")
-    csv_file_path = os.path.join(artifact_local_path, csv_files[0])
-    df = pd.read_csv(csv_file_path)
+MAX_FACE_COUNT = 200_000
+
+STAGE_NAME = "data_cleaning"
+
+STAGE_PARAMS = {"max_face_count": MAX_FACE_COUNT}  # parameters that change the stage output, part of its fingerprint
+
+def clean_data(df):
+    df = df.drop(columns=["pbr_type"], errors="ignore")
+    df = df.assign(texture_count=df["texture_count"].fillna(df["texture_count"].median()))
+    df = df[df["face_count"] <= MAX_FACE_COUNT]
+    df = df.drop(columns=["user_tags", "user_categories"], errors="ignore")
+    return df
+
+def data_cleaning_mlflow_run(run_id: str, artifact_path: str, artifact_format: str = DEFAULT_ARTIFACT_FORMAT):
+    import mlflow
+
+    context = get_context()
+
+    input_id, df = input_identity(run_id, artifact_path)
+    fingerprint = stage_fingerprint(STAGE_NAME, input_id, [clean_data], {**STAGE_PARAMS, "artifact_format": artifact_format})
+    cached_run_id = find_cached_run(fingerprint)
+    if cached_run_id:
+        print(f"[{datetime.now()}] Data cleaning skipped, output of unchanged run {cached_run_id} is reused")
+        feature_construction_mlflow_run(cached_run_id, "cleaned_data", artifact_format)
+        return
+    if df is None:
+        df = download_artifact_frame(run_id, artifact_path)
 
     # Create run specific folder
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     run_name = f"Data_Cleaning_from_{run_id or 'manual'}_{timestamp}"
 
-    run_folder = artifact_base_folder / run_name
+    run_folder = context.artifact_base_folder / run_name
     csv_folder = run_folder / "cleaned_data"
 
     csv_folder.mkdir(parents=True, exist_ok=True)
 
     # Cleaning operation
-    df = df.drop(columns=["pbr_type"], errors="ignore")
-    df["texture_count"] = df["texture_count"].fillna(df["texture_count"].median())
-    df = df[df["face_count"] <= 200_000]
-    df = df.drop(columns=["user_tags", "user_categories"], errors="ignore")
+    df = clean_data(df)
 
-    cleaned_csv_path = run_folder / "cleaned_data.csv"
-    df.to_csv(cleaned_csv_path, index=False)
+    cleaned_data_path = save_artifact_frame(df, run_folder / "cleaned_data", artifact_format)
 
     with mlflow.start_run(run_name=f"Data_Cleaning_from_{run_id}") as run:
-        mlflow.log_artifact(str(cleaned_csv_path), artifact_path="cleaned_data")
-        print(f"Data cleaning completed. CSV saved at {cleaned_csv_path}")
+        mlflow.log_artifact(str(cleaned_data_path), artifact_path="cleaned_data")
+        # Upload on Azure Blob Storage, in background while the next stages run
+        upload_in_background(cleaned_data_path, f"data_cleaning/Data_Cleaning_{timestamp}/{cleaned_data_path.name}")
+        mlflow.set_tag(FINGERPRINT_TAG, fingerprint)
+        print(f"Data cleaning completed. Data saved at {cleaned_data_path}")
 
         if mlflow.active_run():
             mlflow.end_run()
 
-        feature_construction_mlflow_run(run.info.run_id, "cleaned_data")
+        feature_construction_mlflow_run(run.info.run_id, "cleaned_data", artifact_format)
 
-    # Upload on Azure Blob Storage
-    if AZURE_CONNECTION_STRING:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
-        container_client.upload_blob(
-            name=f"data_cleaning/Data_Cleaning_{timestamp}/cleaned_data.csv",
-            data=open(cleaned_csv_path, "rb"),
-            overwrite=True
-        )
 
 if __name__ == "__main__":
     # This main can be used for manual data cleaning of a specific mlflow run that produced a csv
     parser = argparse.ArgumentParser()
     parser.add_argument("--run_id", required=True)
     parser.add_argument("--artifact_path", required=True)
+    parser.add_argument("--artifact_format", choices=ARTIFACT_FORMATS, default=DEFAULT_ARTIFACT_FORMAT)
 
     args = parser.parse_args()
 
-    data_cleaning_mlflow_run(args.run_id, args.artifact_path)
+    data_cleaning_mlflow_run(args.run_id, args.artifact_path, args.artifact_format)
@@ -1,80 +1,64 @@
-import os
-import mlflow
 import argparse
-import pandas as pd
-from pathlib import Path
 from datetime import datetime
-from azure.storage.blob import BlobServiceClient
+from ddditai.common.artifact_io import ARTIFACT_FORMATS, ARTIFACT_SUFFIXES, DEFAULT_ARTIFACT_FORMAT, find_artifact_file, read_artifact_frame, save_artifact_frame
+from ddditai.common.blob_storage import upload_in_background
+from ddditai.common.context import get_context
+from ddditai.common.stage_cache import FINGERPRINT_TAG, find_cached_run, input_identity, stage_fingerprint
 from ddditai.model.a_training.training import training_mlflow_run
 
 # ---- CONFIGURATION ----
-AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+STAGE_NAME = "data_balancing"
 
-AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME", "mlflow")
+STAGE_PARAMS = {}  # parameters that change the stage output, part of its fingerprint
 
-# --- MAIN MLFLOW PIPELINE ---
-EXPERIMENT_NAME = "Sketchfab_Experiment"
-mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
-
-# ATTENTION: at the moment mlflow run locally, if moved on a VM or external server make sure to change the path
-local_appdata = Path(os.environ['LOCALAPPDATA'])
-artifact_base_folder = local_appdata / "MLflow" / "artifacts"
-artifact_base_folder.mkdir(parents=True, exist_ok=True)
+def balance_data(df):
+    # ATTENTION: in the current strategy no data balancing process is defined
+    return df
 
-experiment_description = (
-    "This experiment implements commit 7dc8442 of the Data Understanding document and commit 7bddc87 of Data Preparation document."
-)
-experiment_tags = {
-    "mlflow.note.content": experiment_description,
-}
+def data_balancing_mlflow_run(run_id: str, artifact_path: str, artifact_format: str = DEFAULT_ARTIFACT_FORMAT):
+    import mlflow
 
-if not mlflow.get_experiment_by_name(EXPERIMENT_NAME):
-    mlflow.create_experiment(
-        name=EXPERIMENT_NAME,
-        artifact_location=f"file:///{artifact_base_folder.resolve().as_posix()}",
-        tags=experiment_tags
-    )
+    context = get_context()
 
-mlflow.set_experiment(EXPERIMENT_NAME)
+    input_id, _ = input_identity(run_id, artifact_path)
+    fingerprint = stage_fingerprint(STAGE_NAME, input_id, [balance_data], {**STAGE_PARAMS, "artifact_format": artifact_format})
+    cached_run_id = find_cached_run(fingerprint)
+    if cached_run_id:
+        print(f"[{datetime.now()}] Data balancing skipped, output of unchanged run {cached_run_id} is reused")
+        training_mlflow_run(cached_run_id, "balanced_data", artifact_format)
+        return
 
-def data_balancing_mlflow_run(run_id: str, artifact_path: str):
     artifact_local_path = mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path=artifact_path)
-    csv_files = [f for f in os.listdir(artifact_local_path) if f.endswith(".csv")]
-    if not csv_files:
-        raise FileNotFoundError("No CSV found in artifact folder")
-    csv_file_path = os.path.join(artifact_local_path, csv_files[0])
-    df = pd.read_csv(csv_file_path)
+    data_file_path = find_artifact_file(artifact_local_path)
 
     # Create run specific folder
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     run_name = f"Data_Balancing_from_{run_id or 'manual'}_{timestamp}"
 
-    run_folder = artifact_base_folder / run_name
+    run_folder = context.artifact_base_folder / run_name
     csv_folder = run_folder / "balanced_data"
 
     csv_folder.mkdir(parents=True, exist_ok=True)
 
-    # ATTENTION: in the current strategy no data balancing process is defined
+    # balance_data does not change the data yet, the input file is logged as it is
+    # and it is only converted when a different format is requested
+    if data_file_path.suffix != ARTIFACT_SUFFIXES[artifact_format]:
+        df = read_artifact_frame(data_file_path)
+        data_file_path = save_artifact_frame(df, run_folder / "balanced_data", artifact_format)
 
     with mlflow.start_run(run_name=f"Data_Balancing_from_{run_id}") as run:
-        mlflow.log_artifact(str(csv_file_path), artifact_path="balanced_data")
+        mlflow.log_artifact(str(data_file_path), artifact_path="balanced_data")
+        # Upload on Azure Blob Storage, in background while the next stages run
+        upload_in_background(data_file_path, f"balanced_data/Data_Balancing_{timestamp}/balanced_data{data_file_path.suffix}")
+        mlflow.set_tag(FINGERPRINT_TAG, fingerprint)
 
         if mlflow.active_run():
             mlflow.end_run()
 
-        training_mlflow_run(run.info.run_id, "balanced_data")
+        training_mlflow_run(run.info.run_id, "balanced_data", artifact_format)
 
-    # Upload on Azure Blob Storage
-    if AZURE_CONNECTION_STRING:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
-        container_client.upload_blob(
-            name=f"balanced_data/Data_Balancing_{timestamp}/balanced_data.csv",
-            data=open(csv_file_path, "rb"),
-            overwrite=True
-        )
 
-    print(f"Data balancing completed. CSV saved at {csv_file_path}")
+    print(f"Data balancing completed. Data saved at {data_file_path}")
 
 
 if __name__ == "__main__":
@@ -82,7 +66,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--run_id", required=True)
     parser.add_argument("--artifact_path", required=True)
+    parser.add_argument("--artifact_format", choices=ARTIFACT_FORMATS, default=DEFAULT_ARTIFACT_FORMAT)
 
     args = parser.parse_args()
 
-    data_balancing_mlflow_run(args.run_id, args.artifact_path)
\ No newline at end of file
+    data_balancing_mlflow_run(args.run_id, args.artifact_path, args.artifact_format)
\ No newline at end of file
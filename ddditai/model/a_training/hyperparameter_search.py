@@ -0,0 +1,131 @@
+import os
+import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# --- CONFIGURATION ---
+RANDOM_STATE = 42
+
+N_CANDIDATES = int(os.getenv("DDDITAI_TUNING_CANDIDATES", "27"))  # configurations sampled in the first rung
+
+MIN_ROUNDS = 50  # boosting rounds given to every candidate in the first rung
+
+MAX_ROUNDS = 1000
+
+REDUCTION_FACTOR = 3  # a rung keeps 1/REDUCTION_FACTOR of the candidates and gives them REDUCTION_FACTOR times the rounds
+
+EARLY_STOPPING_ROUNDS = 20
+
+SEARCH_SPACE = {
+    "max_depth": [3, 4, 5, 6, 8],
+    "learning_rate": [0.03, 0.05, 0.1, 0.2, 0.3],
+    "min_child_weight": [1, 2, 4, 8],
+    "subsample": [0.6, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "reg_lambda": [0.1, 1.0, 5.0, 10.0],
+    "gamma": [0.0, 0.1, 0.5, 1.0],
+}
+
+# Parameters that change the outcome of a search, part of the training fingerprint when tuning is enabled
+SEARCH_PARAMS = {
+    "n_candidates": N_CANDIDATES,
+    "min_rounds": MIN_ROUNDS,
+    "max_rounds": MAX_ROUNDS,
+    "reduction_factor": REDUCTION_FACTOR,
+    "early_stopping_rounds": EARLY_STOPPING_ROUNDS,
+    "search_space": SEARCH_SPACE,
+}
+
+
+def sample_candidates(n_candidates, seed=RANDOM_STATE):
+    rng = random.Random(seed)
+    candidates = []
+    for _ in range(n_candidates * 10):
+        candidate = {name: rng.choice(values) for name, values in SEARCH_SPACE.items()}
+        if candidate not in candidates:
+            candidates.append(candidate)
+        if len(candidates) == n_candidates:
+            break
+    return candidates
+
+# --- TRIAL EVALUATION ---
+_search_data = None
+
+def init_search_worker(data):
+    global _search_data
+    _search_data = data
+
+def evaluate_candidate(params, rounds, n_jobs, data=None):
+    # Trains one candidate for at most rounds boosting rounds, early stopping on the validation split
+    from xgboost import XGBClassifier
+
+    X_fit, y_fit, X_val, y_val = data or _search_data
+    n_classes = int(max(y_fit.max(), y_val.max())) + 1
+    model = XGBClassifier(
+        **params,
+        n_estimators=rounds,
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        eval_metric='mlogloss' if n_classes > 2 else 'logloss',
+        random_state=RANDOM_STATE,
+        n_jobs=n_jobs
+    )
+    model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+    return {"params": params, "rounds": rounds, "val_loss": float(model.best_score), "best_iteration": int(model.best_iteration)}
+
+def successive_halving(X_fit, y_fit, X_val, y_val, n_workers=1, n_candidates=N_CANDIDATES):
+    # Every rung trains the surviving candidates with a larger round budget, only the best
+    # 1/REDUCTION_FACTOR survive. Candidates of a rung are evaluated in parallel across cores
+    from ddditai.common.resources import available_cores
+
+    cores = available_cores()
+    n_workers = min(n_workers or cores, n_candidates)
+    n_jobs = max(1, cores // max(n_workers, 1))
+    data = (X_fit, y_fit, X_val, y_val)
+
+    executor = None
+    if n_workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_search_worker,
+            initargs=(data,)
+        )
+
+    candidates = sample_candidates(n_candidates)
+    rounds = MIN_ROUNDS
+    rung = 0
+    trials = []
+    try:
+        while True:
+            if executor:
+                futures = [executor.submit(evaluate_candidate, params, rounds, n_jobs) for params in candidates]
+                results = [future.result() for future in futures]
+            else:
+                results = [evaluate_candidate(params, rounds, n_jobs, data) for params in candidates]
+            for result in results:
+                result["rung"] = rung
+            trials.extend(results)
+
+            results.sort(key=lambda result: result["val_loss"])
+            if len(results) == 1 or rounds >= MAX_ROUNDS:
+                return results[0], trials
+            candidates = [result["params"] for result in results[:max(1, len(results) // REDUCTION_FACTOR)]]
+            rounds = min(rounds * REDUCTION_FACTOR, MAX_ROUNDS)
+            rung += 1
+    finally:
+        if executor:
+            executor.shutdown()
+
+def log_trials(target_name, trials, best):
+    # Each trial is a nested run of the active training run, the best parameters are logged on the training run
+    import mlflow
+
+    if not mlflow.active_run():
+        return
+    for idx, trial in enumerate(trials):
+        with mlflow.start_run(run_name=f"Tuning_{target_name}_rung{trial['rung']}_{idx}", nested=True):
+            mlflow.log_params({**trial["params"], "target": target_name, "rung": trial["rung"], "rounds": trial["rounds"]})
+            mlflow.log_metrics({"val_loss": trial["val_loss"], "best_iteration": trial["best_iteration"]})
+    mlflow.log_params({f"{name}_{target_name}": value for name, value in best["params"].items()})
+    mlflow.log_params({f"n_estimators_{target_name}": best["best_iteration"] + 1})
+    mlflow.log_metric(f"val_loss_{target_name}", best["val_loss"])
@@ -0,0 +1,264 @@
+import os
+import copy
+import time
+import tempfile
+from datetime import datetime
+
+# --- CONFIGURATION ---
+F1_TOLERANCE = float(os.getenv("DDDITAI_COMPACTION_F1_TOLERANCE", "0.01"))  # F1 a compact model may lose against the full one
+
+TREE_FRACTIONS = [1.0, 0.75, 0.5, 0.25]  # share of the boosting rounds kept, the first rounds carry most of the signal
+
+DEPTH_CAPS = [4, 3]  # the model is trained again with these depths when it is deeper
+
+DEFAULT_MAX_DEPTH = 6  # XGBoost depth when max_depth is not set
+
+MERGE_TOLERANCES = [0.0, 0.05]  # sibling leaves closer than this are merged, 0 only prunes splits that change nothing
+
+QUANTIZE_THRESHOLDS = os.getenv("DDDITAI_QUANTIZE_THRESHOLDS", "0") == "1"  # round split thresholds to float16 precision
+
+LATENCY_RUNS = 200  # batch 1 runs whose median is the latency of a candidate
+
+LATENCY_TOLERANCE = 0.1  # candidates within this share of the fastest latency are tied, the one with fewest nodes wins
+
+# Parameters that change the outcome of a compaction, part of the training fingerprint when compaction is enabled
+COMPACTION_PARAMS = {
+    "f1_tolerance": F1_TOLERANCE,
+    "tree_fractions": TREE_FRACTIONS,
+    "depth_caps": DEPTH_CAPS,
+    "merge_tolerances": MERGE_TOLERANCES,
+    "quantize_thresholds": QUANTIZE_THRESHOLDS,
+    "latency_tolerance": LATENCY_TOLERANCE,
+}
+
+NODE_ATTRIBUTES = [
+    "nodes_treeids", "nodes_nodeids", "nodes_featureids", "nodes_values", "nodes_modes",
+    "nodes_truenodeids", "nodes_falsenodeids", "nodes_missing_value_tracks_true"
+]
+
+LEAF_ATTRIBUTES = ["class_treeids", "class_nodeids", "class_ids", "class_weights"]
+
+# --- TREE ENSEMBLE EDITING ---
+def tree_ensemble(onnx_model):
+    for node in onnx_model.graph.node:
+        if node.op_type == "TreeEnsembleClassifier":
+            return node
+    raise ValueError("The model has no TreeEnsembleClassifier node")
+
+def read_trees(onnx_model):
+    # Trees in ensemble order, each one maps its node ids to the split or to the class weights of the leaf
+    from onnx import helper
+
+    attrs = {attr.name: list(helper.get_attribute_value(attr)) for attr in tree_ensemble(onnx_model).attribute}
+    trees = {}
+    for i, tree_id in enumerate(attrs["nodes_treeids"]):
+        trees.setdefault(tree_id, {})[attrs["nodes_nodeids"][i]] = {
+            "mode": attrs["nodes_modes"][i],
+            "feature": attrs["nodes_featureids"][i],
+            "value": attrs["nodes_values"][i],
+            "true": attrs["nodes_truenodeids"][i],
+            "false": attrs["nodes_falsenodeids"][i],
+            "missing_true": attrs["nodes_missing_value_tracks_true"][i],
+            "leaf": [],
+        }
+    for i, tree_id in enumerate(attrs["class_treeids"]):
+        trees[tree_id][attrs["class_nodeids"][i]]["leaf"].append((attrs["class_ids"][i], attrs["class_weights"][i]))
+    return [trees[tree_id] for tree_id in sorted(trees)]
+
+def reachable_nodes(tree, node_id=0):
+    entry = tree[node_id]
+    if entry["mode"] == b"LEAF":
+        return [node_id]
+    return [node_id] + reachable_nodes(tree, entry["true"]) + reachable_nodes(tree, entry["false"])
+
+def write_trees(onnx_model, trees):
+    # Returns a copy of the model whose ensemble holds trees, nodes are renumbered and unreachable ones dropped
+    import onnx
+    from onnx import AttributeProto, helper
+
+    columns = {name: [] for name in NODE_ATTRIBUTES + LEAF_ATTRIBUTES}
+    for tree_id, tree in enumerate(trees):
+        order = reachable_nodes(tree)
+        new_ids = {old_id: new_id for new_id, old_id in enumerate(order)}
+        for old_id in order:
+            entry = tree[old_id]
+            is_leaf = entry["mode"] == b"LEAF"
+            columns["nodes_treeids"].append(tree_id)
+            columns["nodes_nodeids"].append(new_ids[old_id])
+            columns["nodes_featureids"].append(0 if is_leaf else entry["feature"])
+            columns["nodes_values"].append(0.0 if is_leaf else entry["value"])
+            columns["nodes_modes"].append(entry["mode"])
+            columns["nodes_truenodeids"].append(0 if is_leaf else new_ids[entry["true"]])
+            columns["nodes_falsenodeids"].append(0 if is_leaf else new_ids[entry["false"]])
+            columns["nodes_missing_value_tracks_true"].append(0 if is_leaf else entry["missing_true"])
+            if is_leaf:
+                for class_id, weight in entry["leaf"]:
+                    columns["class_treeids"].append(tree_id)
+                    columns["class_nodeids"].append(new_ids[old_id])
+                    columns["class_ids"].append(class_id)
+                    columns["class_weights"].append(weight)
+
+    model = onnx.ModelProto()
+    model.CopyFrom(onnx_model)
+    node = tree_ensemble(model)
+    kept = [attr for attr in node.attribute if attr.name not in columns and attr.name != "nodes_hitrates"]
+    attr_types = {"nodes_values": AttributeProto.FLOATS, "class_weights": AttributeProto.FLOATS, "nodes_modes": AttributeProto.STRINGS}
+    del node.attribute[:]
+    node.attribute.extend(kept + [
+        helper.make_attribute(name, values, attr_type=attr_types.get(name, AttributeProto.INTS))
+        for name, values in columns.items()
+    ])
+    return model
+
+def prune_tree(tree, merge_tolerance=0.0, node_id=0):
+    # A split whose two children are leaves with the same weights (within merge_tolerance) becomes a leaf
+    entry = tree[node_id]
+    if entry["mode"] == b"LEAF":
+        return
+    prune_tree(tree, merge_tolerance, entry["true"])
+    prune_tree(tree, merge_tolerance, entry["false"])
+    true_leaf, false_leaf = tree[entry["true"]], tree[entry["false"]]
+    if true_leaf["mode"] != b"LEAF" or false_leaf["mode"] != b"LEAF":
+        return
+    true_weights, false_weights = dict(true_leaf["leaf"]), dict(false_leaf["leaf"])
+    if true_weights.keys() != false_weights.keys():
+        return
+    if all(abs(true_weights[c] - false_weights[c]) <= merge_tolerance for c in true_weights):
+        entry["mode"] = b"LEAF"
+        entry["leaf"] = [(c, (true_weights[c] + false_weights[c]) / 2) for c in true_weights]
+
+def quantize_thresholds(trees):
+    import numpy as np
+
+    for tree in trees:
+        for entry in tree.values():
+            if entry["mode"] != b"LEAF":
+                entry["value"] = float(np.float32(np.float16(entry["value"])))
+
+def optimize_graph(onnx_model):
+    # Offline ONNX Runtime graph optimizations, basic level only so that the saved graph stays portable
+    import onnx
+    import onnxruntime as ort
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        optimized_path = os.path.join(tmp_dir, "optimized.onnx")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        options.optimized_model_filepath = optimized_path
+        ort.InferenceSession(onnx_model.SerializeToString(), sess_options=options, providers=["CPUExecutionProvider"])
+        return onnx.load(optimized_path)
+
+# --- CANDIDATE EVALUATION ---
+def inference_session(onnx_model):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = 1
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(onnx_model.SerializeToString(), sess_options=options, providers=["CPUExecutionProvider"])
+
+def batch_latency_ms(session, X, runs=LATENCY_RUNS):
+    import numpy as np
+
+    input_name = session.get_inputs()[0].name
+    sample = X[:1]
+    for _ in range(10):
+        session.run(None, {input_name: sample})
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        session.run(None, {input_name: sample})
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+def evaluate_candidate(onnx_model, X_test, y_test):
+    from sklearn.metrics import f1_score
+
+    session = inference_session(onnx_model)
+    y_pred = session.run(["label"], {session.get_inputs()[0].name: X_test})[0]
+    average = "binary" if len(set(y_test) | {0, 1}) == 2 else "macro"
+    return {
+        "f1_score": f1_score(y_test, y_pred, average=average, zero_division=0),
+        "latency_ms": batch_latency_ms(session, X_test),
+        "nodes": sum(len(reachable_nodes(tree)) for tree in read_trees(onnx_model)),
+        "size_kb": onnx_model.ByteSize() / 1024,
+    }, y_pred
+
+def convert_like(model, onnx_model, n_features, target_opset):
+    import onnxmltools
+    from onnxmltools.convert.common.data_types import FloatTensorType
+
+    initial_type = [(onnx_model.graph.input[0].name, FloatTensorType([None, n_features]))]
+    return onnxmltools.convert_xgboost(model, initial_types=initial_type, target_opset=target_opset)
+
+def trees_per_round(trees):
+    # A binary model grows one tree per boosting round, a multiclass one a tree per class
+    return len({class_id for tree in trees for entry in tree.values() for class_id, _ in entry["leaf"]})
+
+def compact_trees(source, n_rounds, merge_tolerance):
+    # The first n_rounds boosting rounds of source with their redundant splits pruned, as an optimized ONNX graph
+    trees = read_trees(source)
+    kept = copy.deepcopy(trees[:n_rounds * trees_per_round(trees)])
+    for tree in kept:
+        prune_tree(tree, merge_tolerance)
+    if QUANTIZE_THRESHOLDS:
+        quantize_thresholds(kept)
+    return optimize_graph(write_trees(source, kept))
+
+def select_candidate(candidates, f1_tolerance=F1_TOLERANCE, latency_tolerance=LATENCY_TOLERANCE):
+    # The fastest candidate whose validation F1 stays within f1_tolerance of the first one (the uncapped model).
+    # Latencies are a few hundredths of a millisecond, those within latency_tolerance of the fastest are measurement
+    # noise apart and the smallest of them is chosen
+    baseline_f1 = candidates[0]["val_f1_score"]
+    eligible = [c for c in candidates if c["val_f1_score"] >= baseline_f1 - f1_tolerance]
+    fastest = min(c["latency_ms"] for c in eligible)
+    return min((c for c in eligible if c["latency_ms"] <= fastest * (1 + latency_tolerance)), key=lambda c: c["nodes"])
+
+def compact_model(model, onnx_model, X_train, y_train, validation, X_test, y_test, name, target_opset):
+    # Candidates cap the depth (by training again) and the boosting rounds, prune redundant splits and optionally
+    # quantize the thresholds. They are fitted on the validation split (X_fit, X_val, y_fit, y_val) of the training
+    # rows and the fastest one whose validation F1 stays within F1_TOLERANCE of the uncapped model is chosen. Its
+    # settings are then applied to the model trained on every training row, the test rows only measure the result
+    from xgboost import XGBClassifier
+
+    X_fit, X_val, y_fit, y_val = validation
+    params = model.get_params()
+    model_depth = params.get("max_depth") or DEFAULT_MAX_DEPTH
+
+    def fit(depth, X, y):
+        fitted = XGBClassifier(**{**params, "max_depth": depth})
+        fitted.fit(X, y)
+        return convert_like(fitted, onnx_model, X.shape[1], target_opset)
+
+    candidates = []
+    for depth in [model_depth] + [depth for depth in DEPTH_CAPS if depth < model_depth]:
+        source = fit(depth, X_fit, y_fit)
+        trees = read_trees(source)
+        rounds = len(trees) // trees_per_round(trees)
+        for n_rounds in sorted({max(1, round(rounds * fraction)) for fraction in TREE_FRACTIONS}, reverse=True):
+            for merge_tolerance in MERGE_TOLERANCES:
+                scores, _ = evaluate_candidate(compact_trees(source, n_rounds, merge_tolerance), X_val, y_val)
+                candidates.append({
+                    "model": name, "max_depth": depth, "rounds": n_rounds, "merge_tolerance": merge_tolerance,
+                    "val_f1_score": scores.pop("f1_score"), **scores
+                })
+
+    # The first candidate is the uncapped model, its redundant splits pruned without changing any prediction
+    chosen = select_candidate(candidates)
+
+    source = onnx_model if chosen["max_depth"] == model_depth else fit(chosen["max_depth"], X_train, y_train)
+    compacted = compact_trees(source, chosen["rounds"], chosen["merge_tolerance"])
+    test_scores, y_pred = evaluate_candidate(compacted, X_test, y_test)
+    report = [
+        {**row, "selected": row is chosen, "test_f1_score": test_scores["f1_score"] if row is chosen else None}
+        for row in candidates
+    ]
+
+    print(f"[{datetime.now()}] Compaction of {name}, candidates ranked on {len(y_val)} validation rows")
+    print(f"{'depth':>6}{'rounds':>8}{'merge':>8}{'nodes':>8}{'size (KB)':>11}{'val f1':>8}{'latency (ms)':>14}")
+    for row in report:
+        print(f"{row['max_depth']:>6}{row['rounds']:>8}{row['merge_tolerance']:>8}{row['nodes']:>8}{row['size_kb']:>11.1f}"
+              f"{row['val_f1_score']:>8.4f}{row['latency_ms']:>14.4f}{'  <- selected' if row['selected'] else ''}")
+    print(f"[{datetime.now()}] Selected model of {name}: test f1_score={test_scores['f1_score']:.4f}, "
+          f"{test_scores['nodes']} nodes, {test_scores['latency_ms']:.4f} ms")
+    return compacted, y_pred, report
@@ -1,170 +1,566 @@
 import os
-import mlflow
 import argparse
-import onnxmltools
-import pandas as pd
+import multiprocessing
 from datetime import datetime
-from pathlib import Path
-from sklearn.metrics import accuracy_score, classification_report, precision_score, recall_score, f1_score
-from sklearn.model_selection import train_test_split
-from xgboost import XGBClassifier
-from imblearn.over_sampling import SMOTE
-from onnxmltools.convert.common.data_types import FloatTensorType
-from azure.storage.blob import BlobServiceClient
+from concurrent.futures import ProcessPoolExecutor
+from ddditai.common.artifact_io import ARTIFACT_FORMATS, DEFAULT_ARTIFACT_FORMAT, download_artifact_frame
+from ddditai.common.blob_storage import MANIFEST_BLOB, file_sha256, upload_file, upload_in_background, upload_json, wait_for_uploads
+from ddditai.common.context import MODELING_EXPERIMENT_DESCRIPTION, get_context
+from ddditai.common.resources import available_cores
+from ddditai.common.stage_cache import FINGERPRINT_TAG, find_cached_run, input_identity, stage_fingerprint
+from ddditai.model.a_training.model_compaction import compact_model
 
 # ---- CONFIGURATION ----
-AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+TEST_SIZE = 0.2
 
-AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME", "mlflow")
+RANDOM_STATE = 42
 
-# --- MAIN MLFLOW PIPELINE ---
-EXPERIMENT_NAME = "Sketchfab_Experiment"
-mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+ONNX_TARGET_OPSET = 14
 
-# ATTENTION: at the moment mlflow run locally, if moved on a VM or external server make sure to change the path
-local_appdata = Path(os.environ['LOCALAPPDATA'])
-artifact_base_folder = local_appdata / "MLflow" / "artifacts"
-artifact_base_folder.mkdir(parents=True, exist_ok=True)
+TRAINING_WORKERS = int(os.getenv("DDDITAI_TRAINING_WORKERS", "1"))  # tag models trained in parallel, 0 uses every core
 
-experiment_description = (
-    "This experiment implements commit 7801a59 of the Modeling document."
-)
+# ovr: one binary model per tag, multiclass: one softmax over every tag,
+# grouped: one softmax per group of mutually exclusive tags. multiclass and grouped export a single ONNX graph.
+# The probabilities of a softmax sum to 1, so a grouped model assigns at most one tag per group (exactly one
+# for a two tag group)
+TRAINING_STRATEGIES = ["ovr", "multiclass", "grouped"]
 
-experiment_tags = {
-    "mlflow.note.content": experiment_description,
+TRAINING_STRATEGY = os.getenv("DDDITAI_TRAINING_STRATEGY", "ovr")
+
+TAG_GROUPS = {
+    "complexity": ["lowpoly", "highpoly"],
+    "type": ["prop", "character", "environment", "weapon"],
+    "style": ["realistic-style", "stylized"],
 }
 
-if not mlflow.get_experiment_by_name(EXPERIMENT_NAME):
-    mlflow.create_experiment(
-        name=EXPERIMENT_NAME,
-        artifact_location=f"file:///{artifact_base_folder.resolve().as_posix()}",
-        tags=experiment_tags
+SMOTE_NEIGHBORS = 5
+
+TUNING = os.getenv("DDDITAI_TUNING", "0") == "1"  # successive halving search of the XGBoost parameters of every model
+
+VALIDATION_SIZE = 0.2  # share of the training rows used to early stop and rank the candidates of the search
+
+COMPACTION = os.getenv("DDDITAI_COMPACTION", "0") == "1"  # export the fastest compact model within the F1 tolerance
+
+EVALUATION_THRESHOLD = 0.5  # probability from which a tag of a single graph counts as predicted, as at inference
+
+FEATURE_SPEC_FILE = "feature_spec.json"  # feature order and scaling the models expect, written next to the models
+
+MANIFEST_FILE = "manifest.json"  # files, checksums and metrics of a training, next to its models folder on Azure
+
+STAGE_NAME = "training"
+
+STAGE_PARAMS = {"test_size": TEST_SIZE, "random_state": RANDOM_STATE, "target_opset": ONNX_TARGET_OPSET}  # parameters that change the stage output, part of its fingerprint
+
+def training_data(df):
+    # Features, labels and the train/test split are computed once per training run and shared by every model:
+    # a contiguous float32 feature matrix, a label matrix with one column per tag and the split row indices
+    import numpy as np
+    from sklearn.model_selection import train_test_split
+
+    tags = list(df['associated_tag'].unique())
+    feature_cols = df.columns.drop(['uid', 'associated_tag'])
+    X = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float32))
+    labels = df['associated_tag'].to_numpy()
+    # Column-major so that the target of a tag is a contiguous column view
+    Y = np.asfortranarray(np.stack([labels == tag for tag in tags], axis=1).astype(np.int8))
+
+    train_idx, test_idx = train_test_split(
+        np.arange(len(df)), test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=labels
+    )
+    train_idx.sort()
+    test_idx.sort()
+    return {
+        "tags": tags,
+        "feature_names": list(feature_cols),
+        "X": X,
+        "Y": Y,
+        "train_idx": train_idx,
+        "test_idx": test_idx,
+        "X_train": X[train_idx],
+        "X_test": X[test_idx],
+        "Y_train": np.asfortranarray(Y[train_idx]),
+        "Y_test": np.asfortranarray(Y[test_idx]),
+    }
+
+def tag_target(data, tag):
+    tag_idx = data["tags"].index(tag)
+    return data["X_train"], data["X_test"], data["Y_train"][:, tag_idx], data["Y_test"][:, tag_idx]
+
+def group_target(data, group_tags):
+    columns_idx = [data["tags"].index(tag) for tag in group_tags]
+    Y_train, Y_test = data["Y_train"][:, columns_idx], data["Y_test"][:, columns_idx]
+    X_train, X_test = data["X_train"], data["X_test"]
+    if len(group_tags) == 1:
+        return X_train, X_test, Y_train[:, 0], Y_test[:, 0]
+    # Tags of a group are mutually exclusive, the model only sees models tagged with one of them
+    train_rows, test_rows = Y_train.any(axis=1), Y_test.any(axis=1)
+    return X_train[train_rows], X_test[test_rows], Y_train[train_rows].argmax(axis=1), Y_test[test_rows].argmax(axis=1)
+
+def oversample(X_train, y_train):
+    # SMOTE on the minority classes. A binary target (ovr and single tag groups) is oversampled when its positives
+    # are fewer than half of the rows, a multiclass target when the classes are unbalanced and the smallest one has
+    # enough neighbors
+    import numpy as np
+    from imblearn.over_sampling import SMOTE
+
+    class_counts = np.bincount(y_train)
+    if len(class_counts) <= 2:
+        unbalanced = len(np.unique(y_train)) > 1 and y_train.sum() < len(y_train) / 2
+    else:
+        unbalanced = len(set(class_counts)) > 1 and class_counts.min() > SMOTE_NEIGHBORS
+    if unbalanced:
+        smote = SMOTE(random_state=RANDOM_STATE, k_neighbors=SMOTE_NEIGHBORS)
+        X_train, y_train = smote.fit_resample(X_train, y_train)
+        print(f"SMOTE applied: new dimensions {X_train.shape}")
+    else:
+        print("SMOTE not applied")
+    return X_train, y_train
+
+def validation_split(X_train, y_train):
+    # Training rows the search and the compaction fit on (oversampled) and the validation rows they are ranked on,
+    # split before oversampling so that no synthetic row is validated on
+    from sklearn.model_selection import train_test_split
+
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=VALIDATION_SIZE, random_state=RANDOM_STATE, stratify=y_train
+    )
+    X_fit, y_fit = oversample(X_fit, y_fit)
+    return X_fit, X_val, y_fit, y_val
+
+def tune_model(X_train, y_train, target_name, n_workers=0):
+    # Parameters are searched on a validation split of the training rows, the test rows stay unseen.
+    # The final model gets the boosting rounds at which the best candidate stopped improving
+    from ddditai.model.a_training.hyperparameter_search import log_trials, successive_halving
+
+    print(f"[{datetime.now()}] Tuning {target_name}")
+    X_fit, X_val, y_fit, y_val = validation_split(X_train, y_train)
+    best, trials = successive_halving(X_fit, y_fit, X_val, y_val, n_workers)
+    log_trials(target_name, trials, best)
+    params = {**best["params"], "n_estimators": best["best_iteration"] + 1}
+    print(f"[{datetime.now()}] Best parameters for {target_name} after {len(trials)} trials: {params} (val_loss={best['val_loss']:.4f})")
+    return params
+
+def train_tag_model(data, tag, models_folder, results_folder, n_jobs=None, params=None, compact=False):
+    import onnxmltools
+    import pandas as pd
+    from onnxmltools.convert.common.data_types import FloatTensorType
+    from sklearn.metrics import accuracy_score, classification_report, precision_score, recall_score, f1_score
+    from xgboost import XGBClassifier
+
+    print(f"Training tag: {tag}")
+
+    y = data["Y"][:, data["tags"].index(tag)]
+    X_train, X_test, y_train, y_test = tag_target(data, tag)
+
+    print(f"Dataset dimension: {data['X'].shape}")
+    print(f"Number of positive examples: {y.sum()}")
+    print(f"Number of negative examples: {len(y) - y.sum()}")
+
+    # Compaction candidates are ranked on a validation split of the training rows, the test rows stay unseen
+    validation = validation_split(X_train, y_train) if compact else None
+
+    # Apply SMOTE if necessary
+    X_train, y_train = oversample(X_train, y_train)
+
+    # Train XGBoost
+    model = XGBClassifier(eval_metric='logloss', random_state=RANDOM_STATE, n_jobs=n_jobs, **(params or {}))
+    model.fit(X_train, y_train)
+
+    # Export in ONNX
+    initial_type = [('float_input', FloatTensorType([None, X_train.shape[1]]))]
+
+    onnx_model = onnxmltools.convert_xgboost(
+        model,
+        initial_types=initial_type,
+        target_opset=ONNX_TARGET_OPSET
+    )
+
+    # Predictions
+    y_pred = model.predict(X_test)
+    compaction_path = None
+    if compact:
+        onnx_model, y_pred, report = compact_model(
+            model, onnx_model, X_train, y_train, validation, X_test, y_test, tag, ONNX_TARGET_OPSET
+        )
+        compaction_path = os.path.join(results_folder, f"compaction_{tag}.csv")
+        pd.DataFrame(report).to_csv(compaction_path, index=False)
+
+    # Metrics
+    print(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
+    print(classification_report(y_test, y_pred))
+
+    metrics = {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred),
+        "recall": recall_score(y_test, y_pred),
+        "f1_score": f1_score(y_test, y_pred)
+    }
+
+    onnx_file_path = os.path.join(models_folder, f"xgb_model_{tag}.onnx")
+    onnxmltools.utils.save_model(onnx_model, onnx_file_path)
+    print(f"Saved ONNX model in: {onnx_file_path}\n")
+
+    # Results
+    results_df = pd.DataFrame([metrics])
+
+    csv_path = os.path.join(results_folder, f"results_{tag}.csv")
+    print(f"Saving results: {csv_path}")
+    results_df.to_csv(csv_path, index=False)
+
+    return {"metrics": {tag: metrics}, "model_path": onnx_file_path, "results_path": csv_path, "compaction_path": compaction_path}
+
+def feature_spec(df, feature_names):
+    # A scaled feature is affine in its source column, its coefficients are recovered from the training rows so that
+    # inference can scale the counts of a new model with the statistics the scaling run used
+    import numpy as np
+
+    spec = {"features": feature_names, "scaled": {}}
+    for name in feature_names:
+        source = name[:-len("_scaled")] if name.endswith("_scaled") else None
+        if source not in df.columns:
+            continue
+        x, y = df[source].to_numpy(dtype=np.float64), df[name].to_numpy(dtype=np.float64)
+        scale, offset = np.polyfit(x, y, 1) if np.ptp(x) > 0 else (0.0, y[0])
+        spec["scaled"][name] = {"source": source, "scale": float(scale), "offset": float(offset)}
+    return spec
+
+def write_feature_spec(df, feature_names, models_folder):
+    import json
+
+    spec_path = os.path.join(models_folder, FEATURE_SPEC_FILE)
+    with open(spec_path, "w") as f:
+        json.dump(feature_spec(df, feature_names), f, indent=2)
+    return spec_path
+
+# --- SINGLE MODEL TRAINING ---
+def tag_groups(tags, strategy):
+    if strategy == "multiclass":
+        return {"all": list(tags)}
+    groups = {name: [tag for tag in group if tag in tags] for name, group in TAG_GROUPS.items()}
+    groups = {name: group for name, group in groups.items() if group}
+    grouped_tags = {tag for group in groups.values() for tag in group}
+    # A tag outside every group keeps a binary model of its own inside the single graph
+    for tag in tags:
+        if tag not in grouped_tags:
+            groups[tag] = [tag]
+    return groups
+
+def graph_probabilities(onnx_model, X, columns=None):
+    from ddditai.model.a_training.model_compaction import inference_session
+
+    session = inference_session(onnx_model)
+    probabilities = session.run(["probabilities"], {session.get_inputs()[0].name: X})[0]
+    return probabilities if columns is None else probabilities[:, columns]
+
+def train_group_model(data, group_name, group_tags, n_jobs=None, params=None, compact=False):
+    import onnxmltools
+    from onnxmltools.convert.common.data_types import FloatTensorType
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+    from xgboost import XGBClassifier
+
+    print(f"Training group {group_name}: {group_tags}")
+
+    X_train, X_test, y_train, y_test = group_target(data, group_tags)
+    columns = None if len(group_tags) > 1 else [1]
+    validation = validation_split(X_train, y_train) if compact else None
+    X_train, y_train = oversample(X_train, y_train)
+
+    model = XGBClassifier(
+        eval_metric='mlogloss' if len(group_tags) > 2 else 'logloss', random_state=RANDOM_STATE, n_jobs=n_jobs,
+        **(params or {})
     )
+    model.fit(X_train, y_train)
+    initial_type = [('float_input', FloatTensorType([None, X_train.shape[1]]))]
+    onnx_model = onnxmltools.convert_xgboost(model, initial_types=initial_type, target_opset=ONNX_TARGET_OPSET)
+
+    report = None
+    if compact:
+        onnx_model, _, report = compact_model(
+            model, onnx_model, X_train, y_train, validation, X_test, y_test, group_name, ONNX_TARGET_OPSET
+        )
+
+    # Every tag is evaluated on all the test rows with the exported graph, like a per-tag model, so that the
+    # f1_score_<tag> metrics of every strategy are comparable. Rows tagged outside the group count as negatives
+    probabilities = graph_probabilities(onnx_model, data["X_test"], columns)
+    metrics = {}
+    for idx, tag in enumerate(group_tags):
+        tag_true = data["Y_test"][:, data["tags"].index(tag)] == 1
+        tag_pred = probabilities[:, idx] >= EVALUATION_THRESHOLD
+        metrics[tag] = {
+            "accuracy": accuracy_score(tag_true, tag_pred),
+            "precision": precision_score(tag_true, tag_pred, zero_division=0),
+            "recall": recall_score(tag_true, tag_pred, zero_division=0),
+            "f1_score": f1_score(tag_true, tag_pred, zero_division=0)
+        }
+        print(f"{tag}: f1_score={metrics[tag]['f1_score']:.4f}")
+    return onnx_model, columns, metrics, report
+
+def combine_onnx_models(parts, tags):
+    # Merges the group models into one graph that shares the input and returns the probability of every tag
+    # in a single [N, len(tags)] output, the tag order is stored in the "tags" metadata of the model
+    import json
+    import onnx
+    from onnx import helper, TensorProto
+
+    nodes, initializers, probabilities = [], [], []
+    opsets = {"": ONNX_TARGET_OPSET}
+    for group_name, onnx_model, columns in parts:
+        prefix = f"{group_name}_"
+        graph = onnx_model.graph
+        renamed = {init.name: prefix + init.name for init in graph.initializer}
+        for node in graph.node:
+            renamed.update({output: prefix + output for output in node.output if output})
+
+        for init in graph.initializer:
+            tensor = onnx.TensorProto()
+            tensor.CopyFrom(init)
+            tensor.name = renamed[init.name]
+            initializers.append(tensor)
+        for node in graph.node:
+            merged = onnx.NodeProto()
+            merged.CopyFrom(node)
+            merged.name = prefix + (node.name or node.op_type)
+            merged.input[:] = [renamed.get(name, name) for name in node.input]
+            merged.output[:] = [renamed.get(name, name) for name in node.output]
+            nodes.append(merged)
+
+        group_probabilities = renamed["probabilities"]
+        if columns is not None:
+            initializers.append(helper.make_tensor(f"{prefix}columns", TensorProto.INT64, [len(columns)], columns))
+            nodes.append(helper.make_node(
+                "Gather", [group_probabilities, f"{prefix}columns"], [f"{prefix}selected"], axis=1, name=f"{prefix}select"
+            ))
+            group_probabilities = f"{prefix}selected"
+        probabilities.append(group_probabilities)
+
+        for opset in onnx_model.opset_import:
+            opsets[opset.domain] = max(opsets.get(opset.domain, 0), opset.version)
+
+    nodes.append(helper.make_node("Concat", probabilities, ["probabilities"], axis=1, name="concat_probabilities"))
+    graph = helper.make_graph(
+        nodes, "ddditai_tags", [parts[0][1].graph.input[0]],
+        [helper.make_tensor_value_info("probabilities", TensorProto.FLOAT, [None, len(tags)])],
+        initializers
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid(domain, version) for domain, version in opsets.items()])
+    model.ir_version = parts[0][1].ir_version
+    helper.set_model_props(model, {"tags": json.dumps(tags)})
+    onnx.checker.check_model(model)
+    return model
+
+def train_single_model(data, strategy, models_folder, results_folder, tune=False, n_workers=0, compact=False):
+    import onnxmltools
+    import pandas as pd
+
+    parts, metrics, output_tags, compaction = [], {}, [], []
+    for group_name, group_tags in tag_groups(data["tags"], strategy).items():
+        params = None
+        if tune:
+            X_train, _, y_train, _ = group_target(data, group_tags)
+            params = tune_model(X_train, y_train, group_name, n_workers)
+        onnx_model, columns, group_metrics, report = train_group_model(
+            data, group_name, group_tags, params=params, compact=compact
+        )
+        parts.append((group_name, onnx_model, columns))
+        compaction.extend(report or [])
+        metrics.update(group_metrics)
+        output_tags.extend(group_tags)
+
+    onnx_file_path = os.path.join(models_folder, f"xgb_model_{strategy}.onnx")
+    onnxmltools.utils.save_model(combine_onnx_models(parts, output_tags), onnx_file_path)
+    print(f"Saved ONNX model in: {onnx_file_path}\n")
+
+    csv_path = os.path.join(results_folder, f"results_{strategy}.csv")
+    pd.DataFrame([{"tag": tag, **tag_result} for tag, tag_result in metrics.items()]).to_csv(csv_path, index=False)
+
+    compaction_path = None
+    if compaction:
+        compaction_path = os.path.join(results_folder, f"compaction_{strategy}.csv")
+        pd.DataFrame(compaction).to_csv(compaction_path, index=False)
+    return {strategy: {"metrics": metrics, "model_path": onnx_file_path, "results_path": csv_path, "compaction_path": compaction_path}}
+
+# --- PARALLEL TRAINING ---
+_worker_data = None
+
+def init_training_worker(data):
+    # The training data is sent once to every worker instead of once per tag
+    global _worker_data
+    _worker_data = data
+
+def train_tag_model_in_worker(tag, models_folder, results_folder, n_jobs, params=None, compact=False):
+    return train_tag_model(_worker_data, tag, models_folder, results_folder, n_jobs, params, compact)
+
+def train_models(df, models_folder, results_folder, n_workers=TRAINING_WORKERS, strategy=TRAINING_STRATEGY, tune=TUNING,
+                 compact=COMPACTION):
+    # Results are keyed by model, each one reports the metrics of the tags it predicts
+    print(f"Loaded dataset: {df.shape[0]} rows, {df.shape[1]} columns")
+
+    # Retrieve target label for supervised learning
+    data = training_data(df)
+    tags = data["tags"]
+    print(f"Tags founded: {tags}\n")
+    write_feature_spec(df, data["feature_names"], models_folder)
 
-mlflow.set_experiment(EXPERIMENT_NAME)
+    if strategy != "ovr":
+        return train_single_model(data, strategy, models_folder, results_folder, tune, n_workers, compact)
 
-def training_mlflow_run(run_id: str, artifact_path: str):
-    artifact_local_path = mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path=artifact_path)
-    csv_files = [f for f in os.listdir(artifact_local_path) if f.endswith(".csv")]
-    if not csv_files:
-        raise FileNotFoundError("No CSV found in artifact folder")
-    csv_file_path = os.path.join(artifact_local_path, csv_files[0])
-    df = pd.read_csv(csv_file_path)
+    # The search of every tag runs its candidates on all the workers, the final models are then trained as usual
+    tag_params = {tag: None for tag in tags}
+    if tune:
+        for tag in tags:
+            X_train, _, y_train, _ = tag_target(data, tag)
+            tag_params[tag] = tune_model(X_train, y_train, tag, n_workers)
+
+    cores = available_cores()
+    n_workers = min(n_workers or cores, len(tags))
+    if n_workers <= 1:
+        return {
+            tag: train_tag_model(data, tag, models_folder, results_folder, params=tag_params[tag], compact=compact)
+            for tag in tags
+        }
+
+    # Tag models are independent, each worker trains one at a time with its share of the cores
+    # so that XGBoost threads of different workers do not oversubscribe the machine
+    n_jobs = max(1, cores // n_workers)
+    print(f"Training {len(tags)} tag models on {n_workers} workers with {n_jobs} threads each\n")
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_training_worker,
+        initargs=(data,)
+    ) as executor:
+        futures = {
+            tag: executor.submit(train_tag_model_in_worker, tag, models_folder, results_folder, n_jobs, tag_params[tag], compact)
+            for tag in tags
+        }
+        return {tag: future.result() for tag, future in futures.items()}
+
+def tag_metrics(tag, metrics):
+    return {f"{name}_{tag}": value for name, value in metrics.items()}
+
+TRAINING_FUNCTIONS = [
+    training_data, feature_spec, tag_target, group_target, oversample, validation_split, tune_model, train_tag_model, tag_groups,
+    graph_probabilities, train_group_model, combine_onnx_models, train_single_model, train_models
+]
+
+def training_params(strategy, tune, compact=False):
+    # Parameters that change the trained models, part of the training fingerprint
+    params = {**STAGE_PARAMS, "strategy": strategy}
+    if strategy != "ovr":
+        params["evaluation_threshold"] = EVALUATION_THRESHOLD
+    if tune:
+        from ddditai.model.a_training.hyperparameter_search import SEARCH_PARAMS
+
+        params.update({"tune": True, "validation_size": VALIDATION_SIZE, **SEARCH_PARAMS})
+    if compact:
+        from ddditai.model.a_training.model_compaction import COMPACTION_PARAMS
+
+        params.update({"compact": True, "validation_size": VALIDATION_SIZE, **COMPACTION_PARAMS})
+    return params
+
+def training_functions(tune, compact=False):
+    functions = list(TRAINING_FUNCTIONS)
+    if tune:
+        from ddditai.model.a_training.hyperparameter_search import evaluate_candidate, successive_halving
+
+        functions += [evaluate_candidate, successive_halving]
+    if compact:
+        from ddditai.model.a_training import model_compaction
+
+        functions += [model_compaction.compact_model, model_compaction.compact_trees, model_compaction.prune_tree, model_compaction.write_trees]
+    return functions
+
+def log_training_results(results, timestamp):
+    import mlflow
+
+    for result in results.values():
+        for tag, metrics in result["metrics"].items():
+            mlflow.log_metrics(tag_metrics(tag, metrics))
+        mlflow.log_artifact(str(result["model_path"]), artifact_path="models")
+        mlflow.log_artifact(str(result["results_path"]), artifact_path="results")
+        if result.get("compaction_path"):
+            mlflow.log_artifact(str(result["compaction_path"]), artifact_path="results")
+        upload_in_background(result["model_path"], training_blob_name(result["model_path"], timestamp, "models"))
+        upload_in_background(result["results_path"], training_blob_name(result["results_path"], timestamp, "results"))
+
+def log_feature_spec(models_folder, timestamp):
+    import mlflow
+
+    spec_path = os.path.join(models_folder, FEATURE_SPEC_FILE)
+    mlflow.log_artifact(spec_path, artifact_path="models")
+    upload_in_background(spec_path, training_blob_name(spec_path, timestamp, "models"))
+
+def training_blob_name(path, timestamp, folder):
+    return f"training/Training_{timestamp}/{folder}/{os.path.basename(path)}"
+
+def upload_training_file(path, timestamp, folder):
+    # Upload on Azure Blob Storage
+    upload_file(path, training_blob_name(path, timestamp, folder))
+
+def upload_training_results(result, timestamp):
+    upload_training_file(result["model_path"], timestamp, "models")
+    upload_training_file(result["results_path"], timestamp, "results")
+
+def training_manifest(results, models_folder, timestamp):
+    # Deployable files of a training with their blob and checksum, so that a consumer only fetches the changed ones
+    model_paths = [result["model_path"] for result in results.values()] + [os.path.join(models_folder, FEATURE_SPEC_FILE)]
+    return {
+        "version": f"Training_{timestamp}",
+        "created": datetime.now().isoformat(),
+        "files": {
+            os.path.basename(path): {
+                "blob": training_blob_name(path, timestamp, "models"),
+                "sha256": file_sha256(path),
+                "size": os.path.getsize(path),
+            }
+            for path in model_paths
+        },
+        "metrics": {tag: metrics for result in results.values() for tag, metrics in result["metrics"].items()},
+    }
+
+def publish_training_manifest(manifest):
+    # Called once every listed file is uploaded, the latest pointer is written last so it never names a missing blob
+    upload_json(manifest, f"training/{manifest['version']}/{MANIFEST_FILE}")
+    upload_json(manifest, MANIFEST_BLOB)
+
+def training_mlflow_run(run_id: str, artifact_path: str, artifact_format: str = DEFAULT_ARTIFACT_FORMAT,
+                        n_workers: int = TRAINING_WORKERS, strategy: str = TRAINING_STRATEGY, tune: bool = TUNING,
+                        compact: bool = COMPACTION):
+    import mlflow
+
+    context = get_context(MODELING_EXPERIMENT_DESCRIPTION)
+
+    input_id, df = input_identity(run_id, artifact_path)
+    fingerprint = stage_fingerprint(STAGE_NAME, input_id, training_functions(tune, compact), training_params(strategy, tune, compact))
+    cached_run_id = find_cached_run(fingerprint)
+    if cached_run_id:
+        print(f"[{datetime.now()}] Training skipped, models of unchanged run {cached_run_id} are reused")
+        return
+    if df is None:
+        df = download_artifact_frame(run_id, artifact_path)
 
     # Create run specific folder
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     run_name = f"Model_from_{run_id or 'manual'}_{timestamp}"
 
-    run_folder = artifact_base_folder / run_name
+    run_folder = context.artifact_base_folder / run_name
     results_folder = run_folder / "results"
     models_folder = run_folder / "models"
 
     models_folder.mkdir(parents=True, exist_ok=True)
     results_folder.mkdir(parents=True, exist_ok=True)
 
-    print(f"Loaded dataset: {df.shape[0]} rows, {df.shape[1]} columns")
-
-    # Retrieve target label for supervised learning
-    tags = df['associated_tag'].unique()
-    print(f"Tags founded: {tags}\n")
-
     with mlflow.start_run(run_name=f"Modeling_from_{run_id}") as run:
-        for tag in tags:
-            print(f"Training tag: {tag}")
-
-            df['target'] = (df['associated_tag'] == tag).astype(int)
-
-            # Selected all features excluded uid, associated_tag and target
-            feature_cols = df.columns.drop(['uid', 'associated_tag', 'target'])
-
-            # Renaming of feature in f0, f1, ...
-            new_feature_names = [f'f{i}' for i in range(len(feature_cols))]
-            rename_dict = dict(zip(feature_cols, new_feature_names))
-            df_renamed = df.rename(columns=rename_dict)
-
-            X = df_renamed[new_feature_names]
-            y = df_renamed['target']
-
-            print(f"Dataset dimension: {X.shape}")
-            print(f"Number of positive examples: {y.sum()}")
-            print(f"Number of negative examples: {len(y) - y.sum()}")
-
-            # Split train/test
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=0.2, random_state=42, stratify=y
-            )
-
-            # Apply SMOTE if necessary
-            if y_train.nunique() > 1 and y_train.sum() < len(y_train) / 2:
-                smote = SMOTE(random_state=42)
-                X_train, y_train = smote.fit_resample(X_train, y_train)
-                print(f"SMOTE applied: new dimensions {X_train.shape}")
-            else:
-                print("SMOTE not applied")
-
-            # Train XGBoost
-            model = XGBClassifier(eval_metric='logloss', random_state=42)
-            model.fit(X_train, y_train)
-
-            # Predictions
-            y_pred = model.predict(X_test)
-
-            # Metrics
-            print(f"Accuracy: {accuracy_score(y_test, y_pred):.4f}")
-            print(classification_report(y_test, y_pred))
-
-            accuracy = accuracy_score(y_test, y_pred)
-            precision = precision_score(y_test, y_pred)
-            recall = recall_score(y_test, y_pred)
-            f1 = f1_score(y_test, y_pred)
-            mlflow.log_metric(f"accuracy_{tag}", accuracy)
-            mlflow.log_metric(f"precision_{tag}", precision)
-            mlflow.log_metric(f"recall_{tag}", recall)
-            mlflow.log_metric(f"f1_score_{tag}", f1)
-
-            # Export in ONNX
-            initial_type = [('float_input', FloatTensorType([None, X_train.shape[1]]))]
-
-            onnx_model = onnxmltools.convert_xgboost(
-                model,
-                initial_types=initial_type,
-                target_opset=14
-            )
-
-            onnx_file_path = os.path.join(models_folder, f"xgb_model_{tag}.onnx")
-            onnxmltools.utils.save_model(onnx_model, onnx_file_path)
-
-            mlflow.log_artifact(str(onnx_file_path), artifact_path="models")
-            print(f"Saved ONNX model in: {onnx_file_path}\n")
-
-            # Results
-            results_df = pd.DataFrame([{
-                "accuracy": accuracy,
-                "precision": precision,
-                "recall": recall,
-                "f1_score": f1
-            }])
-
-            csv_path = os.path.join(results_folder, f"results_{tag}.csv")
-            print(f"Saving results: {csv_path}")
-            results_df.to_csv(csv_path, index=False)
-
-            mlflow.log_artifact(csv_path, artifact_path="results")
-
-            # Upload on Azure Blob Storage
-            if AZURE_CONNECTION_STRING:
-                blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-                container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
-                container_client.upload_blob(
-                    name=f"training/Training_{timestamp}/models/xgb_model_{tag}.onnx",
-                    data=open(onnx_file_path, "rb"),
-                    overwrite=True
-                )
-                container_client.upload_blob(
-                    name=f"training/Training_{timestamp}/results/results_{tag}.csv",
-                    data=open(csv_path, "rb"),
-                    overwrite=True
-                )
+        mlflow.log_params({"training_strategy": strategy, "tuning": tune, "compaction": compact})
+        results = train_models(df, models_folder, results_folder, n_workers, strategy, tune, compact)
+        log_training_results(results, timestamp)
+        log_feature_spec(models_folder, timestamp)
+        # The run is only reusable, and its manifest only published, once every file is uploaded
+        upload_errors = wait_for_uploads()
+        if upload_errors:
+            raise RuntimeError(f"{len(upload_errors)} training files could not be uploaded, the manifest is not published")
+        publish_training_manifest(training_manifest(results, models_folder, timestamp))
+        mlflow.set_tag(FINGERPRINT_TAG, fingerprint)
 
         print("Training completed.")
 
@@ -173,7 +569,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--run_id", required=True)
     parser.add_argument("--artifact_path", required=True)
+    parser.add_argument("--artifact_format", choices=ARTIFACT_FORMATS, default=DEFAULT_ARTIFACT_FORMAT)
+    parser.add_argument("--n_workers", type=int, default=TRAINING_WORKERS, help="Tag models trained in parallel, 0 uses every core")
+    parser.add_argument("--strategy", choices=TRAINING_STRATEGIES, default=TRAINING_STRATEGY)
+    parser.add_argument("--tune", action="store_true", default=TUNING, help="Search the XGBoost parameters with successive halving")
+    parser.add_argument("--compact", action="store_true", default=COMPACTION, help="Export the fastest model within the F1 tolerance")
 
     args = parser.parse_args()
 
-    training_mlflow_run(args.run_id, args.artifact_path)
\ No newline at end of file
+    training_mlflow_run(args.run_id, args.artifact_path, args.artifact_format, args.n_workers, args.strategy, args.tune, args.compact)
\ No newline at end of file
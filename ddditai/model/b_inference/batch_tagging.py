@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from ddditai.common.artifact_io import PARQUET_COMPRESSION
+from ddditai.common.resources import available_cores
+from ddditai.data.a_data_extraction.extraction_writer import truncate_partial_line
+from ddditai.model.b_inference.fbx_features import FBX_COUNTS, fbx_counts, feature_matrix
+from ddditai.model.b_inference.inference import MODELS_DIR, TAG_THRESHOLD, ModelRegistry
+
+# --- CONFIGURATION ---
+TAGGING_FORMATS = ["csv", "parquet", "jsonl"]
+
+TAGGING_BATCH_SIZE = 1024  # files run through the models at once, also the rows written per flush
+
+TAGGING_WORKERS = int(os.getenv("DDDITAI_TAGGING_WORKERS", "0"))  # feature extraction processes, 0 uses every core
+
+IN_FLIGHT_PER_WORKER = 32  # files queued per worker so that no worker idles while a batch is tagged
+
+FBX_SUFFIX = ".fbx"
+
+TAG_SEPARATOR = ";"  # tags of a file in a CSV cell
+
+
+def fbx_files(root):
+    # Relative paths of the FBX files of a directory tree, in a stable order so that a resumed run walks it the same way
+    for folder, subfolders, files in os.walk(root):
+        subfolders.sort()
+        for name in sorted(files):
+            if name.lower().endswith(FBX_SUFFIX):
+                yield os.path.relpath(os.path.join(folder, name), root)
+
+def extract_file(root, relative_path):
+    # A file that cannot be parsed is reported in the output instead of stopping a back-fill of thousands of files
+    try:
+        return relative_path, fbx_counts(os.path.join(root, relative_path)), None
+    except Exception as e:
+        return relative_path, None, f"{type(e).__name__}: {e}"
+
+
+class TaggingWriter:
+    # Append-only sink of the tagging results, the paths already written are skipped when a run is resumed.
+    # CSV and JSONL rows are appended, Parquet rows are written as one part file per batch and merged on close
+    def __init__(self, output_path, columns, output_format="csv"):
+        self.output_path = Path(output_path)
+        self.columns = columns
+        self.output_format = output_format
+        self.written_paths = set()
+        self.rows_written = 0
+        if output_format == "parquet":
+            self._open_parquet()
+        else:
+            self._open_text()
+
+    def _open_text(self):
+        import csv
+
+        resume = self.output_path.exists() and self.output_path.stat().st_size > 0
+        if resume:
+            truncate_partial_line(self.output_path)
+            with open(self.output_path, newline="", encoding="utf-8") as f:
+                if self.output_format == "csv":
+                    reader = csv.DictReader(f)
+                    self.check_columns(reader.fieldnames)
+                    self.written_paths = {row["path"] for row in reader}
+                else:
+                    self.written_paths = {json.loads(line)["path"] for line in f if line.strip()}
+        self._file = open(self.output_path, "a", newline="", encoding="utf-8")
+        if self.output_format == "csv":
+            self._csv_writer = csv.DictWriter(self._file, fieldnames=self.columns)
+            if not resume:
+                self._csv_writer.writeheader()
+
+    def check_columns(self, existing):
+        # Rows appended under another header would be shifted into the wrong columns, e.g. after the tags of the
+        # registry changed between the interrupted run and the resumed one
+        if list(existing or []) != list(self.columns):
+            raise ValueError(
+                f"{self.output_path} was written with columns {existing}, cannot resume with {self.columns}. "
+                "Use another output path or delete the partial output"
+            )
+
+    def _schema(self):
+        import pyarrow as pa
+
+        types = {"path": pa.string(), "model_version": pa.string(), "tags": pa.list_(pa.string()), "error": pa.string()}
+        types.update({col: pa.int64() for col in FBX_COUNTS})
+        return pa.schema([pa.field(col, types.get(col, pa.float32())) for col in self.columns])
+
+    def _open_parquet(self):
+        import pyarrow.parquet as pq
+
+        self._parts_folder = self.output_path.parent / f"{self.output_path.stem}_parts"
+        self._parts_folder.mkdir(parents=True, exist_ok=True)
+        if self.output_path.exists():
+            # Output of a completed run that is resumed again becomes the first part
+            os.replace(self.output_path, self._parts_folder / "part-00000.parquet")
+        self._parts = sorted(self._parts_folder.glob("part-*.parquet"))
+        for part in self._parts:
+            self.check_columns(pq.read_schema(part).names)
+            self.written_paths.update(pq.read_table(part, columns=["path"]).column("path").to_pylist())
+
+    def write_rows(self, rows):
+        if self.output_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            part_path = self._parts_folder / f"part-{len(self._parts):05d}.parquet"
+            tmp_path = part_path.with_suffix(".tmp")
+            compression = None if PARQUET_COMPRESSION == "none" else PARQUET_COMPRESSION
+            pq.write_table(pa.Table.from_pylist(rows, schema=self._schema()), tmp_path, compression=compression)
+            os.replace(tmp_path, part_path)
+            self._parts.append(part_path)
+        elif self.output_format == "csv":
+            self._csv_writer.writerows({**row, "tags": TAG_SEPARATOR.join(row["tags"])} for row in rows)
+            self._file.flush()
+        else:
+            self._file.writelines(json.dumps(row) + "\n" for row in rows)
+            self._file.flush()
+        self.written_paths.update(row["path"] for row in rows)
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self.output_format == "parquet":
+            import pyarrow.parquet as pq
+
+            compression = None if PARQUET_COMPRESSION == "none" else PARQUET_COMPRESSION
+            with pq.ParquetWriter(self.output_path, self._schema(), compression=compression) as parquet_writer:
+                for part in self._parts:
+                    parquet_writer.write_table(pq.read_table(part, schema=self._schema()))
+            shutil.rmtree(self._parts_folder)
+        else:
+            self._file.close()
+
+
+def predict_counts(registry, counts_rows):
+    # (probabilities, error) of every row. The rows go through the models in a single run per model, a failing batch
+    # is split into single rows so that one file whose features or prediction fail does not fail the others
+    try:
+        return [(probabilities, None) for probabilities in registry.predict(feature_matrix(counts_rows, registry.feature_spec))]
+    except Exception as e:
+        if len(counts_rows) == 1:
+            return [(None, f"{type(e).__name__}: {e}")]
+        return [result for counts in counts_rows for result in predict_counts(registry, [counts])]
+
+def tag_batch(registry, batch, threshold):
+    parsed = [(path, counts) for path, counts, error in batch if counts is not None]
+    predictions = dict(zip([path for path, _ in parsed], predict_counts(registry, [counts for _, counts in parsed]))) if parsed else {}
+
+    rows = []
+    for path, counts, error in batch:
+        row = {"path": path, "model_version": registry.version, "tags": [], **(counts or dict.fromkeys(FBX_COUNTS))}
+        row.update({f"p_{tag}": None for tag in registry.tags})
+        probabilities, prediction_error = predictions.get(path, (None, None))
+        if probabilities is not None:
+            row["tags"] = registry.tags_of([probabilities], threshold)[0]
+            row.update({f"p_{tag}": float(p) for tag, p in zip(registry.tags, probabilities)})
+        row["error"] = error or prediction_error
+        rows.append(row)
+    return rows
+
+def download_models(run_id):
+    # Models and feature spec logged by a training run
+    import mlflow
+    from ddditai.common.context import MODELING_EXPERIMENT_DESCRIPTION, get_context
+
+    get_context(MODELING_EXPERIMENT_DESCRIPTION)
+    return mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path="models")
+
+def tag_directory(root, output_path, models_dir=MODELS_DIR, output_format="csv", n_workers=TAGGING_WORKERS,
+                  batch_size=TAGGING_BATCH_SIZE, threshold=TAG_THRESHOLD):
+    # Features are extracted by a process pool while the main process tags the completed batches, results are
+    # written batch by batch so that an interrupted run resumes from the files not yet in the output
+    registry = ModelRegistry(models_dir)
+    if registry.feature_spec is None:
+        raise FileNotFoundError(f"No feature spec in {models_dir}, the models were trained before it was written")
+    columns = ["path", "model_version", "tags", *FBX_COUNTS, *[f"p_{tag}" for tag in registry.tags], "error"]
+    writer = TaggingWriter(output_path, columns, output_format)
+    if writer.written_paths:
+        print(f"[{datetime.now()}] Resuming, {len(writer.written_paths)} files already tagged in {output_path}")
+
+    n_workers = n_workers or available_cores()
+    max_in_flight = n_workers * IN_FLIGHT_PER_WORKER
+    start = time.perf_counter()
+    window, batch = deque(), []
+
+    def complete(future):
+        batch.append(future.result())
+        if len(batch) >= batch_size:
+            writer.write_rows(tag_batch(registry, batch, threshold))
+            batch.clear()
+            rate = writer.rows_written / (time.perf_counter() - start)
+            print(f"[{datetime.now()}] Tagged {writer.rows_written} files ({rate:.0f} files/s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            for relative_path in fbx_files(root):
+                if relative_path in writer.written_paths:
+                    continue
+                window.append(executor.submit(extract_file, root, relative_path))
+                while len(window) > max_in_flight or (window and window[0].done()):
+                    complete(window.popleft())
+            while window:
+                complete(window.popleft())
+        if batch:
+            writer.write_rows(tag_batch(registry, batch, threshold))
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"[{datetime.now()}] Tagging completed: {writer.rows_written} files in {elapsed:.1f}s, results in {output_path}")
+    return writer.rows_written
+
+
+if __name__ == "__main__":
+    # This main can be used to tag every FBX file of a directory tree with the models of a folder or of a training run
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", required=True, help="Directory tree of FBX files")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--output_format", choices=TAGGING_FORMATS, default="csv")
+    parser.add_argument("--models_dir", default=MODELS_DIR)
+    parser.add_argument("--model_run_id", help="Training run whose models are used instead of --models_dir")
+    parser.add_argument("--workers", type=int, default=TAGGING_WORKERS, help="Feature extraction processes, 0 uses every core")
+    parser.add_argument("--batch_size", type=int, default=TAGGING_BATCH_SIZE)
+    parser.add_argument("--threshold", type=float, default=TAG_THRESHOLD)
+
+    args = parser.parse_args()
+
+    models_dir = download_models(args.model_run_id) if args.model_run_id else args.models_dir
+    tag_directory(args.root, args.output, models_dir, args.output_format, args.workers, args.batch_size, args.threshold)
@@ -0,0 +1,168 @@
+import os
+import json
+import mmap
+import zlib
+import struct
+import argparse
+from datetime import datetime
+from ddditai.model.a_training.training import FEATURE_SPEC_FILE
+
+# --- CONFIGURATION ---
+FBX_MAGIC = b"Kaydara FBX Binary  \x00"
+
+FBX_HEADER_SIZE = 27  # magic, two reserved bytes and the uint32 version
+
+WIDE_RECORD_VERSION = 7500  # from FBX 7.5 the record header fields are 64 bit
+
+CHUNK_SIZE = 4 * 1024 * 1024  # bytes of an index array decoded at a time
+
+FBX_COUNTS = ["texture_count", "vertex_count", "material_count", "animation_count", "face_count"]  # Sketchfab fields the models are trained on
+
+FEATURE_DEFAULTS = {"is_age_restricted": False}  # training features an FBX file does not carry, with the value every file gets
+
+SCALAR_SIZES = {b"Y": 2, b"C": 1, b"I": 4, b"F": 4, b"D": 8, b"L": 8}
+
+SCALAR_FORMATS = {b"Y": "<h", b"C": "<?", b"I": "<i", b"F": "<f", b"D": "<d", b"L": "<q"}
+
+ARRAY_TYPES = {b"f", b"d", b"l", b"i", b"b"}
+
+# --- BINARY FBX RECORDS ---
+def read_record(mm, offset, wide):
+    record_format = "<QQQB" if wide else "<IIIB"
+    end_offset, n_properties, properties_size, name_size = struct.unpack_from(record_format, mm, offset)
+    name_offset = offset + struct.calcsize(record_format)
+    properties_offset = name_offset + name_size
+    return {
+        "name": mm[name_offset:properties_offset].decode("ascii", "replace"),
+        "end": end_offset,
+        "n_properties": n_properties,
+        "properties": properties_offset,
+        "children": properties_offset + properties_size,
+    }
+
+def child_records(mm, offset, end, wide):
+    # Records of one level, a record with a zero end offset closes the level
+    while offset < end:
+        record = read_record(mm, offset, wide)
+        if record["end"] == 0:
+            return
+        yield record
+        offset = record["end"]
+
+def read_properties(mm, record):
+    # Scalars and strings are decoded, arrays are only described (length, encoding and where their data is)
+    # so that a multi-hundred-MB vertex array is never read
+    properties = []
+    offset = record["properties"]
+    for _ in range(record["n_properties"]):
+        type_code = mm[offset:offset + 1]
+        offset += 1
+        if type_code in SCALAR_SIZES:
+            properties.append(struct.unpack_from(SCALAR_FORMATS[type_code], mm, offset)[0])
+            offset += SCALAR_SIZES[type_code]
+        elif type_code in ARRAY_TYPES:
+            length, encoding, size = struct.unpack_from("<III", mm, offset)
+            properties.append({"type": type_code, "length": length, "encoding": encoding, "offset": offset + 12, "size": size})
+            offset += 12 + size
+        elif type_code in (b"S", b"R"):
+            (size,) = struct.unpack_from("<I", mm, offset)
+            properties.append(mm[offset + 4:offset + 4 + size])
+            offset += 4 + size
+        else:
+            raise ValueError(f"Unknown FBX property type {type_code!r} at offset {offset - 1}")
+    return properties
+
+def release_pages(mm, start, end):
+    # Scanned pages of the mapping are dropped so that the resident memory stays bounded on large files
+    if hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+        start -= start % mmap.PAGESIZE
+        end -= end % mmap.PAGESIZE
+        if end > start:
+            mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+def count_negative_indices(mm, array):
+    # In PolygonVertexIndex the last index of every polygon is stored as ~index, so the negative values are the
+    # polygons. The array is decoded CHUNK_SIZE bytes at a time, decompressing it as a stream when it is deflated
+    import numpy as np
+
+    decompressor = zlib.decompressobj() if array["encoding"] == 1 else None
+    pending = b""
+    negatives = 0
+    for start in range(array["offset"], array["offset"] + array["size"], CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, array["offset"] + array["size"])
+        chunk = mm[start:end]
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        chunk = pending + chunk
+        usable = len(chunk) - len(chunk) % 4
+        negatives += int((np.frombuffer(chunk[:usable], dtype="<i4") < 0).sum())
+        pending = chunk[usable:]
+        release_pages(mm, start, end)
+    return negatives
+
+def fbx_counts(fbx_path):
+    # Counts of a binary FBX file matching the Sketchfab fields of the training data, computed from the Objects
+    # records only: faces are triangles (a polygon of k vertices makes k - 2), vertices are the mesh control points
+    counts = dict.fromkeys(FBX_COUNTS, 0)
+    with open(fbx_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(FBX_MAGIC)] != FBX_MAGIC:
+            raise ValueError(f"{fbx_path} is not a binary FBX file")
+        (version,) = struct.unpack_from("<I", mm, len(FBX_MAGIC) + 2)
+        wide = version >= WIDE_RECORD_VERSION
+
+        for record in child_records(mm, FBX_HEADER_SIZE, len(mm), wide):
+            if record["name"] != "Objects":
+                continue
+            for obj in child_records(mm, record["children"], record["end"], wide):
+                if obj["name"] == "Material":
+                    counts["material_count"] += 1
+                elif obj["name"] == "Texture":
+                    counts["texture_count"] += 1
+                elif obj["name"] == "AnimationStack":
+                    counts["animation_count"] += 1
+                elif obj["name"] == "Geometry" and read_properties(mm, obj)[-1] == b"Mesh":
+                    for child in child_records(mm, obj["children"], obj["end"], wide):
+                        if child["name"] == "Vertices":
+                            counts["vertex_count"] += read_properties(mm, child)[0]["length"] // 3
+                        elif child["name"] == "PolygonVertexIndex":
+                            indices = read_properties(mm, child)[0]
+                            counts["face_count"] += indices["length"] - 2 * count_negative_indices(mm, indices)
+    return counts
+
+# --- FEATURE VECTORS ---
+def load_feature_spec(spec_path):
+    with open(spec_path) as f:
+        return json.load(f)
+
+def feature_matrix(counts_rows, spec):
+    # Replays feature construction and the affine scaling recorded at training time on the counts of every model,
+    # features that cannot come from an FBX file get their FEATURE_DEFAULTS value. Columns are returned in the order
+    # the ONNX models expect
+    import numpy as np
+    import pandas as pd
+    from ddditai.data.c_data_preparation.b_feature_construction.feature_construction import construct_features
+
+    df = construct_features(pd.DataFrame(counts_rows, columns=FBX_COUNTS).astype("float64"))
+    for name, scaling in spec["scaled"].items():
+        df[name] = df[scaling["source"]] * scaling["scale"] + scaling["offset"]
+    unknown = [name for name in spec["features"] if name not in df.columns and name not in FEATURE_DEFAULTS]
+    if unknown:
+        raise ValueError(f"Features {unknown} of the spec cannot be computed from an FBX file")
+    df = df.assign(**{name: FEATURE_DEFAULTS[name] for name in spec["features"] if name not in df.columns})
+    return np.ascontiguousarray(df[spec["features"]].to_numpy(dtype=np.float32))
+
+
+if __name__ == "__main__":
+    # This main can be used to print the counts and the feature vector of FBX files
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fbx_paths", nargs="+")
+    parser.add_argument("--spec", help=f"{FEATURE_SPEC_FILE} written by the training next to the models")
+
+    args = parser.parse_args()
+
+    spec = load_feature_spec(args.spec) if args.spec else None
+    for fbx_path in args.fbx_paths:
+        counts = fbx_counts(fbx_path)
+        print(f"[{datetime.now()}] {os.path.basename(fbx_path)}: {counts}")
+        if spec:
+            print(dict(zip(spec["features"], feature_matrix([counts], spec)[0].tolist())))
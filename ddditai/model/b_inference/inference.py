@@ -0,0 +1,337 @@
+import os
+import glob
+import fnmatch
+import json
+import hashlib
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from ddditai.model.a_training.training import FEATURE_SPEC_FILE, MANIFEST_FILE
+
+# --- CONFIGURATION ---
+MODELS_DIR = os.getenv("DDDITAI_MODELS_DIR", "models/")
+
+MODEL_PATTERN = "xgb_model_*.onnx"
+
+TAG_THRESHOLD = 0.5  # probability from which a tag is assigned
+
+MAX_BATCH_SIZE = int(os.getenv("DDDITAI_MAX_BATCH_SIZE", "256"))  # rows coalesced into one run of every model
+
+MAX_BATCH_WAIT_MS = float(os.getenv("DDDITAI_MAX_BATCH_WAIT_MS", "2"))  # how long a request may wait for others to join its batch
+
+INFERENCE_THREADS = int(os.getenv("DDDITAI_INFERENCE_THREADS", "0"))  # intra-op threads of every session, 0 lets ONNX Runtime decide
+
+WARMUP_ROWS = [1, MAX_BATCH_SIZE]  # batch sizes run on a new registry before it serves requests
+
+MODEL_POLL_SECONDS = float(os.getenv("DDDITAI_MODEL_POLL_SECONDS", "0"))  # models folder polling for hot reloads, 0 disables it
+
+
+def read_folder_manifest(models_dir):
+    # Manifest deployed with the models, None when the folder has none
+    manifest_path = os.path.join(models_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def model_files(models_dir, manifest=None):
+    # The models listed by the folder manifest when there is one, so that a model removed from a deploy is not loaded
+    if manifest is None:
+        return sorted(glob.glob(os.path.join(models_dir, MODEL_PATTERN)))
+    return [os.path.join(models_dir, name) for name in sorted(manifest["files"]) if fnmatch.fnmatch(name, MODEL_PATTERN)]
+
+def folder_signature(models_dir):
+    # Cheap change detection of the models folder, names, sizes and modification times of the models
+    signature = []
+    extra_files = glob.glob(os.path.join(models_dir, FEATURE_SPEC_FILE)) + glob.glob(os.path.join(models_dir, MANIFEST_FILE))
+    for model_path in sorted(glob.glob(os.path.join(models_dir, MODEL_PATTERN))) + extra_files:
+        stat = os.stat(model_path)
+        signature.append((os.path.basename(model_path), stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+class ModelRegistry:
+    # Every ONNX model of a folder behind one shared InferenceSession each. A per-tag model contributes the
+    # positive probability of its tag, a single graph (multiclass/grouped) the columns listed in its "tags" metadata.
+    # Models are read in memory first, so the files can be overwritten by the next deploy while the sessions live on.
+    # Sessions of a previous registry whose model bytes did not change are reused instead of being created again
+    def __init__(self, models_dir=MODELS_DIR, threads=INFERENCE_THREADS, previous=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.models_dir = models_dir
+        self.signature = folder_signature(models_dir)
+        self.models = []
+        self.tags = []
+        manifest = read_folder_manifest(models_dir)
+        reusable = {model["sha256"]: model for model in previous.models} if previous else {}
+        version = hashlib.sha256()
+        for model_path in model_files(models_dir, manifest):
+            with open(model_path, "rb") as f:
+                model_bytes = f.read()
+            version.update(model_bytes)
+            checksum = hashlib.sha256(model_bytes).hexdigest()
+            if manifest is not None and manifest["files"][os.path.basename(model_path)]["sha256"] != checksum:
+                # A deploy still being copied, the next change of the folder triggers a new reload
+                raise ValueError(f"{model_path} does not match the checksum of {MANIFEST_FILE}")
+            if checksum in reusable:
+                model = {**reusable[checksum], "path": model_path, "reused": True}
+            else:
+                session = ort.InferenceSession(model_bytes, sess_options=options, providers=["CPUExecutionProvider"])
+                metadata = session.get_modelmeta().custom_metadata_map
+                if "tags" in metadata:
+                    tags, columns = json.loads(metadata["tags"]), None
+                else:
+                    tags, columns = [os.path.basename(model_path)[len("xgb_model_"):-len(".onnx")]], [1]
+                model = {
+                    "path": model_path, "session": session, "input": session.get_inputs()[0].name, "columns": columns,
+                    "tags": tags, "sha256": checksum, "reused": False
+                }
+            duplicated = set(model["tags"]) & set(self.tags)
+            if duplicated:
+                raise ValueError(f"Tags {sorted(duplicated)} are predicted by more than one model in {models_dir}")
+            self.models.append(model)
+            self.tags.extend(model["tags"])
+        if not self.models:
+            raise FileNotFoundError(f"No {MODEL_PATTERN} model found in {models_dir}")
+        self.n_features = self.models[0]["session"].get_inputs()[0].shape[1]
+
+        # Feature order and scaling of the models, needed to build feature vectors from FBX files
+        self.feature_spec = None
+        spec_path = os.path.join(models_dir, FEATURE_SPEC_FILE)
+        if os.path.exists(spec_path):
+            with open(spec_path, "rb") as f:
+                spec_bytes = f.read()
+            version.update(spec_bytes)
+            self.feature_spec = json.loads(spec_bytes)
+            if len(self.feature_spec["features"]) != self.n_features:
+                raise ValueError(f"{spec_path} lists {len(self.feature_spec['features'])} features, the models expect {self.n_features}")
+        self.version = version.hexdigest()[:12]
+        reused = sum(model["reused"] for model in self.models)
+        print(f"[{datetime.now()}] Loaded {len(self.models)} models predicting {len(self.tags)} tags from {models_dir} "
+              f"(version {self.version}, {reused} unchanged sessions reused)")
+
+    def warm_up(self):
+        # The first runs of a session allocate its buffers, they are paid here instead of by the first requests.
+        # Reused sessions are already warm
+        import numpy as np
+
+        for rows in WARMUP_ROWS:
+            features = np.zeros((rows, self.n_features), dtype=np.float32)
+            for model in self.models:
+                if not model["reused"]:
+                    model["session"].run(["probabilities"], {model["input"]: features})
+
+    def predict(self, features):
+        # [N, n_features] -> [N, len(self.tags)] probabilities, every model runs once on the whole batch
+        import numpy as np
+
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        probabilities = []
+        for model in self.models:
+            output = model["session"].run(["probabilities"], {model["input"]: features})[0]
+            probabilities.append(output if model["columns"] is None else output[:, model["columns"]])
+        return np.concatenate(probabilities, axis=1)
+
+    def tags_of(self, probabilities, threshold=TAG_THRESHOLD):
+        return [[tag for tag, probability in zip(self.tags, row) if probability >= threshold] for row in probabilities]
+
+
+class MicroBatcher:
+    # Requests submitted by concurrent callers are coalesced by a background thread into batches of at most
+    # max_batch_size rows. A batch is run as soon as it is full or max_wait_ms after its first request arrived.
+    # The registry can be swapped while serving: a batch runs on the registry it started with, so the previous
+    # version is only released once the batches in flight on it are done. Requests are validated when submitted and a
+    # failing batch is run again request by request, so that one bad request does not fail the others
+    def __init__(self, registry, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS):
+        self.registry = registry
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.reload_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.submit_lock = threading.Lock()
+        self.worker = threading.Thread(target=self._run, name="ddditai-micro-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, features):
+        # The future resolves to (tags, probabilities) of the registry version that ran the batch
+        import numpy as np
+
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim == 1:
+            features = features.reshape(1, -1)
+        if features.ndim != 2 or features.shape[1] != self.registry.n_features:
+            raise ValueError(f"Expected rows of {self.registry.n_features} features, got an array of shape {features.shape}")
+        future = Future()
+        with self.submit_lock:
+            if self.stopped.is_set():
+                raise RuntimeError("The micro-batcher is closed")
+            self.requests.put((features, future))
+        return future
+
+    def predict(self, features):
+        return self.submit(features).result()[1]
+
+    def predict_tags(self, features_batch, threshold=TAG_THRESHOLD):
+        tags, probabilities = self.submit(features_batch).result()
+        return [[tag for tag, probability in zip(tags, row) if probability >= threshold] for row in probabilities]
+
+    def reload(self, models_dir=None):
+        # Loads and warms up the new version on a background thread, requests are served by the current one meanwhile
+        thread = threading.Thread(
+            target=self._reload, args=(models_dir or self.registry.models_dir,), name="ddditai-model-reload", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def watch(self, poll_seconds=MODEL_POLL_SECONDS):
+        # Reloads when the models folder changed and stayed unchanged for one more poll, so a copy in progress is not loaded
+        def poll():
+            pending = None
+            while not self.stopped.wait(poll_seconds):
+                signature = folder_signature(self.registry.models_dir)
+                if signature != self.registry.signature and signature == pending:
+                    self._reload(self.registry.models_dir)
+                pending = signature
+
+        thread = threading.Thread(target=poll, name="ddditai-model-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        with self.submit_lock:
+            self.stopped.set()
+            self.requests.put(None)
+        self.worker.join()
+
+    def _reload(self, models_dir):
+        with self.reload_lock:
+            try:
+                registry = ModelRegistry(models_dir, previous=self.registry)
+                registry.warm_up()
+            except Exception as e:
+                print(f"[{datetime.now()}] Reload of {models_dir} failed, version {self.registry.version} keeps serving: {e}")
+                return False
+            if registry.version == self.registry.version:
+                print(f"[{datetime.now()}] Models of {models_dir} unchanged (version {registry.version})")
+                self.registry.signature = registry.signature
+                return False
+            previous = self.registry
+            self.registry = registry
+            print(f"[{datetime.now()}] Models swapped from version {previous.version} to {registry.version}")
+            return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            request = self.requests.get()
+            if request is None:
+                return
+            batch, rows = [request], len(request[0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                rows += len(request[0])
+            self._run_batch(batch)
+
+    def _run_batch(self, batch, registry=None):
+        import numpy as np
+
+        registry = registry or self.registry
+        try:
+            probabilities = registry.predict(np.concatenate([features for features, _ in batch]))
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            for request in batch:
+                self._run_batch([request], registry)
+            return
+        offset = 0
+        for features, future in batch:
+            future.set_result((registry.tags, probabilities[offset:offset + len(features)]))
+            offset += len(features)
+
+# --- DEFAULT SERVICE ---
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            registry = ModelRegistry()
+            registry.warm_up()
+            _service = MicroBatcher(registry)
+            if MODEL_POLL_SECONDS > 0:
+                _service.watch()
+        return _service
+
+def reload_models(models_dir=None):
+    # Hot reload of the default service, e.g. after a deploy replaced the files of the models folder
+    return get_service().reload(models_dir)
+
+def sync_models(models_dir=MODELS_DIR):
+    # Mirrors the latest published training into models_dir from its manifest, only changed models are downloaded
+    # and models no longer published are removed. The default service is reloaded when anything changed
+    from ddditai.common.blob_storage import mirror_files, read_manifest
+
+    manifest = read_manifest()
+    if manifest is None:
+        raise FileNotFoundError("No training manifest published on Azure Blob Storage")
+    os.makedirs(models_dir, exist_ok=True)
+    local_paths, downloaded = mirror_files(manifest, models_dir)
+    removed = [path for path in glob.glob(os.path.join(models_dir, MODEL_PATTERN)) if path not in local_paths]
+    for path in removed:
+        os.remove(path)
+    # The manifest goes last, the registry only loads a folder whose models match it
+    manifest_path = os.path.join(models_dir, MANIFEST_FILE)
+    with open(f"{manifest_path}.part", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.part", manifest_path)
+    print(f"[{datetime.now()}] Models of {manifest['version']} synced to {models_dir}: {len(downloaded)} downloaded, {len(removed)} removed")
+    if (downloaded or removed) and _service is not None:
+        _service.reload(models_dir)
+    return downloaded
+
+def predict_tags(features_batch, threshold=TAG_THRESHOLD):
+    # Tags of every row of features_batch ([N, n_features] in the training feature order), safe to call from many threads
+    return get_service().predict_tags(features_batch, threshold)
+
+
+if __name__ == "__main__":
+    # This main can be used to tag the feature rows of a csv with the models of a folder
+    import pandas as pd
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", required=True, help="Feature rows in the training feature order, uid column optional")
+    parser.add_argument("--models_dir", default=MODELS_DIR)
+    parser.add_argument("--threshold", type=float, default=TAG_THRESHOLD)
+    parser.add_argument("--sync", action="store_true", help="Mirror the latest published models into --models_dir first")
+
+    args = parser.parse_args()
+
+    if args.sync:
+        sync_models(args.models_dir)
+    df = pd.read_csv(args.csv)
+    features = df.drop(columns=[col for col in ("uid", "associated_tag") if col in df.columns])
+    registry = ModelRegistry(args.models_dir)
+    for idx, tags in enumerate(registry.tags_of(registry.predict(features.to_numpy()), args.threshold)):
+        print(f"{df['uid'].iloc[idx] if 'uid' in df.columns else idx}: {', '.join(tags) or '-'}")
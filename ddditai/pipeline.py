@@ -0,0 +1,222 @@
+import os
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from ddditai.common.artifact_io import ARTIFACT_FORMATS, DEFAULT_ARTIFACT_FORMAT, download_artifact_frame, save_artifact_frame
+from ddditai.common.blob_storage import upload_file
+from ddditai.common.context import MODELING_EXPERIMENT_DESCRIPTION, get_context
+from ddditai.common.profiling import profile_stage
+from ddditai.common.stage_cache import FINGERPRINT_TAG, find_cached_run, input_identity, stage_fingerprint
+from ddditai.data.c_data_preparation.a_data_cleaning import data_cleaning
+from ddditai.data.c_data_preparation.b_feature_construction import feature_construction
+from ddditai.data.c_data_preparation.c_feature_scaling import feature_scaling
+from ddditai.data.c_data_preparation.d_feature_selection import feature_selection
+from ddditai.data.c_data_preparation.e_data_balancing import data_balancing
+from ddditai.model.a_training import training
+from ddditai.model.a_training.training import (
+    FEATURE_SPEC_FILE, publish_training_manifest, tag_metrics, train_models, training_functions, training_manifest, training_params,
+    upload_training_file, upload_training_results
+)
+
+# --- CONFIGURATION ---
+ARTIFACT_LOGGING_WORKERS = 2
+
+# Data preparation stages in execution order:
+# (stage module, function, run name prefix, mlflow artifact path, file name, azure folder)
+PREPARATION_STAGES = [
+    (data_cleaning, data_cleaning.clean_data, "Data_Cleaning", "cleaned_data", "cleaned_data", "data_cleaning"),
+    (feature_construction, feature_construction.construct_features, "Feature_Construction", "enriched_data", "constructed_features", "feature_construction"),
+    (feature_scaling, feature_scaling.scale_features, "Feature_Scaling", "scaled_data", "scaled_features", "feature_scaling"),
+    (feature_selection, feature_selection.select_features, "Feature_Selection", "selected_features", "selected_features", "feature_selection"),
+    (data_balancing, data_balancing.balance_data, "Data_Balancing", "balanced_data", "balanced_data", "balanced_data"),
+]
+
+PIPELINE_STAGES = [stage[0].STAGE_NAME for stage in PREPARATION_STAGES] + [training.STAGE_NAME]
+
+
+class BackgroundArtifactLogger:
+    # Serialization, MLflow artifact logging and Azure uploads run here while the next stage is computed
+    def __init__(self, max_workers=ARTIFACT_LOGGING_WORKERS):
+        from mlflow.tracking import MlflowClient
+
+        self.client = MlflowClient()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artifact-logger")
+        self.futures = []
+        self.tags = []
+        self.completions = []
+
+    def submit(self, fn, *args):
+        self.futures.append(self.executor.submit(fn, *args))
+
+    def log_frame(self, run_id, df, path, artifact_path, artifact_format, blob_name=None):
+        self.submit(self._log_frame, run_id, df, path, artifact_path, artifact_format, blob_name)
+
+    def log_file(self, run_id, file_path, artifact_path):
+        self.submit(self.client.log_artifact, run_id, str(file_path), artifact_path)
+
+    def set_tag_when_logged(self, run_id, key, value):
+        # Fingerprints are only set once every artifact is logged, so an incomplete run is never reused
+        self.tags.append((run_id, key, value))
+
+    def submit_when_logged(self, fn, *args):
+        # Runs once every artifact is logged and uploaded, e.g. to publish the manifest that points to them
+        self.completions.append((fn, args))
+
+    def _log_frame(self, run_id, df, path, artifact_path, artifact_format, blob_name):
+        file_path = save_artifact_frame(df, path, artifact_format)
+        self.client.log_artifact(run_id, str(file_path), artifact_path)
+        if blob_name:
+            upload_file(file_path, f"{blob_name}{file_path.suffix}")
+
+    def wait(self):
+        errors = []
+        for future in self.futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+                print(f"[{datetime.now()}] Error during background artifact logging: {e}")
+        self.futures = []
+        self.executor.shutdown()
+        if not errors:
+            for fn, args in self.completions:
+                try:
+                    fn(*args)
+                except Exception as e:
+                    errors.append(e)
+                    print(f"[{datetime.now()}] Error during background artifact logging: {e}")
+        if not errors:
+            for run_id, key, value in self.tags:
+                self.client.set_tag(run_id, key, value)
+        self.tags = []
+        self.completions = []
+        return errors
+
+
+def run_preparation(run_id, artifact_path, artifact_logger, artifact_format=DEFAULT_ARTIFACT_FORMAT, stages=None, profiler=None):
+    # Every stage is a pure function over the in-memory frame, its output is persisted in background.
+    # A stage whose fingerprint matches a previous run is skipped and its output is downloaded
+    # only if a following stage has to be recomputed
+    import mlflow
+
+    context = get_context()
+
+    input_id, df = input_identity(run_id, artifact_path)
+    for stage_module, stage_fn, run_prefix, stage_artifact_path, file_name, azure_folder in PREPARATION_STAGES:
+        stage_name = stage_module.STAGE_NAME
+        if stages is not None and stage_name not in stages:
+            continue
+        with profile_stage(profiler, stage_name):
+            fingerprint = stage_fingerprint(stage_name, input_id, [stage_fn], {**stage_module.STAGE_PARAMS, "artifact_format": artifact_format})
+            cached_run_id = find_cached_run(fingerprint)
+            if cached_run_id:
+                print(f"[{datetime.now()}] Stage '{stage_name}' skipped, output of unchanged run {cached_run_id} is reused")
+                run_id, artifact_path, input_id, df = cached_run_id, stage_artifact_path, fingerprint, None
+                continue
+            if df is None:
+                df = download_artifact_frame(run_id, artifact_path)
+
+            stage_start = datetime.now()
+            df = stage_fn(df)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+            run_folder = context.artifact_base_folder / f"{run_prefix}_from_{run_id}_{timestamp}"
+            run_folder.mkdir(parents=True, exist_ok=True)
+
+            with mlflow.start_run(run_name=f"{run_prefix}_from_{run_id}") as run:
+                mlflow.log_metric("stage_seconds", (datetime.now() - stage_start).total_seconds())
+                run_id = run.info.run_id
+
+            artifact_logger.log_frame(
+                run_id, df, run_folder / file_name, stage_artifact_path, artifact_format,
+                blob_name=f"{azure_folder}/{run_prefix}_{timestamp}/{file_name}"
+            )
+            artifact_logger.set_tag_when_logged(run_id, FINGERPRINT_TAG, fingerprint)
+            artifact_path, input_id = stage_artifact_path, fingerprint
+            print(f"[{datetime.now()}] Stage '{stage_name}' completed: {df.shape[0]} rows, {df.shape[1]} columns")
+    return df, run_id, artifact_path, input_id
+
+def run_training(df, input_id, previous_run_id, artifact_path, artifact_logger, n_workers=training.TRAINING_WORKERS,
+                 strategy=training.TRAINING_STRATEGY, tune=training.TUNING, compact=training.COMPACTION):
+    import mlflow
+
+    context = get_context(MODELING_EXPERIMENT_DESCRIPTION)
+
+    fingerprint = stage_fingerprint(training.STAGE_NAME, input_id, training_functions(tune, compact), training_params(strategy, tune, compact))
+    cached_run_id = find_cached_run(fingerprint)
+    if cached_run_id:
+        print(f"[{datetime.now()}] Training skipped, models of unchanged run {cached_run_id} are reused")
+        return None
+    if df is None:
+        df = download_artifact_frame(previous_run_id, artifact_path)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    run_folder = context.artifact_base_folder / f"Model_from_{previous_run_id}_{timestamp}"
+    results_folder = run_folder / "results"
+    models_folder = run_folder / "models"
+
+    models_folder.mkdir(parents=True, exist_ok=True)
+    results_folder.mkdir(parents=True, exist_ok=True)
+
+    with mlflow.start_run(run_name=f"Modeling_from_{previous_run_id}") as run:
+        mlflow.log_params({"training_strategy": strategy, "tuning": tune, "compaction": compact})
+        results = train_models(df, models_folder, results_folder, n_workers, strategy, tune, compact)
+        for result in results.values():
+            for tag, metrics in result["metrics"].items():
+                mlflow.log_metrics(tag_metrics(tag, metrics))
+            artifact_logger.log_file(run.info.run_id, result["model_path"], "models")
+            artifact_logger.log_file(run.info.run_id, result["results_path"], "results")
+            if result.get("compaction_path"):
+                artifact_logger.log_file(run.info.run_id, result["compaction_path"], "results")
+            artifact_logger.submit(upload_training_results, result, timestamp)
+        spec_path = os.path.join(models_folder, FEATURE_SPEC_FILE)
+        artifact_logger.log_file(run.info.run_id, spec_path, "models")
+        artifact_logger.submit(upload_training_file, spec_path, timestamp, "models")
+        artifact_logger.submit_when_logged(publish_training_manifest, training_manifest(results, models_folder, timestamp))
+        artifact_logger.set_tag_when_logged(run.info.run_id, FINGERPRINT_TAG, fingerprint)
+        print("Training completed.")
+    return results
+
+def run_pipeline(run_id: str, artifact_path: str, artifact_format: str = DEFAULT_ARTIFACT_FORMAT, stages=None, profiler=None,
+                 training_workers=training.TRAINING_WORKERS, training_strategy=training.TRAINING_STRATEGY, tune=training.TUNING,
+                 compact=training.COMPACTION):
+    # Runs cleaning -> construction -> scaling -> selection -> balancing -> training in process,
+    # the input artifact is downloaded once and no stage downloads the output of the previous one.
+    # stages restricts the run to a subset of PIPELINE_STAGES, a stage left out passes its input on unchanged
+    get_context()
+    results = None
+    artifact_logger = BackgroundArtifactLogger()
+    try:
+        df, last_run_id, last_artifact_path, input_id = run_preparation(
+            run_id, artifact_path, artifact_logger, artifact_format, stages, profiler
+        )
+        if stages is None or training.STAGE_NAME in stages:
+            with profile_stage(profiler, training.STAGE_NAME):
+                results = run_training(
+                    df, input_id, last_run_id, last_artifact_path, artifact_logger, training_workers, training_strategy, tune, compact
+                )
+    finally:
+        with profile_stage(profiler, "artifact_logging"):
+            errors = artifact_logger.wait()
+    if errors:
+        raise RuntimeError(f"{len(errors)} artifacts could not be logged")
+    return results
+
+
+if __name__ == "__main__":
+    # This main can be used to run the whole data preparation and training on a specific mlflow run that produced a csv
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--run_id", required=True)
+    parser.add_argument("--artifact_path", required=True)
+    parser.add_argument("--artifact_format", choices=ARTIFACT_FORMATS, default=DEFAULT_ARTIFACT_FORMAT)
+    parser.add_argument("--training_workers", type=int, default=training.TRAINING_WORKERS, help="Tag models trained in parallel, 0 uses every core")
+    parser.add_argument("--training_strategy", choices=training.TRAINING_STRATEGIES, default=training.TRAINING_STRATEGY)
+    parser.add_argument("--tune", action="store_true", default=training.TUNING, help="Search the XGBoost parameters with successive halving")
+    parser.add_argument("--compact", action="store_true", default=training.COMPACTION, help="Export the fastest model within the F1 tolerance")
+
+    args = parser.parse_args()
+
+    run_pipeline(
+        args.run_id, args.artifact_path, args.artifact_format,
+        training_workers=args.training_workers, training_strategy=args.training_strategy, tune=args.tune, compact=args.compact
+    )
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from ddditai.common.artifact_io import find_artifact_file, load_artifact_frame, save_artifact_frame, stringify_list_columns
+
+
+def stage_frame():
+    return pd.DataFrame({
+        "uid": ["0a1b", "2c3d", "4e5f"],
+        "associated_tag": ["prop", "lowpoly", "prop"],
+        "is_age_restricted": [False, True, False],
+        "vertex_count": np.array([800, 120000, 8], dtype=np.int64),
+        "texture_richness": np.array([0.5, 0.0, 1 / 3], dtype=np.float32),
+        "user_tags": [["low", "prop"], [], ["chair"]],
+    })
+
+# --- PYTEST TESTS ---
+def test_parquet_round_trip_keeps_types(tmp_path):
+    df = stage_frame()
+
+    file_path = save_artifact_frame(df, tmp_path / "processed_data", "parquet")
+
+    assert file_path.name == "processed_data.parquet"
+    schema = pq.read_schema(file_path)
+    assert pa.types.is_boolean(schema.field("is_age_restricted").type)
+    assert pa.types.is_list(schema.field("user_tags").type) and pa.types.is_string(schema.field("user_tags").type.value_type)
+    loaded = load_artifact_frame(tmp_path)
+    assert loaded["texture_richness"].dtype == np.float32
+    assert [list(tags) for tags in loaded["user_tags"]] == [["low", "prop"], [], ["chair"]]
+    pd.testing.assert_frame_equal(loaded.drop(columns="user_tags"), df.drop(columns="user_tags"))
+
+def test_list_columns_read_the_same_from_both_formats(tmp_path):
+    df = stage_frame()
+    (tmp_path / "csv").mkdir()
+    (tmp_path / "parquet").mkdir()
+    save_artifact_frame(df, tmp_path / "csv" / "data", "csv")
+    save_artifact_frame(df, tmp_path / "parquet" / "data", "parquet")
+
+    from_csv = load_artifact_frame(tmp_path / "csv")
+    from_parquet = stringify_list_columns(load_artifact_frame(tmp_path / "parquet"))
+
+    assert from_parquet["user_tags"].tolist() == from_csv["user_tags"].tolist() == ["['low', 'prop']", "[]", "['chair']"]
+
+def test_parquet_is_preferred_when_both_formats_were_logged(tmp_path):
+    save_artifact_frame(stage_frame(), tmp_path / "data", "csv")
+    save_artifact_frame(stage_frame(), tmp_path / "data", "parquet")
+
+    assert find_artifact_file(tmp_path).suffix == ".parquet"
+
+def test_unknown_formats_and_empty_folders_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="feather"):
+        save_artifact_frame(stage_frame(), tmp_path / "data", "feather")
+    with pytest.raises(FileNotFoundError):
+        find_artifact_file(tmp_path)
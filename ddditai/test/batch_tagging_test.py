@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import pytest
+from ddditai.model.b_inference.batch_tagging import TaggingWriter, tag_batch
+from ddditai.model.b_inference.fbx_features import FBX_COUNTS, load_feature_spec
+
+# --- CONFIGURATION ---
+FEATURE_SPEC_PATH = os.path.join(os.path.dirname(__file__), "data", "feature_spec.json")
+
+MAX_VERTICES = 1e9  # the test registry fails on rows above it, like a model fed an out of range input
+
+
+class ThresholdRegistry:
+    # Registry with the interface batch tagging uses, one tag whose probability is the share of faces per vertex
+    def __init__(self):
+        self.feature_spec = load_feature_spec(FEATURE_SPEC_PATH)
+        self.tags = ["lowpoly"]
+        self.version = "test"
+        self.batches = []
+
+    def predict(self, features):
+        self.batches.append(len(features))
+        vertices = features[:, self.feature_spec["features"].index("vertex_count")]
+        if (vertices > MAX_VERTICES).any():
+            raise ValueError("vertex_count out of range")
+        return np.where(vertices < 1000, 0.9, 0.1)[:, None]
+
+    def tags_of(self, probabilities, threshold):
+        return [[tag for tag, p in zip(self.tags, row) if p >= threshold] for row in probabilities]
+
+def counts(vertex_count):
+    return {**dict.fromkeys(FBX_COUNTS, 1), "vertex_count": vertex_count}
+
+# --- PYTEST TESTS ---
+def test_tag_batch_runs_the_batch_at_once():
+    registry = ThresholdRegistry()
+
+    rows = tag_batch(registry, [("a.fbx", counts(8), None), ("b.fbx", counts(50000), None)], 0.5)
+
+    assert registry.batches == [2]
+    assert [row["tags"] for row in rows] == [["lowpoly"], []]
+    assert [row["error"] for row in rows] == [None, None]
+
+def test_tag_batch_records_failing_files_and_tags_the_others():
+    registry = ThresholdRegistry()
+    batch = [
+        ("a.fbx", counts(8), None),
+        ("broken.fbx", None, "ValueError: broken.fbx is not a binary FBX file"),
+        ("huge.fbx", counts(5e9), None),
+        ("b.fbx", counts(50000), None),
+    ]
+
+    rows = {row["path"]: row for row in tag_batch(registry, batch, 0.5)}
+
+    assert rows["a.fbx"]["tags"] == ["lowpoly"] and rows["a.fbx"]["error"] is None
+    assert rows["b.fbx"]["p_lowpoly"] == 0.1 and rows["b.fbx"]["error"] is None
+    assert rows["huge.fbx"]["error"] == "ValueError: vertex_count out of range"
+    assert rows["huge.fbx"]["tags"] == [] and rows["huge.fbx"]["p_lowpoly"] is None
+    assert rows["broken.fbx"]["error"].startswith("ValueError") and rows["broken.fbx"]["vertex_count"] is None
+
+def test_tagging_writer_resumes_without_duplicates(tmp_path):
+    output_path = tmp_path / "tags.csv"
+    columns = ["path", "model_version", "tags", *FBX_COUNTS, "p_lowpoly", "error"]
+    rows = tag_batch(ThresholdRegistry(), [("a.fbx", counts(8), None), ("b.fbx", counts(50000), None)], 0.5)
+
+    writer = TaggingWriter(output_path, columns)
+    writer.write_rows(rows[:1])
+    writer.close()
+    with open(output_path, "a") as f:
+        f.write("b.fbx,test,")  # row cut by an interrupted run
+
+    writer = TaggingWriter(output_path, columns)
+    assert writer.written_paths == {"a.fbx"}
+    writer.write_rows(rows[1:])
+    writer.close()
+
+    lines = output_path.read_text().splitlines()
+    assert [line.split(",")[0] for line in lines] == ["path", "a.fbx", "b.fbx"]
+
+def test_tagging_writer_refuses_to_resume_with_other_columns(tmp_path):
+    columns = ["path", "model_version", "tags", *FBX_COUNTS, "p_lowpoly", "error"]
+    rows = tag_batch(ThresholdRegistry(), [("a.fbx", counts(8), None)], 0.5)
+    for output_format in ["csv", "parquet"]:
+        output_path = tmp_path / f"tags.{output_format}"
+        writer = TaggingWriter(output_path, columns, output_format)
+        writer.write_rows(rows)
+        if output_format == "csv":
+            writer.close()
+
+        with pytest.raises(ValueError, match="cannot resume"):
+            TaggingWriter(output_path, [*columns[:-1], "p_highpoly", "error"], output_format)
+        resumed = TaggingWriter(output_path, columns, output_format)
+        assert resumed.written_paths == {"a.fbx"}
+        resumed.close()
@@ -0,0 +1,125 @@
+import os
+import pytest
+from ddditai.common import blob_storage
+from ddditai.common.blob_storage import MANIFEST_BLOB, file_sha256, mirror_files, read_manifest, upload_file
+from ddditai.model.a_training.training import FEATURE_SPEC_FILE, publish_training_manifest, training_manifest
+
+# --- CONFIGURATION ---
+TIMESTAMP = "20260101_120000"
+
+
+class MemoryContainer:
+    # Container client keeping the blobs in memory, with the calls of ContainerClient the module uses
+    def __init__(self):
+        self.blobs = {}
+        self.downloads = []
+
+    def upload_blob(self, name, data, overwrite=False, max_concurrency=1):
+        self.blobs[name] = data if isinstance(data, bytes) else data.read()
+
+    def download_blob(self, name, max_concurrency=1):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        if name not in self.blobs:
+            raise ResourceNotFoundError(f"{name} not found")
+        self.downloads.append(name)
+        return MemoryDownload(self.blobs[name])
+
+    def list_blobs(self, name_starts_with=""):
+        return [type("BlobProperties", (), {"name": name}) for name in self.blobs if name.startswith(name_starts_with)]
+
+
+class MemoryDownload:
+    def __init__(self, data):
+        self.data = data
+
+    def readall(self):
+        return self.data
+
+    def readinto(self, stream):
+        return stream.write(self.data)
+
+@pytest.fixture
+def container(monkeypatch):
+    monkeypatch.setattr(blob_storage, "_clients", {})
+    client = MemoryContainer()
+    blob_storage.set_container_client(client)
+    return client
+
+@pytest.fixture
+def trained_models(tmp_path):
+    # Models folder of a training and the results train_models returns for it
+    models_folder = tmp_path / "models"
+    models_folder.mkdir()
+    results = {}
+    for tag in ["lowpoly", "prop"]:
+        model_path = models_folder / f"xgb_model_{tag}.onnx"
+        model_path.write_bytes(f"onnx graph of {tag}".encode())
+        results[tag] = {"metrics": {tag: {"f1_score": 0.5}}, "model_path": str(model_path)}
+    (models_folder / FEATURE_SPEC_FILE).write_text('{"features": [], "scaled": {}}')
+    return models_folder, results
+
+def publish(models_folder, results):
+    for path in models_folder.iterdir():
+        upload_file(path, f"training/Training_{TIMESTAMP}/models/{path.name}")
+    manifest = training_manifest(results, str(models_folder), TIMESTAMP)
+    publish_training_manifest(manifest)
+    return manifest
+
+# --- PYTEST TESTS ---
+def test_training_manifest_lists_models_with_checksums(trained_models):
+    models_folder, results = trained_models
+
+    manifest = training_manifest(results, str(models_folder), TIMESTAMP)
+
+    assert manifest["version"] == f"Training_{TIMESTAMP}"
+    assert set(manifest["files"]) == {"xgb_model_lowpoly.onnx", "xgb_model_prop.onnx", FEATURE_SPEC_FILE}
+    entry = manifest["files"]["xgb_model_prop.onnx"]
+    assert entry["blob"] == f"training/Training_{TIMESTAMP}/models/xgb_model_prop.onnx"
+    assert entry["sha256"] == file_sha256(models_folder / "xgb_model_prop.onnx")
+    assert entry["size"] == len(b"onnx graph of prop")
+    assert manifest["metrics"] == {"lowpoly": {"f1_score": 0.5}, "prop": {"f1_score": 0.5}}
+
+def test_published_manifest_is_read_back(container, trained_models):
+    assert read_manifest() is None
+
+    manifest = publish(*trained_models)
+
+    assert read_manifest() == manifest
+    assert f"training/Training_{TIMESTAMP}/manifest.json" in container.blobs
+    assert list(container.blobs)[-1] == MANIFEST_BLOB
+
+def test_mirror_downloads_only_changed_files(container, trained_models, tmp_path):
+    manifest = publish(*trained_models)
+    local_dir = tmp_path / "server"
+    local_dir.mkdir()
+    (local_dir / "xgb_model_lowpoly.onnx").write_bytes(b"onnx graph of lowpoly")  # up to date
+    (local_dir / "xgb_model_prop.onnx").write_bytes(b"onnx graph of a previous prop")  # stale
+
+    local_paths, downloaded = mirror_files(manifest, str(local_dir))
+
+    assert sorted(os.path.basename(path) for path in downloaded) == [FEATURE_SPEC_FILE, "xgb_model_prop.onnx"]
+    assert len(local_paths) == 3
+    for name, entry in manifest["files"].items():
+        assert file_sha256(local_dir / name) == entry["sha256"]
+    assert not list(local_dir.glob("*.part"))
+
+    container.downloads.clear()
+    assert mirror_files(manifest, str(local_dir))[1] == []
+    assert container.downloads == []
+
+def test_download_replaces_the_local_file_only_when_complete(container, tmp_path):
+    local_path = tmp_path / "xgb_model_prop.onnx"
+    local_path.write_bytes(b"previous model")
+    container.blobs["model"] = b"new model"
+
+    class BrokenDownload(MemoryDownload):
+        def readinto(self, stream):
+            stream.write(self.data[:3])
+            raise IOError("connection reset")
+
+    container.download_blob = lambda name, max_concurrency=1: BrokenDownload(container.blobs[name])
+    with pytest.raises(IOError):
+        blob_storage.download_file("model", str(local_path))
+
+    assert local_path.read_bytes() == b"previous model"
@@ -0,0 +1,82 @@
+import os
+import json
+import importlib.util
+import pytest
+
+# --- CONFIGURATION ---
+CHECK_MODELS_PATH = os.path.join(os.path.dirname(__file__), "..", "..", ".github", "workflows", "check_models.py")
+
+
+@pytest.fixture
+def check_models(tmp_path, monkeypatch):
+    # The deploy script works with folders relative to the working directory, it is loaded from a temporary one
+    monkeypatch.chdir(tmp_path)
+    spec = importlib.util.spec_from_file_location("check_models", CHECK_MODELS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def manifest(version, files):
+    return {"version": version, "files": {name: {"sha256": sha256, "size": 1} for name, sha256 in files.items()}}
+
+def write_models(check_models, files):
+    for name, content in files.items():
+        with open(os.path.join(check_models.LOCAL_MODELS_DIR, name), "w") as f:
+            f.write(content)
+
+def deploy_list(check_models):
+    with open(check_models.DEPLOY_LIST_FILE) as f:
+        return [os.path.basename(line.strip()) for line in f]
+
+# --- PYTEST TESTS ---
+def test_deploy_delta(check_models):
+    latest = manifest("Training_2", {"xgb_model_lowpoly.onnx": "a", "xgb_model_prop.onnx": "b2", "feature_spec.json": "s"})
+    deployed = manifest("Training_1", {"xgb_model_lowpoly.onnx": "a", "xgb_model_prop.onnx": "b1", "xgb_model_weapon.onnx": "w", "feature_spec.json": "s"})
+
+    assert check_models.deploy_delta(latest, deployed) == (["xgb_model_prop.onnx"], ["xgb_model_weapon.onnx"])
+    assert check_models.deploy_delta(latest, None) == (sorted(latest["files"]), [])
+    assert check_models.deploy_delta(latest, latest) == ([], [])
+
+def test_stage_deploy_copies_only_changed_files(check_models):
+    write_models(check_models, {"xgb_model_lowpoly.onnx": "lowpoly", "xgb_model_prop.onnx": "new prop"})
+    latest = manifest("Training_2", {"xgb_model_lowpoly.onnx": "a", "xgb_model_prop.onnx": "b2"})
+    deployed = manifest("Training_1", {"xgb_model_lowpoly.onnx": "a", "xgb_model_prop.onnx": "b1"})
+
+    check_models.stage_deploy(latest, deployed)
+
+    assert deploy_list(check_models) == ["xgb_model_prop.onnx", check_models.MANIFEST_FILE]
+    assert sorted(os.listdir(check_models.DEPLOY_DIR)) == [check_models.MANIFEST_FILE, "xgb_model_prop.onnx"]
+    with open(os.path.join(check_models.DEPLOY_DIR, check_models.MANIFEST_FILE)) as f:
+        assert json.load(f) == latest
+
+def test_removed_model_deploys_only_the_manifest(check_models):
+    latest = manifest("Training_2", {"xgb_model_lowpoly.onnx": "a"})
+    deployed = manifest("Training_1", {"xgb_model_lowpoly.onnx": "a", "xgb_model_weapon.onnx": "w"})
+
+    check_models.stage_deploy(latest, deployed)
+
+    assert deploy_list(check_models) == [check_models.MANIFEST_FILE]
+
+def test_unchanged_models_deploy_nothing(check_models):
+    latest = manifest("Training_2", {"xgb_model_lowpoly.onnx": "a"})
+    os.makedirs(check_models.DEPLOY_DIR)
+    open(os.path.join(check_models.DEPLOY_DIR, "stale.onnx"), "w").close()  # left by a previous run
+
+    assert check_models.stage_deploy(latest, latest) == []
+    assert deploy_list(check_models) == []
+    assert os.listdir(check_models.DEPLOY_DIR) == []
+
+def test_read_deployed_manifest(check_models, tmp_path):
+    deployed_path = tmp_path / "deployed_manifest.json"
+    assert check_models.read_deployed_manifest(str(deployed_path)) is None
+
+    for content, expected in [("", None), ("{}\n", {})]:  # the fetch writes an empty file when the VM has no manifest
+        deployed_path.write_text(content)
+        assert check_models.read_deployed_manifest(str(deployed_path)) == expected
+
+    deployed_path.write_text('{"files": ')
+    with pytest.raises(ValueError, match="not valid JSON"):
+        check_models.read_deployed_manifest(str(deployed_path))
+
+    deployed_path.write_text(json.dumps(manifest("Training_1", {"xgb_model_lowpoly.onnx": "a"})))
+    assert check_models.read_deployed_manifest(str(deployed_path))["version"] == "Training_1"
@@ -0,0 +1,45 @@
+from ddditai.data.a_data_extraction.crawl_journal import CrawlJournal
+
+# --- PYTEST TESTS ---
+def test_journal_replays_the_crawl_state(tmp_path):
+    journal = CrawlJournal(tmp_path / "crawl_journal.jsonl")
+    journal.record_page("prop", "https://api.sketchfab.com/v3/search?cursor=2", ["a", "b"])
+    journal.record_page("prop", None, ["c"])
+    journal.record_uids_complete("prop", 3)
+    journal.record_page("lowpoly", "https://api.sketchfab.com/v3/search?cursor=1", ["d"])
+    journal.record_failure("a")
+    journal.record_failure("b")
+    journal.record_model("a")  # retried successfully
+    journal.close()
+
+    journal = CrawlJournal(tmp_path / "crawl_journal.jsonl")
+    journal.close()
+
+    assert journal.tags["prop"] == {"next": None, "uids": ["a", "b", "c"], "complete": True, "target": 3}
+    assert journal.tags["lowpoly"]["next"].endswith("cursor=1") and not journal.tags["lowpoly"]["complete"]
+    assert journal.collected_uids() == {"a", "b", "c", "d"}
+    assert journal.fetched == {"a"}
+    assert journal.failed == {"b"} and journal.failed_count() == 1
+
+def test_journal_resumes_after_a_record_cut_by_a_crash(tmp_path):
+    journal_path = tmp_path / "crawl_journal.jsonl"
+    journal = CrawlJournal(journal_path)
+    journal.record_model("a")
+    journal.close()
+    with open(journal_path, "a") as f:
+        f.write('{"event": "model", "ui')
+
+    journal = CrawlJournal(journal_path)
+    assert journal.fetched == {"a"}
+    journal.record_model("b")
+    journal.close()
+
+    journal = CrawlJournal(journal_path)
+    journal.close()
+    assert journal.fetched == {"a", "b"}
+
+def test_unknown_tag_starts_from_the_first_page(tmp_path):
+    journal = CrawlJournal(tmp_path / "checkpoint" / "crawl_journal.jsonl")
+    journal.close()
+
+    assert journal.tag_state("vehicle") == {"next": None, "uids": [], "complete": False, "target": None}
@@ -0,0 +1,192 @@
+import json
+import asyncio
+import threading
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from ddditai.data.a_data_extraction import sketchfab_client
+from ddditai.data.a_data_extraction.crawl_journal import CrawlJournal
+from ddditai.data.a_data_extraction.response_cache import ResponseCache
+from ddditai.data.a_data_extraction.sketchfab_client import crawl
+
+# --- CONFIGURATION ---
+PAGE_SIZE = 2
+
+# Search results of the stub API, "chair" is found under both tags
+SEARCH_RESULTS = {
+    "prop": ["chair", "lamp", "table", "crate", "barrel"],
+    "lowpoly": ["tree", "rock", "stump", "chair"],
+}
+
+MALFORMED = {"lamp"}  # models whose detail response is not valid JSON
+
+
+class StubSketchfab(BaseHTTPRequestHandler):
+    # Search and model endpoints of the Sketchfab API, the search is paginated with a cursor like the real one
+    requests = []
+    throttled = set()  # paths answered once with a 429 before being served
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        type(self).requests.append(url.path)
+        if url.path in self.throttled:
+            self.throttled.discard(url.path)
+            return self.respond(429, b"{}", {"Retry-After": "0"})
+        if url.path == "/v3/models":
+            tag = query["tags"][0]
+            cursor = int(query.get("cursor", ["0"])[0])
+            uids = SEARCH_RESULTS.get(tag, [])
+            next_cursor = cursor + PAGE_SIZE
+            next_url = f"http://{self.headers['Host']}/v3/models?tags={tag}&cursor={next_cursor}" if next_cursor < len(uids) else None
+            results = [{"uid": uid, "tags": [{"slug": tag}]} for uid in uids[cursor:next_cursor]]
+            return self.respond(200, json.dumps({"results": results, "next": next_url}).encode())
+        uid = url.path.rsplit("/", 1)[-1]
+        if uid in MALFORMED:
+            return self.respond(200, b'{"uid": "' + uid.encode())
+        detail = {"uid": uid, "vertexCount": len(uid) * 100, "tags": [{"slug": "low"}], "user": {"displayName": f"author of {uid}"}}
+        return self.respond(200, json.dumps(detail).encode())
+
+    def respond(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MemoryWriter:
+    # Writer with the interface the crawl uses
+    def __init__(self, written_pairs=()):
+        self.written_pairs = set(written_pairs)
+        self.models = []
+        self.authors = []
+
+    def write_model(self, model_info):
+        self.models.append(model_info)
+
+    def write_author(self, author_info):
+        self.authors.append(author_info)
+
+@pytest.fixture
+def api_base():
+    StubSketchfab.requests = []
+    StubSketchfab.throttled = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSketchfab)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v3"
+    server.shutdown()
+    server.server_close()
+
+def run_crawl(api_base, writer, total_models_per_tag=10, **kwargs):
+    return asyncio.run(crawl(
+        list(SEARCH_RESULTS), total_models_per_tag, ["token"], writer, api_base=api_base,
+        requests_per_minute=60_000, burst_size=100, max_connections=4, **kwargs
+    ))
+
+def detail_requests():
+    return sorted(path.rsplit("/", 1)[-1] for path in StubSketchfab.requests if path != "/v3/models")
+
+# --- PYTEST TESTS ---
+def test_malformed_response_is_recorded_as_failed(api_base, tmp_path):
+    writer = MemoryWriter()
+    journal = CrawlJournal(tmp_path / "crawl_journal.jsonl")
+
+    run_crawl(api_base, writer, journal=journal)
+    journal.close()
+
+    assert journal.failed == {"lamp"}
+    assert "lamp" not in {model_info[0] for model_info in writer.models}
+    assert len(writer.models) == 8
+
+def test_released_details_are_fetched_again_from_the_cache(api_base, tmp_path, monkeypatch):
+    # With a single queued UID and a single kept detail, every model found under a second tag has been released
+    monkeypatch.setattr(sketchfab_client, "DETAIL_QUEUE_SIZE", 1)
+    monkeypatch.setattr(sketchfab_client, "PENDING_ROWS_SIZE", 1)
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    writer = MemoryWriter()
+
+    run_crawl(api_base, writer, cache=cache)
+    cache.close()
+
+    pairs = sorted((model_info[0], model_info[1]) for model_info in writer.models)
+    assert pairs == sorted({(uid, tag) for tag, uids in SEARCH_RESULTS.items() for uid in uids} - {("lamp", "prop")})
+    assert detail_requests() == sorted({uid for uids in SEARCH_RESULTS.values() for uid in uids})
+
+def test_search_follows_the_cursor_up_to_the_models_per_tag(api_base, tmp_path):
+    writer = MemoryWriter()
+    journal = CrawlJournal(tmp_path / "crawl_journal.jsonl")
+
+    run_crawl(api_base, writer, total_models_per_tag=3, journal=journal)
+    journal.close()
+
+    assert journal.tags["prop"]["uids"] == ["chair", "lamp", "table"]
+    assert journal.tags["prop"]["complete"] and journal.tags["prop"]["next"].endswith("cursor=4")
+    assert journal.tags["lowpoly"]["uids"] == ["tree", "rock", "stump"]
+    assert StubSketchfab.requests.count("/v3/models") == 4  # two pages of each tag
+
+def test_a_larger_target_reopens_completed_tags(api_base, tmp_path):
+    journal_path = tmp_path / "crawl_journal.jsonl"
+    journal = CrawlJournal(journal_path)
+    run_crawl(api_base, MemoryWriter(), total_models_per_tag=3, journal=journal)
+    journal.close()
+    assert journal.tags["lowpoly"]["complete"] and journal.tags["lowpoly"]["target"] == 3
+
+    journal = CrawlJournal(journal_path)
+    run_crawl(api_base, MemoryWriter(), total_models_per_tag=5, journal=journal)
+    journal.close()
+
+    assert journal.tags["prop"]["uids"] == SEARCH_RESULTS["prop"]
+    assert journal.tags["lowpoly"]["uids"] == SEARCH_RESULTS["lowpoly"]
+    assert journal.tags["prop"]["target"] == journal.tags["lowpoly"]["target"] == 5
+
+    # A completed tag is not collected again for the same target
+    StubSketchfab.requests = []
+    journal = CrawlJournal(journal_path)
+    run_crawl(api_base, MemoryWriter(), total_models_per_tag=5, journal=journal)
+    journal.close()
+    assert "/v3/models" not in StubSketchfab.requests
+
+def test_models_found_under_several_tags_are_fetched_once(api_base):
+    writer = MemoryWriter()
+
+    stats = run_crawl(api_base, writer)
+
+    assert detail_requests().count("chair") == 1
+    chair_rows = sorted(model_info[1] for model_info in writer.models if model_info[0] == "chair")
+    assert chair_rows == ["lowpoly", "prop"]
+    assert writer.authors.count(("chair", "author of chair")) == 2  # one per row, ExtractionWriter keeps the first
+    assert stats == {"unique_models": 8, "model_tag_pairs": 9, "detail_requests": 7, "cached_details": 0}
+
+def test_already_written_pairs_are_not_requested(api_base):
+    writer = MemoryWriter({("tree", "lowpoly"), ("crate", "prop")})
+
+    run_crawl(api_base, writer)
+
+    assert "tree" not in detail_requests() and "crate" not in detail_requests()
+
+def test_throttled_requests_are_retried(api_base):
+    StubSketchfab.throttled = {"/v3/models/table", "/v3/models"}
+    writer = MemoryWriter()
+
+    run_crawl(api_base, writer)
+
+    assert detail_requests().count("table") == 2
+    assert "table" in {model_info[0] for model_info in writer.models}
+    assert len(writer.models) == 8
+
+def test_cached_details_are_not_counted_as_downloads(api_base, tmp_path):
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+
+    first = run_crawl(api_base, MemoryWriter(), cache=cache)
+    second = run_crawl(api_base, MemoryWriter(), cache=cache)
+    cache.close()
+
+    assert first["detail_requests"] == 7 and first["cached_details"] == 0
+    assert second["detail_requests"] == 0 and second["cached_details"] == 7
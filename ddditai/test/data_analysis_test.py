@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from ddditai.data.b_data_analysis import data_analysis
+from ddditai.data.b_data_analysis.data_analysis import stream_analysis
+from ddditai.data.b_data_analysis.descriptive_statistics import describe_frame
+
+# --- CONFIGURATION ---
+ROWS = 20_000
+
+SAMPLE_ROWS = 1_000
+
+
+def analysis_frame(rows=ROWS):
+    rng = np.random.default_rng(7)
+    pbr_type = rng.choice(["metalness", "specular", ""], rows).astype(object)
+    pbr_type[rng.random(rows) < 0.05] = None
+    return pd.DataFrame({
+        "uid": [f"uid{i}" for i in range(rows)],
+        "face_count": rng.lognormal(8, 1.5, rows),
+        "texture_count": rng.poisson(3, rows),
+        "pbr_type": pbr_type,
+        "associated_tag": rng.choice(["prop", "lowpoly"], rows),
+    })
+
+# --- PYTEST TESTS ---
+def test_stream_analysis_counts_every_row_and_samples_a_bounded_subset(tmp_path):
+    df = analysis_frame()
+    df.to_parquet(tmp_path / "data.parquet", index=False)
+
+    stats, missing, sample, rows, empty_pbr = stream_analysis(
+        tmp_path / "data.parquet", {"face_count": 100_000}, sample_rows=SAMPLE_ROWS, chunk_rows=3_000
+    )
+    exact, exact_missing = describe_frame(df, {"face_count": 100_000})
+
+    assert rows == ROWS
+    assert empty_pbr == df["pbr_type"].isna().sum() + (df["pbr_type"] == "").sum()
+    pd.testing.assert_series_equal(missing, exact_missing)
+    for column in ["count", "over_threshold", "min", "max"]:
+        pd.testing.assert_series_equal(stats[column], exact[column])
+    np.testing.assert_allclose(stats["mean"], exact["mean"], rtol=1e-9)
+
+    # The sample is made of distinct rows of the file, spread over all its chunks
+    assert len(sample) == SAMPLE_ROWS and list(sample.columns) == list(df.columns)
+    assert sample["uid"].is_unique and sample["uid"].isin(df["uid"]).all()
+    positions = sample["uid"].str[3:].astype(int)
+    assert positions.min() < 3_000 and positions.max() > ROWS - 3_000
+    assert abs(sample["face_count"].median() / df["face_count"].median() - 1) < 0.15
+
+def test_only_artifacts_over_the_threshold_are_streamed(tmp_path, monkeypatch):
+    artifact_file = tmp_path / "data.csv"
+    analysis_frame(rows=500).to_csv(artifact_file, index=False)
+    size_mb = artifact_file.stat().st_size / 1024 ** 2
+
+    monkeypatch.setattr(data_analysis, "STREAMING_ANALYSIS_MB", size_mb * 2)
+    assert not data_analysis.is_streamed(artifact_file)
+    monkeypatch.setattr(data_analysis, "STREAMING_ANALYSIS_MB", size_mb / 2)
+    assert data_analysis.is_streamed(artifact_file)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ddditai.data.b_data_analysis.descriptive_statistics import StreamingStatistics, TDigest, describe_frame, stream_statistics
+
+# --- CONFIGURATION ---
+ROWS = 200_000
+
+RANK_TOLERANCE = 0.002  # largest difference between the requested quantile and the rank of the estimate
+
+
+def counts_frame(rows=ROWS):
+    # Skewed counts like the extraction output, with missing values and a non numeric column
+    rng = np.random.default_rng(42)
+    face_count = rng.lognormal(8, 1.5, rows)
+    face_count[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        "uid": [f"uid{i}" for i in range(rows)],
+        "face_count": face_count,
+        "texture_count": rng.poisson(3, rows),
+        "texture_richness": rng.random(rows),
+    })
+
+def streamed(df, chunk_rows):
+    statistics = StreamingStatistics(thresholds={"face_count": 100_000})
+    for start in range(0, len(df), chunk_rows):
+        statistics.update(df.iloc[start:start + chunk_rows])
+    return statistics.report()
+
+# --- PYTEST TESTS ---
+def test_tdigest_quantiles_are_accurate_at_the_tails():
+    values = np.random.default_rng(0).lognormal(6, 1.5, ROWS)
+    digest = TDigest()
+    for chunk in np.array_split(values, 37):
+        digest.update(chunk)
+
+    qs = [0.001, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 0.999]
+    ranks = np.searchsorted(np.sort(values), digest.quantile(qs)) / len(values)
+
+    assert np.abs(ranks - qs).max() < RANK_TOLERANCE
+    assert digest.quantile([0.0, 1.0]).tolist() == [values.min(), values.max()]
+    assert len(digest.means) <= digest.compression
+    assert digest.weights.sum() == digest.count == ROWS
+    assert digest.cdf(np.median(values)) == pytest.approx(0.5, abs=RANK_TOLERANCE)
+
+def test_empty_tdigest():
+    digest = TDigest()
+    digest.update([np.nan])
+
+    assert np.isnan(digest.quantile([0.5])).all()
+    assert np.isnan(digest.cdf(1.0))
+
+def test_streaming_statistics_match_the_exact_ones():
+    df = counts_frame()
+
+    exact, exact_missing = describe_frame(df, thresholds={"face_count": 100_000})
+    approx, approx_missing = streamed(df, chunk_rows=30_000)
+
+    assert list(approx.index) == list(exact.index) == ["face_count", "texture_count", "texture_richness"]
+    pd.testing.assert_series_equal(approx_missing, exact_missing)
+    for column in ["count", "missing_count", "over_threshold", "min", "max"]:
+        pd.testing.assert_series_equal(approx[column], exact[column])
+    np.testing.assert_allclose(approx["mean"], exact["mean"], rtol=1e-9)
+    np.testing.assert_allclose(approx["std"], exact["std"], rtol=1e-9)
+    for column in ["25%", "50%", "75%"]:
+        np.testing.assert_allclose(approx[column], exact[column], rtol=0.02, atol=0.01)
+    # Outliers come from the digest CDF, which spreads the rows of a repeated value around it, so they are only
+    # compared on the continuous columns
+    continuous = ["face_count", "texture_richness"]
+    np.testing.assert_allclose(approx.loc[continuous, "outlier_count"], exact.loc[continuous, "outlier_count"], rtol=0.01, atol=5)
+
+def test_stream_statistics_reads_csv_and_parquet_in_chunks(tmp_path):
+    df = counts_frame(rows=5_000)
+    df.to_csv(tmp_path / "data.csv", index=False)
+    df.to_parquet(tmp_path / "data.parquet", index=False)
+
+    from_csv, _ = stream_statistics(tmp_path / "data.csv", chunk_rows=700)
+    from_parquet, _ = stream_statistics(tmp_path / "data.parquet", chunk_rows=700)
+    in_memory, _ = streamed(df, chunk_rows=700)
+
+    np.testing.assert_allclose(from_parquet["mean"], in_memory["mean"], rtol=1e-12)
+    np.testing.assert_allclose(from_csv["mean"], in_memory["mean"], rtol=1e-9)
+    assert from_csv["count"].tolist() == from_parquet["count"].tolist() == in_memory["count"].tolist()
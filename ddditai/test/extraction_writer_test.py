@@ -0,0 +1,72 @@
+import pyarrow.parquet as pq
+from ddditai.data.a_data_extraction.extraction_writer import ExtractionWriter, truncate_partial_line
+
+# --- CONFIGURATION ---
+COLUMNS = [
+    "uid", "associated_tag", "is_age_restricted", "pbr_type", "texture_count",
+    "vertex_count", "material_count", "animation_count",
+    "user_tags", "user_categories", "face_count"
+]  # MODEL_COLUMNS of the extraction
+
+
+def model_row(uid, tag):
+    return [uid, tag, False, "metalness", 2, 800, 1, 0, ["low", "prop"], ["furniture-home"], 600]
+
+def open_writer(tmp_path, output_format, flush_every=256):
+    suffix = "parquet" if output_format == "parquet" else "csv"
+    return ExtractionWriter(tmp_path / f"models.{suffix}", tmp_path / "authors.txt", COLUMNS,
+                            output_format=output_format, flush_every=flush_every)
+
+# --- PYTEST TESTS ---
+def test_truncate_partial_line(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_bytes(b"uid,associated_tag\na,prop\nb,pr")
+
+    truncate_partial_line(path)
+    assert path.read_bytes() == b"uid,associated_tag\na,prop\n"
+
+    truncate_partial_line(path)
+    assert path.read_bytes() == b"uid,associated_tag\na,prop\n"
+
+def test_csv_writer_resumes_without_duplicates(tmp_path):
+    writer = open_writer(tmp_path, "csv")
+    writer.write_model(model_row("a", "prop"))
+    writer.write_model(model_row("a", "lowpoly"))  # same model found under another tag is a new row
+    writer.write_author(("alice", "a"))
+    writer.close()
+    with open(tmp_path / "models.csv", "a") as f:
+        f.write("b,prop,False,metal")  # row cut by an interrupted run
+
+    writer = open_writer(tmp_path, "csv")
+    assert writer.written_pairs == {("a", "prop"), ("a", "lowpoly")}
+    writer.write_model(model_row("a", "prop"))
+    writer.write_model(model_row("b", "prop"))
+    writer.write_author(("alice", "a"))
+    writer.close()
+
+    lines = (tmp_path / "models.csv").read_text().splitlines()
+    assert [tuple(line.split(",")[:2]) for line in lines[1:]] == [("a", "prop"), ("a", "lowpoly"), ("b", "prop")]
+    assert lines[0] == ",".join(COLUMNS)
+    assert (tmp_path / "authors.txt").read_text() == "alice,a\n"
+
+def test_parquet_writer_resumes_from_parts_and_completed_output(tmp_path):
+    writer = open_writer(tmp_path, "parquet", flush_every=1)
+    writer.write_model(model_row("a", "prop"))
+    writer.write_model(model_row("b", "prop"))
+    writer._authors_file.close()  # interrupted before close, only the flushed parts are on disk
+
+    writer = open_writer(tmp_path, "parquet")
+    assert writer.written_pairs == {("a", "prop"), ("b", "prop")}
+    writer.write_model(model_row("b", "prop"))
+    writer.write_model(model_row("c", "lowpoly"))
+    writer.close()
+
+    writer = open_writer(tmp_path, "parquet")
+    writer.write_model(model_row("d", "prop"))
+    writer.close()
+
+    table = pq.read_table(tmp_path / "models.parquet")
+    assert table.column("uid").to_pylist() == ["a", "b", "c", "d"]
+    assert table.column("user_tags").to_pylist()[0] == ["low", "prop"]
+    assert table.schema.names == COLUMNS
+    assert not (tmp_path / "models_parts").exists()
@@ -0,0 +1,109 @@
+import os
+import zlib
+import struct
+import numpy as np
+import pytest
+from ddditai.model.b_inference.fbx_features import FBX_COUNTS, FBX_MAGIC, fbx_counts, feature_matrix, load_feature_spec
+
+# --- CONFIGURATION ---
+FEATURE_SPEC_PATH = os.path.join(os.path.dirname(__file__), "data", "feature_spec.json")  # written by a training of this repo
+
+CUBE_VERTICES = [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 0.0, 0.0, 1.0, 0.0] * 2  # 8 control points
+
+CUBE_POLYGONS = [0, 1, 2, ~3, 4, 5, 6, ~7, 0, 1, ~5]  # two quads and a triangle, 2 + 2 + 1 triangles
+
+
+# --- BINARY FBX WRITER ---
+def fbx_property(value):
+    if isinstance(value, int):
+        return b"L" + struct.pack("<q", value)
+    if isinstance(value, bytes):
+        return b"S" + struct.pack("<I", len(value)) + value
+    type_code, values, deflate = value
+    raw = struct.pack(f"<{len(values)}{type_code}", *values)
+    data = zlib.compress(raw) if deflate else raw
+    return type_code.encode() + struct.pack("<III", len(values), int(deflate), len(data)) + data
+
+def fbx_record(name, properties=(), children=()):
+    return name, list(properties), list(children)
+
+def encode_record(record, offset, wide):
+    name, properties, children = record
+    header_format = "<QQQB" if wide else "<IIIB"
+    header_size = struct.calcsize(header_format)
+    encoded_properties = b"".join(fbx_property(value) for value in properties)
+    body = b""
+    child_offset = offset + header_size + len(name) + len(encoded_properties)
+    for child in children:
+        encoded = encode_record(child, child_offset + len(body), wide)
+        body += encoded
+    if children:
+        body += b"\x00" * header_size
+    end = offset + header_size + len(name) + len(encoded_properties) + len(body)
+    return struct.pack(header_format, end, len(properties), len(encoded_properties), len(name)) + name + encoded_properties + body
+
+def write_fbx(path, version, objects):
+    wide = version >= 7500
+    data = FBX_MAGIC + b"\x1a\x00" + struct.pack("<I", version)
+    for record in [fbx_record(b"FBXHeaderExtension", children=[fbx_record(b"FBXHeaderVersion", [1003])]),
+                   fbx_record(b"Objects", children=objects)]:
+        data += encode_record(record, len(data), wide)
+    data += b"\x00" * struct.calcsize("<QQQB" if wide else "<IIIB")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def cube_objects(deflate):
+    geometry = fbx_record(b"Geometry", [1, b"Cube\x00\x01Geometry", b"Mesh"], [
+        fbx_record(b"Vertices", [("d", CUBE_VERTICES, deflate)]),
+        fbx_record(b"PolygonVertexIndex", [("i", CUBE_POLYGONS, deflate)]),
+    ])
+    return [
+        geometry,
+        fbx_record(b"Geometry", [2, b"Curve\x00\x01Geometry", b"NurbsCurve"], [fbx_record(b"Vertices", [("d", [0.0] * 30, False)])]),
+        fbx_record(b"Material", [10, b"Wood\x00\x01Material", b""]),
+        fbx_record(b"Material", [11, b"Metal\x00\x01Material", b""]),
+        fbx_record(b"Texture", [20, b"Albedo\x00\x01Texture", b""]),
+        fbx_record(b"AnimationStack", [30, b"Idle\x00\x01AnimStack", b""]),
+    ]
+
+# --- PYTEST TESTS ---
+@pytest.mark.parametrize("version", [7400, 7500])
+@pytest.mark.parametrize("deflate", [False, True])
+def test_fbx_counts(tmp_path, version, deflate):
+    fbx_path = write_fbx(tmp_path / "cube.fbx", version, cube_objects(deflate))
+
+    assert fbx_counts(fbx_path) == {
+        "texture_count": 1, "vertex_count": 8, "material_count": 2, "animation_count": 1, "face_count": 5
+    }
+
+def test_fbx_counts_rejects_non_binary_files(tmp_path):
+    ascii_path = tmp_path / "ascii.fbx"
+    ascii_path.write_text("; FBX 7.4.0 project file\nFBXHeaderExtension:  {\n}\n")
+
+    with pytest.raises(ValueError):
+        fbx_counts(ascii_path)
+
+def test_feature_matrix_matches_training_spec():
+    spec = load_feature_spec(FEATURE_SPEC_PATH)
+    counts = [
+        {"texture_count": 1, "vertex_count": 8, "material_count": 2, "animation_count": 1, "face_count": 5},
+        {"texture_count": 0, "vertex_count": 120000, "material_count": 0, "animation_count": 0, "face_count": 90000},
+    ]
+
+    X = feature_matrix(counts, spec)
+
+    assert X.shape == (2, len(spec["features"]))
+    assert X.dtype == np.float32 and X.flags["C_CONTIGUOUS"]
+    features = [dict(zip(spec["features"], row)) for row in X.tolist()]
+    assert features[0]["is_age_restricted"] == 0.0
+    assert features[0]["texture_richness"] == pytest.approx(1 / 3)
+    for name, scaling in spec["scaled"].items():
+        expected = counts[1][scaling["source"]] * scaling["scale"] + scaling["offset"]
+        assert features[1][name] == pytest.approx(expected, rel=1e-5, abs=1e-6)
+
+def test_feature_matrix_rejects_unknown_features():
+    spec = {"features": ["texture_count", "like_count"], "scaled": {}}
+
+    with pytest.raises(ValueError, match="like_count"):
+        feature_matrix([dict.fromkeys(FBX_COUNTS, 1)], spec)
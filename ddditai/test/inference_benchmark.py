@@ -0,0 +1,268 @@
+import os
+import glob
+import json
+import time
+import argparse
+import platform
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import onnxruntime as ort
+import psutil
+from ddditai.common.resources import available_cores
+
+# --- CONFIGURATION ---
+BENCHMARK_MODELS_DIR = os.getenv("DDDITAI_MODELS_DIR", "models/")
+
+BENCHMARK_OUTPUT = os.getenv("DDDITAI_BENCHMARK_OUTPUT", "benchmark_results.json")
+
+BENCHMARK_BASELINE = os.getenv("DDDITAI_BENCHMARK_BASELINE", "benchmark_baseline.json")
+
+LATENCY_ITERATIONS = int(os.getenv("DDDITAI_BENCHMARK_ITERATIONS", "1000"))  # batch 1 runs the latency percentiles are computed on
+
+WARMUP_RUNS = 20  # runs of a new session before it is measured, the first one is reported on its own
+
+SESSION_RUNS = 5  # session creations whose median is reported
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+MIN_MEASURE_SECONDS = float(os.getenv("DDDITAI_BENCHMARK_MIN_SECONDS", "0.2"))  # a throughput point runs at least this long
+
+MIN_MEASURE_RUNS = 5
+
+SCALING_BATCH_SIZE = 1024  # batch size of the thread scaling throughput
+
+REGRESSION_TOLERANCE = float(os.getenv("DDDITAI_BENCHMARK_TOLERANCE", "0.2"))  # relative slowdown flagged as a regression
+
+RSS_SAMPLE_INTERVAL = 0.02  # seconds between two resident memory samples of a benchmarked model
+
+RANDOM_STATE = 42
+
+# Metric of the results -> (True when higher is better, smallest absolute change flagged), compared against the baseline.
+# Latencies are fractions of a millisecond, so a change is a regression only when it is both more than the tolerance
+# and more than the absolute delta, which keeps the run to run noise of shared runners from being flagged
+REGRESSION_METRICS = {
+    "session_creation_ms": (False, 20.0),
+    "latency_p50_ms": (False, 0.5),
+    "latency_p95_ms": (False, 1.0),
+    "latency_p99_ms": (False, 2.0),
+    "throughput_max_rows_per_s": (True, 10_000.0),
+    "peak_memory_mb": (False, 50.0),
+}
+
+
+def thread_counts():
+    # Powers of two up to the cores of the machine, DDDITAI_BENCHMARK_THREADS=1,2,4 overrides them
+    if os.getenv("DDDITAI_BENCHMARK_THREADS"):
+        return [int(n) for n in os.environ["DDDITAI_BENCHMARK_THREADS"].split(",")]
+    cores = available_cores()
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+def model_paths(models_dir=BENCHMARK_MODELS_DIR):
+    return sorted(glob.glob(os.path.join(models_dir, "*.onnx")))
+
+def peak_rss_mb():
+    # Peak resident memory of the whole process lifetime (interpreter and imports included), as the platform reports it
+    try:
+        import resource
+
+        scale = 1024 if platform.system() == "Darwin" else 1
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale / 1024
+    except ImportError:
+        return psutil.Process(os.getpid()).memory_info().peak_wset / 1024 ** 2
+
+class PeakRssSampler:
+    # Highest resident memory of the process while the block runs, sampled by a background thread because the
+    # platform high-water mark cannot be reset and would include everything the process did before
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.process = psutil.Process(os.getpid())
+        self.interval = interval
+        self.start_rss = self.peak_rss = self.process.memory_info().rss
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._sample, name="benchmark-rss-sampler", daemon=True)
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def peak_increase_mb(self):
+        return (self.peak_rss - self.start_rss) / 1024 ** 2
+
+# --- MEASUREMENTS ---
+def create_session(model_path, threads=1):
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+def random_features(session, rows):
+    n_features = session.get_inputs()[0].shape[1]
+    return np.random.default_rng(RANDOM_STATE).random((rows, n_features), dtype=np.float32)
+
+def timed_runs(session, features, runs):
+    # Duration of every run in ms, perf_counter_ns so that sub-millisecond runs keep their resolution
+    feed = {session.get_inputs()[0].name: features}
+    timings = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter_ns()
+        session.run(None, feed)
+        timings[i] = (time.perf_counter_ns() - start) / 1e6
+    return timings
+
+def throughput(session, features):
+    # Rows per second of a batch size, runs until MIN_MEASURE_SECONDS are spent so that small batches get enough runs
+    feed = {session.get_inputs()[0].name: features}
+    runs = 0
+    start = time.perf_counter()
+    while runs < MIN_MEASURE_RUNS or time.perf_counter() - start < MIN_MEASURE_SECONDS:
+        session.run(None, feed)
+        runs += 1
+    return runs * len(features) / (time.perf_counter() - start)
+
+def benchmark_model(model_path, iterations=LATENCY_ITERATIONS, batch_sizes=BATCH_SIZES, threads=None):
+    # Cold costs (session creation, first run, warmup) are measured on new sessions, steady state costs after warmup.
+    # peak_memory_mb is the highest resident memory the model added to the process during the whole benchmark
+    with PeakRssSampler() as memory:
+        creation_ms = []
+        for _ in range(SESSION_RUNS):
+            start = time.perf_counter_ns()
+            session = create_session(model_path)
+            creation_ms.append((time.perf_counter_ns() - start) / 1e6)
+
+        sample = random_features(session, 1)
+        first_run_ms = timed_runs(session, sample, 1)[0]
+        warmup_ms = first_run_ms + timed_runs(session, sample, WARMUP_RUNS - 1).sum()
+
+        latencies = timed_runs(session, sample, iterations)
+        batches = {str(size): throughput(session, random_features(session, size)) for size in batch_sizes}
+
+        scaling = {}
+        for n_threads in threads or thread_counts():
+            scaled = create_session(model_path, n_threads)
+            timed_runs(scaled, sample, WARMUP_RUNS)
+            scaling[str(n_threads)] = {
+                "latency_p50_ms": float(np.percentile(timed_runs(scaled, sample, iterations), 50)),
+                "throughput_rows_per_s": throughput(scaled, random_features(scaled, SCALING_BATCH_SIZE)),
+            }
+
+    return {
+        "model": os.path.basename(model_path),
+        "size_kb": os.path.getsize(model_path) / 1024,
+        "session_creation_ms": float(np.median(creation_ms)),
+        "first_run_ms": float(first_run_ms),
+        "warmup_ms": float(warmup_ms),
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p95_ms": float(np.percentile(latencies, 95)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+        "latency_mean_ms": float(latencies.mean()),
+        "throughput_rows_per_s": batches,
+        "throughput_max_rows_per_s": max(batches.values()),
+        "thread_scaling": scaling,
+        "peak_memory_mb": memory.peak_increase_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def benchmark_isolated(model_path, **kwargs):
+    # Every model is measured in a new process so that its peak memory is not the high-water mark of a previous one
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(benchmark_model, model_path, **kwargs).result()
+
+def run_benchmark(paths, output_path=BENCHMARK_OUTPUT, **kwargs):
+    results = {
+        "created": datetime.now().isoformat(),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cores": os.cpu_count(),
+            "onnxruntime": ort.__version__,
+        },
+        "models": {},
+    }
+    for model_path in paths:
+        print(f"[{datetime.now()}] Benchmarking {model_path}")
+        result = benchmark_isolated(model_path, **kwargs)
+        results["models"][result["model"]] = result
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[{datetime.now()}] Benchmark results saved to {output_path}")
+    return results
+
+# --- BASELINE COMPARISON ---
+def load_baseline(baseline_path=BENCHMARK_BASELINE):
+    if not os.path.exists(baseline_path):
+        return None
+    with open(baseline_path) as f:
+        return json.load(f)
+
+def compare_with_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    # Regressions of every model present in both, a metric regresses when it is more than tolerance and more than
+    # its absolute delta worse
+    regressions = []
+    for name, result in results["models"].items():
+        reference = baseline["models"].get(name)
+        if reference is None:
+            continue
+        for metric, (higher_is_better, min_delta) in REGRESSION_METRICS.items():
+            current, previous = result[metric], reference.get(metric)
+            if not previous:
+                continue
+            change = (current - previous) / previous
+            worse = previous - current if higher_is_better else current - previous
+            if worse > min_delta and worse / previous > tolerance:
+                regressions.append({"model": name, "metric": metric, "baseline": previous, "current": current, "change": change})
+    return regressions
+
+def print_report(results, regressions=()):
+    print(f"{'model':<36}{'session (ms)':>14}{'warmup (ms)':>13}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}"
+          f"{'max rows/s':>13}{'peak (MB)':>11}")
+    for name, r in results["models"].items():
+        print(f"{name:<36}{r['session_creation_ms']:>14.2f}{r['warmup_ms']:>13.2f}{r['latency_p50_ms']:>10.4f}"
+              f"{r['latency_p95_ms']:>10.4f}{r['latency_p99_ms']:>10.4f}{r['throughput_max_rows_per_s']:>13.0f}"
+              f"{r['peak_memory_mb']:>11.1f}")
+    for regression in regressions:
+        print(f"[{datetime.now()}] REGRESSION {regression['model']} {regression['metric']}: "
+              f"{regression['baseline']:.4f} -> {regression['current']:.4f} ({regression['change']:+.0%})")
+
+
+if __name__ == "__main__":
+    # This main can be used to benchmark the ONNX models of a local folder and compare them with a stored baseline
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models_dir", default=BENCHMARK_MODELS_DIR)
+    parser.add_argument("--output", default=BENCHMARK_OUTPUT)
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE)
+    parser.add_argument("--update_baseline", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--iterations", type=int, default=LATENCY_ITERATIONS)
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+
+    args = parser.parse_args()
+
+    paths = model_paths(args.models_dir)
+    if not paths:
+        raise FileNotFoundError(f"No ONNX model found in {args.models_dir}")
+    results = run_benchmark(paths, args.output, iterations=args.iterations)
+    baseline = load_baseline(args.baseline)
+    regressions = compare_with_baseline(results, baseline, args.tolerance) if baseline else []
+    print_report(results, regressions)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[{datetime.now()}] Baseline updated: {args.baseline}")
+    elif regressions:
+        raise SystemExit(1)
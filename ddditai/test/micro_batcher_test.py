@@ -0,0 +1,125 @@
+import threading
+import numpy as np
+import pytest
+from ddditai.model.b_inference import inference
+from ddditai.model.b_inference.inference import MicroBatcher
+
+
+class SumRegistry:
+    # Registry with the interface the batcher uses, the probability of every tag is the share of the row sum
+    def __init__(self, version="1", tags=("lowpoly", "prop")):
+        self.version = version
+        self.tags = list(tags)
+        self.models_dir = "models/"
+        self.signature = ()
+        self.n_features = 2
+        self.batches = []
+
+    def predict(self, features):
+        self.batches.append(len(features))
+        if (features < 0).any():
+            raise ValueError("negative count")
+        share = features.sum(axis=1, keepdims=True) / 100
+        return np.hstack([share, 1 - share]).astype(np.float32)
+
+@pytest.fixture
+def registry():
+    return SumRegistry()
+
+# --- PYTEST TESTS ---
+def test_concurrent_requests_are_run_in_one_batch(registry):
+    batcher = MicroBatcher(registry, max_batch_size=4, max_wait_ms=5000)
+
+    futures = [batcher.submit([[10, 10], [30, 30]]), batcher.submit([5, 5]), batcher.submit([[40, 50]])]
+    results = [future.result(timeout=10) for future in futures]
+    batcher.close()
+
+    assert registry.batches == [4]
+    assert [len(probabilities) for _, probabilities in results] == [2, 1, 1]
+    assert results[0][1][:, 0].tolist() == pytest.approx([0.2, 0.6])
+    assert results[2][1][0].tolist() == pytest.approx([0.9, 0.1])
+    assert results[1][0] == ["lowpoly", "prop"]
+
+def test_batches_are_capped_at_the_max_batch_size(registry):
+    batcher = MicroBatcher(registry, max_batch_size=2, max_wait_ms=50)
+
+    futures = [batcher.submit([i, i]) for i in range(5)]
+    for future in futures:
+        future.result(timeout=10)
+    batcher.close()
+
+    assert sum(registry.batches) == 5
+    assert max(registry.batches) <= 2
+
+def test_predict_tags_applies_the_threshold(registry):
+    batcher = MicroBatcher(registry, max_wait_ms=0)
+
+    assert batcher.predict_tags([[40, 40], [5, 5]], threshold=0.5) == [["lowpoly"], ["prop"]]
+    batcher.close()
+
+def test_a_failing_request_does_not_fail_the_others_of_its_batch(registry):
+    batcher = MicroBatcher(registry, max_batch_size=3, max_wait_ms=5000)
+
+    futures = [batcher.submit([1, 1]), batcher.submit([-1, 1]), batcher.submit([2, 2])]
+    assert futures[0].result(timeout=10)[1][0, 0] == pytest.approx(0.02)
+    with pytest.raises(ValueError, match="negative count"):
+        futures[1].result(timeout=10)
+    assert futures[2].result(timeout=10)[1][0, 0] == pytest.approx(0.04)
+    batcher.close()
+
+    assert registry.batches == [3, 1, 1, 1]
+
+def test_malformed_requests_are_rejected_when_submitted(registry):
+    batcher = MicroBatcher(registry, max_wait_ms=0)
+
+    for features in [[1, 2, 3], [[[1, 2]]], [["a", "b"]]]:
+        with pytest.raises(ValueError):
+            batcher.submit(features)
+    batcher.close()
+
+    assert registry.batches == []
+
+def test_submit_after_close_raises(registry):
+    batcher = MicroBatcher(registry, max_wait_ms=0)
+    batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher.submit([1, 1])
+
+def test_failed_reload_keeps_the_serving_version(registry, monkeypatch):
+    def broken_registry(models_dir, previous=None):
+        raise FileNotFoundError(f"No models in {models_dir}")
+
+    monkeypatch.setattr(inference, "ModelRegistry", broken_registry)
+    batcher = MicroBatcher(registry, max_wait_ms=0)
+
+    assert batcher._reload("models/") is False
+    assert batcher.registry is registry
+    batcher.close()
+
+def test_reload_swaps_to_a_new_version(registry, monkeypatch):
+    new_registry = SumRegistry(version="2", tags=["highpoly", "character"])
+    new_registry.warm_up = lambda: None
+    monkeypatch.setattr(inference, "ModelRegistry", lambda models_dir, previous=None: new_registry)
+    batcher = MicroBatcher(registry, max_wait_ms=0)
+
+    batcher.reload().join(timeout=10)
+    tags, _ = batcher.submit([1, 1]).result(timeout=10)
+    batcher.close()
+
+    assert batcher.registry is new_registry and tags == ["highpoly", "character"]
+    assert registry.batches == [] and new_registry.batches == [1]
+
+def test_close_runs_the_requests_already_submitted(registry):
+    release = threading.Event()
+    predict = registry.predict
+    registry.predict = lambda features: release.wait(10) and predict(features)
+    batcher = MicroBatcher(registry, max_batch_size=1, max_wait_ms=0)
+
+    futures = [batcher.submit([1, 1]), batcher.submit([2, 2])]
+    closing = threading.Thread(target=batcher.close)
+    closing.start()
+    release.set()
+    closing.join(timeout=10)
+
+    assert all(future.done() for future in futures)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from ddditai.model.a_training.model_compaction import (
+    compact_trees, inference_session, read_trees, reachable_nodes, select_candidate, trees_per_round
+)
+from ddditai.model.a_training.training import ONNX_TARGET_OPSET
+
+# --- CONFIGURATION ---
+ROWS = 300
+
+
+def trained_graph(n_classes):
+    # XGBoost model on synthetic features and its ONNX graph, exported like the training does
+    import onnxmltools
+    from onnxmltools.convert.common.data_types import FloatTensorType
+    from xgboost import XGBClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(ROWS, 5)).astype(np.float32)
+    y = np.digitize(X[:, 0] + 0.5 * X[:, 1], np.linspace(-1, 1, n_classes - 1))
+    model = XGBClassifier(n_estimators=20, max_depth=4, random_state=42, n_jobs=1)
+    model.fit(X, y)
+    onnx_model = onnxmltools.convert_xgboost(
+        model, initial_types=[("float_input", FloatTensorType([None, X.shape[1]]))], target_opset=ONNX_TARGET_OPSET
+    )
+    return model, onnx_model, X
+
+def outputs(onnx_model, X):
+    session = inference_session(onnx_model)
+    return session.run(["label", "probabilities"], {session.get_inputs()[0].name: X})
+
+def candidate(latency_ms, nodes, val_f1_score=0.8):
+    return {"latency_ms": latency_ms, "nodes": nodes, "val_f1_score": val_f1_score}
+
+# --- PYTEST TESTS ---
+@pytest.mark.parametrize("n_classes", [2, 3])
+def test_compacted_graph_without_pruning_reproduces_the_model(n_classes):
+    _, onnx_model, X = trained_graph(n_classes)
+    trees = read_trees(onnx_model)
+    rounds = len(trees) // trees_per_round(trees)
+
+    compacted = compact_trees(onnx_model, rounds, merge_tolerance=0.0)
+
+    labels, probabilities = outputs(compacted, X)
+    full_labels, full_probabilities = outputs(onnx_model, X)
+    np.testing.assert_array_equal(labels, full_labels)
+    np.testing.assert_allclose(probabilities, full_probabilities, rtol=1e-5, atol=1e-6)
+    assert len(read_trees(compacted)) == len(trees)
+
+def test_truncated_graph_matches_fewer_boosting_rounds():
+    model, onnx_model, X = trained_graph(2)
+
+    compacted = compact_trees(onnx_model, 5, merge_tolerance=0.0)
+
+    assert len(read_trees(compacted)) == 5
+    expected = model.predict_proba(X, iteration_range=(0, 5))
+    np.testing.assert_allclose(outputs(compacted, X)[1], expected, rtol=1e-4, atol=1e-5)
+
+def test_merging_leaves_prunes_nodes():
+    _, onnx_model, X = trained_graph(2)
+    trees = read_trees(onnx_model)
+    nodes = sum(len(reachable_nodes(tree)) for tree in trees)
+
+    merged = compact_trees(onnx_model, len(trees), merge_tolerance=0.5)
+
+    assert sum(len(reachable_nodes(tree)) for tree in read_trees(merged)) < nodes
+    assert outputs(merged, X)[1].shape == (ROWS, 2)
+
+def test_selection_ties_latencies_within_the_tolerance():
+    candidates = [candidate(0.0130, 900), candidate(0.0110, 700), candidate(0.0105, 800), candidate(0.0090, 300, 0.5)]
+
+    # 0.0105 and 0.0110 are within 10% of each other, the smaller graph wins, the fastest one lost too much F1
+    assert select_candidate(candidates, f1_tolerance=0.01, latency_tolerance=0.1) is candidates[1]
+    assert select_candidate(candidates, f1_tolerance=0.01, latency_tolerance=0.0) is candidates[2]
+    assert select_candidate(candidates, f1_tolerance=0.5, latency_tolerance=0.1) is candidates[3]
@@ -1,10 +1,9 @@
 import os
-import time
+import glob
+import json
+from datetime import datetime
 import pytest
-import numpy as np
-import onnxruntime as ort
-import psutil
-from azure.storage.blob import BlobServiceClient
+from inference_benchmark import BENCHMARK_BASELINE, BENCHMARK_OUTPUT, compare_with_baseline, load_baseline, print_report, run_benchmark
 
 # --- CONFIGURATION ---
 AZURE_STORAGE_CONNECTION_STRING= os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
@@ -13,30 +12,32 @@ MODELS_CONTAINER = "mlflow"
 
 MODELS_PREFIX = "training/"
 
-LOCAL_MODELS_DIR = "models/"
+LOCAL_MODELS_DIR = os.getenv("DDDITAI_MODELS_DIR", "models/")
+
+BASELINE_BLOB = "benchmark/baseline.json"  # baseline the CI compares against, BENCHMARK_BASELINE is used offline
+
+UPDATE_BASELINE = os.getenv("DDDITAI_BENCHMARK_UPDATE_BASELINE", "0") == "1"  # record the results as the new baseline
+
+BASELINE_GATE = os.getenv("DDDITAI_BENCHMARK_GATE", "0") == "1"  # fail on regressions, otherwise they are only reported
 
 # Thresholds for performance tests
-MAX_INFERENCE_TIME = 1.0  # seconds
+MAX_INFERENCE_TIME = 1.0  # seconds, p99 latency of a batch 1 run
 
 MAX_RAM_USAGE = 700.0     # MB
 
 os.makedirs(LOCAL_MODELS_DIR, exist_ok=True)
 
 def download_latest_models():
-    blob_service = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-    container_client = blob_service.get_container_client(MODELS_CONTAINER)
-
-    all_blobs = [b.name for b in container_client.list_blobs(name_starts_with=MODELS_PREFIX)]
-    training_folders = set()
-    for blob_name in all_blobs:
-        parts = blob_name.split("/")
-        if len(parts) > 1 and parts[1].startswith("Training_"):
-            training_folders.add(parts[1])
+    from ddditai.common.blob_storage import download_files, latest_training_folder, list_blob_names, mirror_files, read_manifest
 
-    if not training_folders:
-        raise FileNotFoundError("Training folder not found.")
+    manifest = read_manifest(MODELS_CONTAINER)
+    if manifest:
+        print(f"Latest training found in manifest: {manifest['version']}")
+        local_paths, _ = mirror_files(manifest, LOCAL_MODELS_DIR, MODELS_CONTAINER)
+        return [path for path in local_paths if path.endswith(".onnx")]
 
-    latest_folder = sorted(training_folders, reverse=True)[0]
+    all_blobs = list_blob_names(MODELS_PREFIX, MODELS_CONTAINER)
+    latest_folder = latest_training_folder(all_blobs, MODELS_PREFIX)
     print(f"Latest training folder found: {latest_folder}")
 
     latest_blobs = [b for b in all_blobs if b.startswith(f"{MODELS_PREFIX}{latest_folder}") and b.endswith(".onnx")]
@@ -44,46 +45,72 @@ def download_latest_models():
     if not latest_blobs:
         raise FileNotFoundError(f"No ONNX models found in {latest_folder}.")
 
-    downloaded_models = []
-    for blob_name in latest_blobs:
-        local_path = os.path.join(LOCAL_MODELS_DIR, os.path.basename(blob_name))
-        with open(local_path, "wb") as f:
-            f.write(container_client.download_blob(blob_name).readall())
-        downloaded_models.append(local_path)
+    downloaded_models = download_files(latest_blobs, LOCAL_MODELS_DIR, MODELS_CONTAINER)
+    for local_path in downloaded_models:
         print(f"Downloaded model: {local_path}")
 
     return downloaded_models
 
-def measure_model_performance(model_path, batch_size=1):
-    so = ort.SessionOptions()
-    so.intra_op_num_threads = 1
-    so.inter_op_num_threads = 1
-    session = ort.InferenceSession(model_path, sess_options=so, providers=['CPUExecutionProvider'])
+def benchmark_models():
+    # Offline when no storage is configured, the models already in LOCAL_MODELS_DIR are benchmarked
+    if AZURE_STORAGE_CONNECTION_STRING:
+        return download_latest_models()
+    return sorted(glob.glob(os.path.join(LOCAL_MODELS_DIR, "*.onnx")))
 
-    input_name = session.get_inputs()[0].name
-    input_shape = session.get_inputs()[0].shape
-    input_shape = [batch_size if s is None else s for s in input_shape]
+MODEL_PATHS = benchmark_models()
 
-    X_dummy = np.random.rand(*input_shape).astype(np.float32)
+def baseline_location():
+    return f"{MODELS_CONTAINER}/{BASELINE_BLOB}" if AZURE_STORAGE_CONNECTION_STRING else os.path.abspath(BENCHMARK_BASELINE)
 
-    process = psutil.Process(os.getpid())
-    start_mem = process.memory_info().rss / 1024 ** 2  # MB
-    start_time = time.time()
+def fetch_baseline():
+    if AZURE_STORAGE_CONNECTION_STRING:
+        from ddditai.common.blob_storage import download_json
 
-    session.run(None, {input_name: X_dummy})
+        return download_json(BASELINE_BLOB, MODELS_CONTAINER)
+    return load_baseline(BENCHMARK_BASELINE)
 
-    elapsed_time = time.time() - start_time
-    end_mem = process.memory_info().rss / 1024 ** 2
-    mem_used = end_mem - start_mem
+def save_baseline(results):
+    if AZURE_STORAGE_CONNECTION_STRING:
+        from ddditai.common.blob_storage import upload_json
 
-    return elapsed_time, mem_used
+        upload_json(results, BASELINE_BLOB, MODELS_CONTAINER)
+    else:
+        with open(BENCHMARK_BASELINE, "w") as f:
+            json.dump(results, f, indent=2)
+    print(f"Benchmark baseline updated: {baseline_location()}")
 
 # --- PYTEST TESTS ---
-@pytest.mark.parametrize("model_path", download_latest_models())
-def test_model_performance(model_path):
-    elapsed_time, mem_used = measure_model_performance(model_path, batch_size=1)
-    print(f"Model {os.path.basename(model_path)}: time={elapsed_time:.4f}s, RAM={mem_used:.2f} MB")
+@pytest.fixture(scope="module")
+def benchmark_results():
+    # The baseline comparison is reported, it fails the run only with DDDITAI_BENCHMARK_GATE=1. With the gate on,
+    # a missing baseline fails too since the check would otherwise pass vacuously
+    results = run_benchmark(MODEL_PATHS, BENCHMARK_OUTPUT)
+    if UPDATE_BASELINE:
+        print_report(results)
+        save_baseline(results)
+        return results, []
+    baseline = fetch_baseline()
+    if baseline is None:
+        message = f"No benchmark baseline at {baseline_location()}, record one with DDDITAI_BENCHMARK_UPDATE_BASELINE=1"
+        if BASELINE_GATE:
+            pytest.fail(message, pytrace=False)
+        print(f"[{datetime.now()}] {message}")
+        print_report(results)
+        return results, []
+    for name in sorted(set(results["models"]) - set(baseline["models"])):
+        print(f"[{datetime.now()}] {name} is not in the baseline {baseline_location()}, it is not compared")
+    regressions = compare_with_baseline(results, baseline)
+    print_report(results, regressions)
+    return results, regressions
+
+@pytest.mark.parametrize("model_path", MODEL_PATHS)
+def test_model_performance(model_path, benchmark_results):
+    results, regressions = benchmark_results
+    result = results["models"][os.path.basename(model_path)]
 
     # Assertions for CI
-    assert elapsed_time <= MAX_INFERENCE_TIME, f"Inference time too high for {model_path}"
-    assert mem_used <= MAX_RAM_USAGE, f"RAM usage too high for {model_path}"
+    assert result["latency_p99_ms"] / 1000 <= MAX_INFERENCE_TIME, f"Inference time too high for {model_path}"
+    assert result["peak_memory_mb"] <= MAX_RAM_USAGE, f"RAM usage too high for {model_path}"
+    if BASELINE_GATE:
+        model_regressions = [r for r in regressions if r["model"] == result["model"]]
+        assert not model_regressions, f"Performance regression for {model_path}: {model_regressions}"
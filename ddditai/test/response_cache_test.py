@@ -0,0 +1,108 @@
+import pytest
+from ddditai.data.a_data_extraction import response_cache
+from ddditai.data.a_data_extraction.response_cache import ResponseCache, cache_key
+
+
+class FakeClock:
+    # Stands in for the time module of the cache, so access order does not depend on the clock resolution
+    def __init__(self):
+        self.current = 1_700_000_000.0
+
+    def time(self):
+        return self.current
+
+    def advance(self, seconds):
+        self.current += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(response_cache, "time", fake)
+    return fake
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    yield cache
+    cache.close()
+
+# --- PYTEST TESTS ---
+def test_cache_key_does_not_depend_on_parameter_order():
+    url = "https://api.sketchfab.com/v3/search"
+
+    assert cache_key(url, {"tags": "prop", "type": "models"}) == cache_key(url, {"type": "models", "tags": "prop"})
+    assert cache_key(url) == url
+
+def test_responses_survive_a_reopen(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    cache.put("models/abc", b'{"uid": "abc"}', etag='"v1"', last_modified="Wed, 01 Jan 2025 00:00:00 GMT")
+    cache.close()
+
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    entry = cache.get("models/abc")
+    cache.close()
+
+    assert entry["body"] == b'{"uid": "abc"}'
+    assert entry["etag"] == '"v1"' and entry["last_modified"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+
+def test_entries_expire_and_are_refreshed_by_a_revalidation(cache, clock):
+    cache.put("search/prop", b"[]")
+    assert ResponseCache.is_fresh(cache.get("search/prop"), ttl=60)
+
+    clock.advance(61)
+    assert not ResponseCache.is_fresh(cache.get("search/prop"), ttl=60)
+
+    cache.refresh("search/prop")
+    assert ResponseCache.is_fresh(cache.get("search/prop"), ttl=60)
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "responses.sqlite", max_bytes=20)
+    cache.put("a", b"x" * 8)
+    clock.advance(1)
+    cache.put("b", b"x" * 8)
+    clock.advance(1)
+    cache.get("a")
+    clock.advance(1)
+    cache.put("c", b"x" * 8)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.close()
+
+def test_missing_key(cache):
+    assert cache.get("models/unknown") is None
+
+def test_reads_do_not_write_until_a_flush(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(response_cache, "ACCESS_FLUSH_SIZE", 3)
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    for key in ["a", "b", "c"]:
+        cache.put(key, b"x")
+    clock.advance(10)
+
+    def stored_access(key):
+        return cache._connection.execute("SELECT accessed_at FROM responses WHERE key = ?", (key,)).fetchone()[0]
+
+    cache.get("a")
+    cache.get("b")
+    assert stored_access("a") == stored_access("b") == clock.current - 10
+
+    cache.get("c")
+    assert stored_access("a") == stored_access("c") == clock.current
+
+    clock.advance(10)
+    cache.get("a")
+    cache.close()
+    reopened = ResponseCache(tmp_path / "responses.sqlite")
+    assert reopened._connection.execute("SELECT accessed_at FROM responses WHERE key = 'a'").fetchone()[0] == clock.current
+    reopened.close()
+
+def test_unchanged_bodies_are_not_rewritten(cache, clock):
+    assert cache.put("search/prop", b"[1]", etag='"v1"')
+    clock.advance(100)
+
+    assert not cache.put("search/prop", b"[1]", etag='"v2"')
+    entry = cache.get("search/prop")
+    assert entry["etag"] == '"v2"' and entry["stored_at"] == clock.current
+
+    assert cache.put("search/prop", b"[2]")
+    assert cache.get("search/prop")["body"] == b"[2]"
@@ -0,0 +1,92 @@
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+import pytest
+from ddditai.data.a_data_extraction import sketchfab_client
+from ddditai.data.a_data_extraction.sketchfab_client import TokenBucket, TokenRateLimiter, parse_retry_after
+
+
+class FakeClock:
+    # Stands in for the time module of the client, time only moves when the test advances it
+    def __init__(self):
+        self.current = 1000.0
+
+    def monotonic(self):
+        return self.current
+
+    def time(self):
+        return 1_700_000_000 + self.current
+
+    def advance(self, seconds):
+        self.current += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(sketchfab_client, "time", fake)
+    return fake
+
+# --- PYTEST TESTS ---
+def test_bucket_allows_a_burst_then_the_rate(clock):
+    bucket = TokenBucket("token", "Token-1", requests_per_minute=60, burst_size=2)
+
+    for _ in range(2):
+        assert bucket.wait_time() == 0
+        bucket.consume()
+    assert bucket.wait_time() == pytest.approx(1.0)
+
+    clock.advance(0.5)
+    assert bucket.wait_time() == pytest.approx(0.5)
+    clock.advance(10)
+    assert bucket.wait_time() == 0
+    assert bucket.tokens == 2  # refill never exceeds the burst size
+    assert bucket.requests_count == 2
+
+def test_bucket_is_blocked_until_the_window_resets(clock):
+    bucket = TokenBucket("token", "Token-1")
+
+    bucket.update_from_headers({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "30"})
+
+    assert bucket.wait_time() == pytest.approx(30)
+    clock.advance(29)
+    assert bucket.wait_time() == pytest.approx(1)
+    clock.advance(1)
+    assert bucket.wait_time() == 0
+
+def test_bucket_spreads_the_remaining_budget_over_the_window(clock):
+    bucket = TokenBucket("token", "Token-1", requests_per_minute=600, burst_size=8)
+
+    # Reset as an epoch timestamp 20 seconds ahead
+    bucket.update_from_headers({"RateLimit-Remaining": "5", "RateLimit-Reset": str(clock.time() + 20)})
+
+    assert bucket.rate == pytest.approx(5 / 20)
+    assert bucket.tokens == 5
+
+def test_bucket_ignores_responses_without_rate_limit_headers(clock):
+    bucket = TokenBucket("token", "Token-1", requests_per_minute=60)
+
+    bucket.update_from_headers({"Content-Type": "application/json"})
+
+    assert bucket.rate == 1.0
+
+def test_limiter_hands_out_the_token_with_budget(clock):
+    limiter = TokenRateLimiter(["first", None, "second"], requests_per_minute=60, burst_size=1)
+
+    async def acquire_twice():
+        return [(await limiter.acquire()).token for _ in range(2)]
+
+    assert sorted(asyncio.run(acquire_twice())) == ["first", "second"]
+    assert limiter.requests_count() == [1, 1]
+
+def test_limiter_requires_a_token():
+    with pytest.raises(ValueError):
+        TokenRateLimiter([None, ""])
+
+def test_parse_retry_after():
+    retry_date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=120), usegmt=True)
+
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("-3") == 0.0
+    assert 100 < parse_retry_after(retry_date) <= 120
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
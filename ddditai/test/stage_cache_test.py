@@ -0,0 +1,72 @@
+import sys
+import importlib
+import pandas as pd
+from ddditai.common import stage_cache
+from ddditai.common.stage_cache import code_version, find_cached_run, frame_hash, input_identity, stage_fingerprint
+
+
+def clean(df):
+    return df.dropna()
+
+def clean_and_sort(df):
+    return df.dropna().sort_values("uid")
+
+def stage_frame():
+    return pd.DataFrame({"uid": ["a", "b"], "vertex_count": [800, 8], "user_tags": [["low", "prop"], []]})
+
+# --- PYTEST TESTS ---
+def test_frame_hash_follows_values_and_dtypes():
+    df = stage_frame()
+
+    assert frame_hash(df) == frame_hash(stage_frame())
+    assert frame_hash(df.assign(vertex_count=[800, 9])) != frame_hash(df)
+    assert frame_hash(df.astype({"vertex_count": "float64"})) != frame_hash(df)
+
+def test_frame_hash_reads_list_columns():
+    df = stage_frame()
+
+    assert frame_hash(df) != frame_hash(df.assign(user_tags=[["low"], []]))
+    assert df["user_tags"].tolist() == [["low", "prop"], []]  # the frame of the caller is not modified
+
+def test_stage_fingerprint_changes_with_each_input():
+    params = {"test_size": 0.2, "random_state": 42}
+    fingerprint = stage_fingerprint("preprocessing", "input-hash", [clean], params)
+
+    assert fingerprint == stage_fingerprint("preprocessing", "input-hash", [clean], dict(reversed(params.items())))
+    assert fingerprint != stage_fingerprint("training", "input-hash", [clean], params)
+    assert fingerprint != stage_fingerprint("preprocessing", "other-input", [clean], params)
+    assert fingerprint != stage_fingerprint("preprocessing", "input-hash", [clean_and_sort], params)
+    assert fingerprint != stage_fingerprint("preprocessing", "input-hash", [clean], {**params, "test_size": 0.3})
+
+def test_code_version_follows_helpers_of_the_stage_module(tmp_path, monkeypatch):
+    stage_path = tmp_path / "cleaning_stage.py"
+    stage_path.write_text("def drop_empty(df):\n    return df.dropna()\n\ndef clean(df):\n    return drop_empty(df)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "cleaning_stage", raising=False)
+    stage = importlib.import_module("cleaning_stage")
+    version = code_version(stage.clean)
+
+    stage_path.write_text("def drop_empty(df):\n    return df.dropna(how='all')\n\ndef clean(df):\n    return drop_empty(df)\n")
+    stage = importlib.reload(stage)
+
+    assert code_version(stage.clean) != version
+    assert code_version(stage.clean) != code_version(stage.drop_empty)
+
+def test_input_identity_uses_the_fingerprint_of_the_producing_run(monkeypatch):
+    monkeypatch.setattr(stage_cache, "run_fingerprint", lambda run_id: "fingerprint-of-" + run_id)
+
+    assert input_identity("run-1", "csv") == ("fingerprint-of-run-1", None)
+
+def test_input_identity_hashes_the_artifact_of_an_unfingerprinted_run(monkeypatch):
+    monkeypatch.setattr(stage_cache, "run_fingerprint", lambda run_id: None)
+    monkeypatch.setattr(stage_cache, "download_artifact_frame", lambda run_id, artifact_path: stage_frame())
+
+    identity, df = input_identity("run-1", "csv")
+
+    assert identity == frame_hash(stage_frame())
+    pd.testing.assert_frame_equal(df, stage_frame())
+
+def test_disabled_cache_never_reuses_a_run(monkeypatch):
+    monkeypatch.setattr(stage_cache, "STAGE_CACHE_ENABLED", False)
+
+    assert find_cached_run("fingerprint") is None
@@ -0,0 +1,77 @@
+import json
+import numpy as np
+import onnx
+import pytest
+from ddditai.model.a_training.training import (
+    combine_onnx_models, graph_probabilities, oversample, tag_groups, train_group_model, train_single_model
+)
+
+# --- CONFIGURATION ---
+TAGS = ["lowpoly", "highpoly", "prop", "character"]
+
+ROWS = 400
+
+
+@pytest.fixture(scope="module")
+def data():
+    # Separable synthetic features, lowpoly and highpoly are exclusive like in TAG_GROUPS
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(ROWS, 6)).astype(np.float32)
+    Y = np.zeros((ROWS, len(TAGS)), dtype=np.int64)
+    Y[:, 0] = X[:, 0] > 0.5
+    Y[:, 1] = X[:, 0] < -0.5
+    Y[:, 2] = X[:, 1] + X[:, 2] > 0.8
+    Y[:, 3] = X[:, 3] > 1.0
+    split = ROWS * 3 // 4
+    return {
+        "tags": TAGS,
+        "X_train": X[:split], "X_test": X[split:],
+        "Y_train": np.asfortranarray(Y[:split]), "Y_test": np.asfortranarray(Y[split:]),
+    }
+
+# --- PYTEST TESTS ---
+def test_binary_targets_keep_the_minority_positive_rule():
+    X = np.random.default_rng(1).normal(size=(100, 3))
+    minority = np.array([1] * 20 + [0] * 80)
+
+    X_resampled, y_resampled = oversample(X, minority)
+    assert np.bincount(y_resampled).tolist() == [80, 80]
+
+    majority = 1 - minority  # positives are the majority, as the baseline rule it is not oversampled
+    assert oversample(X, majority)[1] is majority
+
+def test_multiclass_targets_are_oversampled_when_every_class_has_neighbors():
+    X = np.random.default_rng(1).normal(size=(100, 3))
+    y = np.array([0] * 60 + [1] * 30 + [2] * 10)
+
+    assert np.bincount(oversample(X, y)[1]).tolist() == [60, 60, 60]
+
+    too_small = np.array([0] * 60 + [1] * 36 + [2] * 4)
+    assert oversample(X, too_small)[1] is too_small
+
+def test_combined_graph_matches_the_group_models(data):
+    parts = []
+    for group_name, group_tags in tag_groups(TAGS, "grouped").items():
+        onnx_model, columns, _, _ = train_group_model(data, group_name, group_tags, n_jobs=1)
+        parts.append((group_name, onnx_model, columns, group_tags))
+
+    tags = [tag for *_, group_tags in parts for tag in group_tags]
+    combined = combine_onnx_models([part[:3] for part in parts], tags)
+
+    assert json.loads({prop.key: prop.value for prop in combined.metadata_props}["tags"]) == tags
+    probabilities = graph_probabilities(combined, data["X_test"])
+    assert probabilities.shape == (len(data["X_test"]), len(tags))
+    expected = np.hstack([graph_probabilities(onnx_model, data["X_test"], columns) for _, onnx_model, columns, _ in parts])
+    np.testing.assert_allclose(probabilities, expected, rtol=1e-6, atol=1e-6)
+
+@pytest.mark.parametrize("strategy", ["multiclass", "grouped"])
+def test_single_model_export(data, strategy, tmp_path):
+    results = train_single_model(data, strategy, str(tmp_path), str(tmp_path))[strategy]
+
+    model = onnx.load(results["model_path"])
+    tags = json.loads({prop.key: prop.value for prop in model.metadata_props}["tags"])
+    assert sorted(tags) == sorted(TAGS)
+    probabilities = graph_probabilities(model, data["X_test"])
+    assert probabilities.shape == (len(data["X_test"]), len(TAGS))
+    assert ((probabilities >= 0) & (probabilities <= 1)).all()
+    assert set(results["metrics"]) == set(TAGS)